@@ -18,3 +18,9 @@ DETAIL_VIEW_NAME_SUFFIX = '-detail'
 
 
 LIST_VIEW_NAME_SUFFIX = '-list'
+
+
+SHALLOW_DETAIL_VIEW_NAME_SUFFIX = '-shallow-detail'
+
+
+default_app_config = 'drf_nested_resources.apps.NestedResourcesConfig'
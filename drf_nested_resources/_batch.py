@@ -0,0 +1,46 @@
+##############################################################################
+#
+# Copyright (c) 2015-2020, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of drf-nested-resources
+# <https://github.com/2degrees/drf-nested-resources>, which is subject to the
+# provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from pyrecord import Record
+
+BATCH_CACHES_ENVIRON_KEY = 'drf_nested_resources.batch_caches'
+
+BatchCaches = Record.create_type(
+    'BatchCaches',
+    'ancestor_objects',
+    'ancestor_check_statuses',
+)
+
+
+def make_batch_caches():
+    return BatchCaches(ancestor_objects={}, ancestor_check_statuses={})
+
+
+def get_batch_caches(request):
+    return request.META.get(BATCH_CACHES_ENVIRON_KEY)
+
+
+def get_ancestor_object(request, queryset, ancestor_pk):
+    batch_caches = get_batch_caches(request)
+    if batch_caches is None:
+        return queryset.get(pk=ancestor_pk)
+
+    # The primary key in the URL is a string whereas the one in an object
+    # may not be
+    ancestor_object_key = (queryset.model, queryset.db, str(ancestor_pk))
+    ancestor_objects = batch_caches.ancestor_objects
+    if ancestor_object_key not in ancestor_objects:
+        ancestor_objects[ancestor_object_key] = queryset.get(pk=ancestor_pk)
+    return ancestor_objects[ancestor_object_key]
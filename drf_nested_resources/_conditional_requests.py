@@ -0,0 +1,107 @@
+##############################################################################
+#
+# Copyright (c) 2015-2020, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of drf-nested-resources
+# <https://github.com/2degrees/drf-nested-resources>, which is subject to the
+# provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from hashlib import md5
+
+from django.db.models import Count
+from django.db.models import Max
+from django.utils.http import http_date
+from django.utils.http import parse_etags
+from django.utils.http import parse_http_date_safe
+from django.utils.http import quote_etag
+from pyrecord import Record
+from rest_framework.response import Response
+from rest_framework.status import HTTP_304_NOT_MODIFIED
+
+Validators = Record.create_type('Validators', 'etag', 'last_modified')
+
+
+def get_collection_validators(queryset, last_modified_field_name, request):
+    aggregates = {'count': Count('pk'), 'max_pk': Max('pk')}
+    if last_modified_field_name:
+        aggregates['last_modified'] = Max(last_modified_field_name)
+    aggregated_values = queryset.order_by().aggregate(**aggregates)
+
+    last_modified = aggregated_values.get('last_modified')
+    etag = _make_etag(
+        request,
+        aggregated_values['count'],
+        aggregated_values['max_pk'],
+        last_modified,
+    )
+    return Validators(etag, _make_last_modified_timestamp(last_modified))
+
+
+def get_resource_validators(object_, last_modified_field_name, request):
+    if last_modified_field_name:
+        last_modified = getattr(object_, last_modified_field_name)
+    else:
+        last_modified = None
+    etag = _make_etag(request, object_.pk, last_modified)
+    return Validators(etag, _make_last_modified_timestamp(last_modified))
+
+
+def is_resource_not_modified(request, validators):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if_modified_since = request.META.get('HTTP_IF_MODIFIED_SINCE')
+    if if_none_match:
+        requested_etags = parse_etags(if_none_match)
+        is_not_modified = '*' in requested_etags or any(
+            _strip_weakness_indicator(requested_etag) ==
+            _strip_weakness_indicator(validators.etag)
+            for requested_etag in requested_etags
+        )
+    elif if_modified_since and validators.last_modified is not None:
+        if_modified_since = parse_http_date_safe(if_modified_since)
+        is_not_modified = if_modified_since is not None and \
+            validators.last_modified <= if_modified_since
+    else:
+        is_not_modified = False
+    return is_not_modified
+
+
+def make_not_modified_response(validators):
+    response = Response(status=HTTP_304_NOT_MODIFIED)
+    set_validator_headers(response, validators)
+    return response
+
+
+def set_validator_headers(response, validators):
+    response['ETag'] = validators.etag
+    if validators.last_modified is not None:
+        response['Last-Modified'] = http_date(validators.last_modified)
+
+
+def _make_etag(request, *state):
+    # The representation also depends on the query string (e.g., pagination
+    # and sparse fieldsets) and on the negotiated media type
+    representation_variant = (
+        request.META.get('QUERY_STRING', ''),
+        request.accepted_media_type,
+    )
+    etag_hash = md5(repr(representation_variant + state).encode('utf-8'))
+    return 'W/' + quote_etag(etag_hash.hexdigest())
+
+
+def _make_last_modified_timestamp(last_modified):
+    if last_modified is None:
+        return None
+    return int(last_modified.timestamp())
+
+
+def _strip_weakness_indicator(etag):
+    if etag.startswith('W/'):
+        etag = etag[2:]
+    return etag
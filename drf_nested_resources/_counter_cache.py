@@ -0,0 +1,236 @@
+##############################################################################
+#
+# Copyright (c) 2015-2020, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of drf-nested-resources
+# <https://github.com/2degrees/drf-nested-resources>, which is subject to the
+# provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from collections import defaultdict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count
+from django.db.models import F
+from django.db.models import IntegerField
+from django.db.models import OuterRef
+from django.db.models import Subquery
+from django.db.models.fields.related import ForeignKey
+from django.db.models.functions import Coalesce
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_init
+from django.db.models.signals import post_save
+from pyrecord import Record
+
+CounterCache = Record.create_type(
+    'CounterCache',
+    'parent_foreign_key',
+    'counter_field_name',
+)
+
+TOTAL_COUNT_HEADER_NAME = 'X-Total-Count'
+
+_DISPATCH_UID_PREFIX = 'drf_nested_resources:counter_cache'
+
+_PARENT_PKS_ATTRIBUTE_NAME = '_drf_nested_resources_parent_pks'
+
+_counter_caches_by_model = defaultdict(dict)
+
+
+def register_counter_cache(
+    child_model,
+    parent_field_lookup,
+    counter_field_name,
+):
+    parent_foreign_key = _get_parent_foreign_key(
+        child_model,
+        parent_field_lookup,
+    )
+    parent_model = parent_foreign_key.related_model
+    try:
+        parent_model._meta.get_field(counter_field_name)
+    except FieldDoesNotExist as exc:
+        message = 'Model {} does not have the counter field "{}"'.format(
+            parent_model._meta.label,
+            counter_field_name,
+        )
+        raise ImproperlyConfigured(message) from exc
+
+    counter_cache = CounterCache(parent_foreign_key, counter_field_name)
+    _counter_caches_by_model[child_model][parent_foreign_key.name] = \
+        counter_cache
+
+    dispatch_uid = '{}:{}'.format(
+        _DISPATCH_UID_PREFIX,
+        child_model._meta.label,
+    )
+    post_init.connect(
+        _remember_parent_pks_on_signal,
+        sender=child_model,
+        dispatch_uid=dispatch_uid,
+    )
+    post_save.connect(
+        _update_counter_caches_on_save,
+        sender=child_model,
+        dispatch_uid=dispatch_uid,
+    )
+    post_delete.connect(
+        _update_counter_caches_on_delete,
+        sender=child_model,
+        dispatch_uid=dispatch_uid,
+    )
+    return counter_cache
+
+
+def get_counter_cache(child_model, parent_field_lookup):
+    counter_caches = _counter_caches_by_model[child_model]
+    return counter_caches.get(str(parent_field_lookup))
+
+
+def get_counter_cache_value(counter_cache, parent_pk, using=None):
+    parent_foreign_key = counter_cache.parent_foreign_key
+    parent_model = parent_foreign_key.related_model
+    counter_cache_value = parent_model._base_manager \
+        .using(using) \
+        .filter(**{parent_foreign_key.target_field.attname: parent_pk}) \
+        .values_list(counter_cache.counter_field_name, flat=True) \
+        .first()
+    return counter_cache_value
+
+
+def repair_counter_caches(using=DEFAULT_DB_ALIAS):
+    counter_caches = [
+        counter_cache
+        for counter_caches in _counter_caches_by_model.values()
+        for counter_cache in counter_caches.values()
+    ]
+    for counter_cache in counter_caches:
+        _repair_counter_cache(counter_cache, using)
+    return counter_caches
+
+
+def _repair_counter_cache(counter_cache, using):
+    parent_foreign_key = counter_cache.parent_foreign_key
+    child_model = parent_foreign_key.model
+    parent_model = parent_foreign_key.related_model
+    child_counts = child_model._base_manager \
+        .using(using) \
+        .filter(**{
+            parent_foreign_key.name:
+                OuterRef(parent_foreign_key.target_field.attname),
+        }) \
+        .order_by() \
+        .values(parent_foreign_key.name) \
+        .annotate(child_count=Count('pk')) \
+        .values('child_count')
+    child_count = Coalesce(
+        Subquery(child_counts, output_field=IntegerField()),
+        0,
+    )
+    parent_model._base_manager.using(using).update(
+        **{counter_cache.counter_field_name: child_count}
+    )
+
+
+def _get_parent_foreign_key(child_model, parent_field_lookup):
+    parent_foreign_key = None
+    if isinstance(parent_field_lookup, str):
+        try:
+            parent_foreign_key = child_model._meta.get_field(
+                parent_field_lookup,
+            )
+        except FieldDoesNotExist:
+            pass
+
+    if not isinstance(parent_foreign_key, ForeignKey):
+        message = 'Counter caches are only supported on resources whose ' \
+            'parent field lookup is a foreign key; got {!r} on {}'.format(
+                parent_field_lookup,
+                child_model._meta.label,
+            )
+        raise ImproperlyConfigured(message)
+    return parent_foreign_key
+
+
+def _remember_parent_pks_on_signal(sender, instance, **kwargs):
+    _remember_parent_pks(instance)
+
+
+def _update_counter_caches_on_save(
+    sender,
+    instance,
+    created,
+    raw,
+    using,
+    **kwargs
+):
+    # Fixtures are loaded in an arbitrary order, so the parents may not exist
+    # yet; the counters can be recomputed afterwards
+    if raw:
+        return
+
+    previous_parent_pks = getattr(instance, _PARENT_PKS_ATTRIBUTE_NAME, {})
+    for counter_cache in _counter_caches_by_model[sender].values():
+        attname = counter_cache.parent_foreign_key.attname
+        parent_pk = getattr(instance, attname)
+        if created:
+            _increment_counter_cache(counter_cache, parent_pk, 1, using)
+        elif attname in previous_parent_pks:
+            previous_parent_pk = previous_parent_pks[attname]
+            if previous_parent_pk != parent_pk:
+                _increment_counter_cache(
+                    counter_cache,
+                    previous_parent_pk,
+                    -1,
+                    using,
+                )
+                _increment_counter_cache(counter_cache, parent_pk, 1, using)
+    _remember_parent_pks(instance)
+
+
+def _update_counter_caches_on_delete(sender, instance, using, **kwargs):
+    for counter_cache in _counter_caches_by_model[sender].values():
+        attname = counter_cache.parent_foreign_key.attname
+        _increment_counter_cache(
+            counter_cache,
+            getattr(instance, attname),
+            -1,
+            using,
+        )
+
+
+def _remember_parent_pks(instance):
+    # Deferred foreign keys are not loaded here because that would require a
+    # query per object; changes to their values are not tracked
+    parent_pks = {}
+    for counter_cache in _counter_caches_by_model[type(instance)].values():
+        attname = counter_cache.parent_foreign_key.attname
+        if attname in instance.__dict__:
+            parent_pks[attname] = instance.__dict__[attname]
+    setattr(instance, _PARENT_PKS_ATTRIBUTE_NAME, parent_pks)
+
+
+def _increment_counter_cache(counter_cache, parent_pk, increment, using):
+    if parent_pk is None:
+        return
+
+    parent_foreign_key = counter_cache.parent_foreign_key
+    counter_field_name = counter_cache.counter_field_name
+    # Saving a parent instance loaded before a child was added writes back
+    # the old value of the counter, so it may drift until it is repaired;
+    # the counter must not go negative meanwhile
+    counter_value = Greatest(F(counter_field_name) + increment, 0)
+    # The parent is on the same database as the child
+    parent_foreign_key.related_model._base_manager \
+        .using(using) \
+        .filter(**{parent_foreign_key.target_field.attname: parent_pk}) \
+        .update(**{counter_field_name: counter_value})
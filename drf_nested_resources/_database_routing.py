@@ -0,0 +1,160 @@
+##############################################################################
+#
+# Copyright (c) 2015-2020, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of drf-nested-resources
+# <https://github.com/2degrees/drf-nested-resources>, which is subject to the
+# provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from functools import lru_cache
+from time import time
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework.permissions import SAFE_METHODS
+
+ROOT_ANCESTOR_DATABASE_ROUTER_SETTING_NAME = \
+    'DRF_NESTED_RESOURCES_ROOT_ANCESTOR_DATABASE_ROUTER'
+
+READ_REPLICA_DATABASE_ALIAS_SETTING_NAME = \
+    'DRF_NESTED_RESOURCES_READ_REPLICA_DATABASE_ALIAS'
+
+READ_REPLICA_PIN_DURATION_SETTING_NAME = \
+    'DRF_NESTED_RESOURCES_READ_REPLICA_PIN_DURATION'
+
+READ_REPLICA_PIN_COOKIE_NAME = 'drf_nested_resources_primary_pin'
+
+PRIMARY_DATABASE_ENVIRON_KEY = 'drf_nested_resources.primary_database'
+
+_PRIMARY_DATABASE_PIN_CACHE_KEY_TEMPLATE = \
+    'drf_nested_resources:primary_pin:{}'
+
+_DEFAULT_READ_REPLICA_PIN_DURATION = 5
+
+
+def get_database_alias_for_route(relational_route, view_kwargs, request):
+    database_alias = \
+        _get_root_ancestor_database_alias(relational_route, view_kwargs)
+    if database_alias is None:
+        database_alias = _get_read_replica_database_alias(request)
+    return database_alias
+
+
+def get_database_alias_for_request(request):
+    parser_context = getattr(request, 'parser_context', None) or {}
+    relational_route = \
+        getattr(parser_context.get('view'), 'relational_route', None)
+    if relational_route is None:
+        return None
+
+    database_alias = get_database_alias_for_route(
+        relational_route,
+        parser_context.get('kwargs', {}),
+        request,
+    )
+    return database_alias
+
+
+def pin_to_primary_database(request, response):
+    read_replica_database_alias = \
+        getattr(settings, READ_REPLICA_DATABASE_ALIAS_SETTING_NAME, None)
+    is_successful_write = \
+        request.method not in SAFE_METHODS and response.status_code < 400
+    if read_replica_database_alias is None or not is_successful_write:
+        return
+
+    # The subsequent reads in the same session go to the primary database
+    # until the replica is expected to have caught up with this write
+    pin_duration = getattr(
+        settings,
+        READ_REPLICA_PIN_DURATION_SETTING_NAME,
+        _DEFAULT_READ_REPLICA_PIN_DURATION,
+    )
+    pin_expiry = time() + pin_duration
+    response.set_cookie(
+        READ_REPLICA_PIN_COOKIE_NAME,
+        str(pin_expiry),
+        max_age=pin_duration,
+        httponly=True,
+    )
+    # Clients authenticated with tokens may not send the cookie back
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        caches[DEFAULT_CACHE_ALIAS].set(
+            _PRIMARY_DATABASE_PIN_CACHE_KEY_TEMPLATE.format(user.pk),
+            pin_expiry,
+            pin_duration,
+        )
+
+
+def is_primary_database_required(request):
+    # The requests forged to check the ancestors of a write must not miss any
+    # ancestor created just before it
+    is_primary_database_required = \
+        request.method not in SAFE_METHODS or \
+        bool(request.META.get(PRIMARY_DATABASE_ENVIRON_KEY))
+    return is_primary_database_required
+
+
+def _get_root_ancestor_database_alias(relational_route, view_kwargs):
+    router_path = \
+        getattr(settings, ROOT_ANCESTOR_DATABASE_ROUTER_SETTING_NAME, None)
+    if router_path is None:
+        return None
+
+    # Top-level resources are their own root ancestor
+    ancestor_resource_names = \
+        tuple(relational_route.ancestor_lookup_by_resource_name)
+    if ancestor_resource_names:
+        root_resource_name = ancestor_resource_names[0]
+    else:
+        root_resource_name = relational_route.name
+    if root_resource_name not in view_kwargs:
+        return None
+
+    router = _import_router(router_path)
+    database_alias = \
+        router(root_resource_name, view_kwargs[root_resource_name])
+    return database_alias
+
+
+def _get_read_replica_database_alias(request):
+    read_replica_database_alias = \
+        getattr(settings, READ_REPLICA_DATABASE_ALIAS_SETTING_NAME, None)
+    is_replica_readable = \
+        read_replica_database_alias is not None and \
+        request is not None and \
+        not is_primary_database_required(request) and \
+        not _is_pinned_to_primary_database(request)
+    return read_replica_database_alias if is_replica_readable else None
+
+
+def _is_pinned_to_primary_database(request):
+    pin_expiry = request.COOKIES.get(READ_REPLICA_PIN_COOKIE_NAME)
+    user = getattr(request, 'user', None)
+    if not pin_expiry and user is not None and user.is_authenticated:
+        pin_expiry = caches[DEFAULT_CACHE_ALIAS].get(
+            _PRIMARY_DATABASE_PIN_CACHE_KEY_TEMPLATE.format(user.pk),
+        )
+    if not pin_expiry:
+        return False
+
+    try:
+        is_pinned = float(pin_expiry) > time()
+    except ValueError:
+        is_pinned = False
+    return is_pinned
+
+
+@lru_cache(maxsize=None)
+def _import_router(router_path):
+    return import_string(router_path)
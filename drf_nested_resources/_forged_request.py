@@ -13,21 +13,131 @@
 # INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
 #
 ##############################################################################
+from collections import ChainMap
+from sys import exc_info
+from urllib.parse import unquote_to_bytes
+from urllib.parse import urlparse
+
 from django.conf import settings
-from django.test.client import Client, FakePayload
+from django.core.exceptions import ImproperlyConfigured
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.core.signals import got_request_exception
 from django.test.client import ClientHandler
+from django.test.client import FakePayload
+from django.test.signals import setting_changed
+from django.utils.module_loading import import_string
+
+from drf_nested_resources._database_routing import \
+    PRIMARY_DATABASE_ENVIRON_KEY
+from drf_nested_resources._database_routing import \
+    is_primary_database_required
+
+FORGED_REQUEST_MIDDLEWARE_SETTING_NAME = \
+    'DRF_NESTED_RESOURCES_FORGED_REQUEST_MIDDLEWARE'
+
+_FORGED_REQUEST_ENVIRON_KEY = 'drf_nested_resources.forged_request'
+
+_FORGED_REQUEST_AUTHENTICATION_ENVIRON_KEY = \
+    'drf_nested_resources.forged_request_authentication'
+
+_REMOVED_ENVIRON_VALUE = object()
 
+_forged_request_handlers_by_key = {}
 
-class RequestForger(Client):
+
+class RequestForger:
     def __init__(self, original_request):
-        environ_overrides = \
-            {'wsgi.input': FakePayload(b''), 'CONTENT_LENGTH': '0'}
-        new_environ = dict(original_request.environ, **environ_overrides)
-        new_environ.pop('CONTENT_TYPE', None)
-        super(RequestForger, self).__init__(**new_environ)
+        super(RequestForger, self).__init__()
+
+        self._original_environ = original_request.environ
+        self._is_primary_database_required = \
+            is_primary_database_required(original_request)
 
         urlconf = getattr(original_request, 'urlconf', settings.ROOT_URLCONF)
-        self.handler = _ForgedRequestHandler(urlconf)
+        middleware_paths = \
+            getattr(settings, FORGED_REQUEST_MIDDLEWARE_SETTING_NAME, None)
+        self._handler = _get_forged_request_handler(urlconf, middleware_paths)
+
+        # The original request has already been authenticated when the
+        # ancestors are checked, so its authentication is carried over
+        if middleware_paths is None:
+            self._authentication = None
+        else:
+            self._authentication = \
+                (original_request.user, original_request.auth)
+
+    def head(self, path):
+        return self._make_request('HEAD', path)
+
+    def _make_request(self, method, path):
+        environ = make_forged_environ(
+            self._original_environ,
+            method,
+            path,
+            {
+                _FORGED_REQUEST_ENVIRON_KEY: True,
+                _FORGED_REQUEST_AUTHENTICATION_ENVIRON_KEY:
+                    self._authentication,
+                PRIMARY_DATABASE_ENVIRON_KEY:
+                    self._is_primary_database_required,
+            },
+        )
+        response = self._handler(environ)
+
+        forged_request_exc_info = \
+            getattr(response.wsgi_request, '_forged_request_exc_info', None)
+        if forged_request_exc_info:
+            _, exc_value, exc_traceback = forged_request_exc_info
+            raise exc_value.with_traceback(exc_traceback)
+
+        return response
+
+
+def make_forged_environ(original_environ, method, path, extra_items):
+    parsed_url = urlparse(path)
+    # The original environment is overlaid instead of being copied, and any
+    # change made to the forged one is therefore kept in the overlay
+    environ_overrides = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': unquote_to_bytes(parsed_url.path).decode('iso-8859-1'),
+        'QUERY_STRING': parsed_url.query,
+        'CONTENT_TYPE': _REMOVED_ENVIRON_VALUE,
+        'CONTENT_LENGTH': '0',
+        'wsgi.input': FakePayload(b''),
+    }
+    # The validators sent by the client are meant for the original resource,
+    # and any other resource would be answered with "304 Not Modified"
+    environ_overrides.update(
+        (key, _REMOVED_ENVIRON_VALUE)
+        for key in original_environ
+        if key.startswith('HTTP_IF_')
+    )
+    environ_overrides.update(extra_items)
+    environ = _EnvironOverlay(environ_overrides, original_environ)
+    return environ
+
+
+class _EnvironOverlay(ChainMap):
+
+    def __getitem__(self, key):
+        value = super(_EnvironOverlay, self).__getitem__(key)
+        if value is _REMOVED_ENVIRON_VALUE:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        is_key_present = super(_EnvironOverlay, self).__contains__(key) and \
+            super(_EnvironOverlay, self).__getitem__(key) is not \
+            _REMOVED_ENVIRON_VALUE
+        return is_key_present
+
+    def __iter__(self):
+        keys = super(_EnvironOverlay, self).__iter__()
+        return (key for key in keys if key in self)
+
+    def __len__(self):
+        return sum(1 for _ in self)
 
 
 class _ForgedRequestHandler(ClientHandler):
@@ -38,3 +148,102 @@ class _ForgedRequestHandler(ClientHandler):
     def get_response(self, request):
         request.urlconf = self._urlconf
         return super(_ForgedRequestHandler, self).get_response(request)
+
+
+class _LeanForgedRequestHandler(_ForgedRequestHandler):
+    def __init__(self, urlconf, middleware_paths):
+        super(_LeanForgedRequestHandler, self).__init__(urlconf)
+        self._middleware_paths = middleware_paths
+
+    def load_middleware(self):
+        self._view_middleware = []
+        self._template_response_middleware = []
+        self._exception_middleware = []
+
+        handler = convert_exception_to_response(self._get_response)
+        for middleware_path in reversed(self._middleware_paths):
+            middleware = import_string(middleware_path)
+            try:
+                middleware_instance = middleware(handler)
+            except MiddlewareNotUsed:
+                continue
+
+            if middleware_instance is None:
+                raise ImproperlyConfigured(
+                    'Middleware factory {} returned None.'.format(
+                        middleware_path,
+                    ),
+                )
+
+            if hasattr(middleware_instance, 'process_view'):
+                self._view_middleware.insert(
+                    0,
+                    middleware_instance.process_view,
+                )
+            if hasattr(middleware_instance, 'process_template_response'):
+                self._template_response_middleware.append(
+                    middleware_instance.process_template_response,
+                )
+            if hasattr(middleware_instance, 'process_exception'):
+                self._exception_middleware.append(
+                    middleware_instance.process_exception,
+                )
+
+            handler = convert_exception_to_response(middleware_instance)
+
+        self._middleware_chain = handler
+
+    def make_view_atomic(self, view):
+        # The original request is already wrapped in a transaction, if any
+        return view
+
+    def get_response(self, request):
+        user, auth = request.META[_FORGED_REQUEST_AUTHENTICATION_ENVIRON_KEY]
+        # Rest Framework authenticates the request with these instead of the
+        # authenticators of the view
+        request._force_auth_user = user
+        request._force_auth_token = auth
+        return super(_LeanForgedRequestHandler, self).get_response(request)
+
+
+def _get_forged_request_handler(urlconf, middleware_paths):
+    # URL configurations may be lists of URL patterns, which are not hashable.
+    # A reference to each one is kept so that its id is not reused
+    if middleware_paths is None:
+        forged_request_handler_key = (id(urlconf), None)
+    else:
+        forged_request_handler_key = (id(urlconf), tuple(middleware_paths))
+
+    if forged_request_handler_key not in _forged_request_handlers_by_key:
+        if middleware_paths is None:
+            forged_request_handler = _ForgedRequestHandler(urlconf)
+        else:
+            forged_request_handler = \
+                _LeanForgedRequestHandler(urlconf, middleware_paths)
+        _forged_request_handlers_by_key[forged_request_handler_key] = \
+            (urlconf, forged_request_handler)
+
+    _, forged_request_handler = \
+        _forged_request_handlers_by_key[forged_request_handler_key]
+    return forged_request_handler
+
+
+def _store_forged_request_exc_info(sender, request=None, **kwargs):
+    if request is not None and request.META.get(_FORGED_REQUEST_ENVIRON_KEY):
+        request._forged_request_exc_info = exc_info()
+
+
+def _clear_forged_request_handlers(setting, **kwargs):
+    if setting in ('MIDDLEWARE', FORGED_REQUEST_MIDDLEWARE_SETTING_NAME):
+        _forged_request_handlers_by_key.clear()
+
+
+got_request_exception.connect(
+    _store_forged_request_exc_info,
+    dispatch_uid=_FORGED_REQUEST_ENVIRON_KEY,
+)
+
+setting_changed.connect(
+    _clear_forged_request_handlers,
+    dispatch_uid=_FORGED_REQUEST_ENVIRON_KEY,
+)
@@ -0,0 +1,212 @@
+##############################################################################
+#
+# Copyright (c) 2015-2020, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of drf-nested-resources
+# <https://github.com/2degrees/drf-nested-resources>, which is subject to the
+# provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.db import router as db_router
+from django.db.migrations import AddIndex
+from django.db.migrations import Migration
+from django.db.migrations import SeparateDatabaseAndState
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.loader import MigrationLoader
+from django.db.models import Index
+from django.db.models.constants import LOOKUP_SEP
+from django.urls import URLResolver
+from pyrecord import Record
+
+MissingIndex = Record.create_type(
+    'MissingIndex',
+    'model',
+    'index_field_names',
+    'route_names',
+)
+
+_MIGRATION_NAME_SUFFIX = 'nested_resource_indexes'
+
+
+def get_relational_routes(urlpatterns):
+    relational_routes_by_key = OrderedDict()
+    for view in _iter_views(urlpatterns):
+        initkwargs = getattr(view, 'initkwargs', {})
+        for relational_route in initkwargs.get('relational_routes', ()):
+            relational_route_key = (
+                relational_route.name,
+                tuple(relational_route.ancestor_lookup_by_resource_name),
+            )
+            relational_routes_by_key[relational_route_key] = relational_route
+    return list(relational_routes_by_key.values())
+
+
+def get_missing_indexes(relational_routes):
+    route_names_by_index = OrderedDict()
+    for relational_route in relational_routes:
+        for model, field_names in _iter_required_indexes(relational_route):
+            route_names = \
+                route_names_by_index.setdefault((model, field_names), [])
+            route_names.append(relational_route.name)
+
+    missing_indexes = []
+    for model, field_names in _remove_redundant_indexes(route_names_by_index):
+        if not _is_index_present(model, field_names):
+            route_names = route_names_by_index[(model, field_names)]
+            missing_index = MissingIndex(model, field_names, route_names)
+            missing_indexes.append(missing_index)
+    return missing_indexes
+
+
+def make_index_migrations(missing_indexes):
+    missing_indexes_by_app_label = OrderedDict()
+    for missing_index in missing_indexes:
+        app_label = missing_index.model._meta.app_label
+        missing_indexes_by_app_label.setdefault(app_label, []) \
+            .append(missing_index)
+
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    migrations = []
+    for app_label, app_missing_indexes in \
+            missing_indexes_by_app_label.items():
+        if app_label not in loader.migrated_apps:
+            continue
+
+        leaf_nodes = loader.graph.leaf_nodes(app_label)
+        migration_number = max(
+            [MigrationAutodetector.parse_number(name) or 0
+             for _, name in leaf_nodes] or [0],
+        ) + 1
+        migration_name = \
+            '{:04d}_{}'.format(migration_number, _MIGRATION_NAME_SUFFIX)
+        migration = Migration(migration_name, app_label)
+        migration.dependencies = leaf_nodes
+        # The indexes are only added to the database so that the models do
+        # not have to declare them for the migrations to remain consistent
+        migration.operations = [
+            SeparateDatabaseAndState(database_operations=[
+                _make_add_index_operation(missing_index)
+                for missing_index in app_missing_indexes
+            ]),
+        ]
+        migrations.append(migration)
+    return migrations
+
+
+def _iter_views(urlpatterns):
+    for urlpattern in urlpatterns:
+        if isinstance(urlpattern, URLResolver):
+            yield from _iter_views(urlpattern.url_patterns)
+        else:
+            yield urlpattern.callback
+
+
+def _iter_required_indexes(relational_route):
+    ancestor_lookups = \
+        tuple(relational_route.ancestor_lookup_by_resource_name.values())
+    model = relational_route.viewset.queryset.model
+    ordering_field_names = _get_ordering_field_names(relational_route, model)
+
+    # The ancestor lookups are chained from the direct parent of the resource
+    # upwards, each one starting at the model reached by the previous one
+    is_direct_parent_lookup = True
+    for ancestor_lookup in reversed(ancestor_lookups):
+        for field_name in str(ancestor_lookup).split(LOOKUP_SEP):
+            try:
+                field = model._meta.get_field(field_name)
+            except FieldDoesNotExist:
+                return
+
+            is_foreign_key = field.concrete and \
+                (field.many_to_one or field.one_to_one)
+            if is_foreign_key:
+                field_names = (field.name,)
+                if is_direct_parent_lookup:
+                    field_names += ordering_field_names
+                yield model, field_names
+
+            is_direct_parent_lookup = False
+            model = field.related_model
+
+
+def _get_ordering_field_names(relational_route, model):
+    viewset = relational_route.viewset
+    ordering = viewset.queryset.query.order_by or model._meta.ordering
+    pagination_ordering = getattr(viewset.pagination_class, 'ordering', None)
+    if isinstance(pagination_ordering, str):
+        ordering = (pagination_ordering,)
+
+    field_names = ()
+    for order_by in ordering:
+        if not isinstance(order_by, str):
+            break
+
+        field_name = order_by.lstrip('-')
+        if field_name == 'pk' or LOOKUP_SEP in field_name:
+            break
+
+        try:
+            field = model._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            break
+
+        if field.primary_key:
+            break
+        field_names += (field.name,)
+    return field_names
+
+
+def _remove_redundant_indexes(indexes):
+    # An index also supports the lookups on any prefix of its fields
+    non_redundant_indexes = [
+        (model, field_names) for model, field_names in indexes
+        if not any(
+            other_model is model and
+            len(other_field_names) > len(field_names) and
+            other_field_names[:len(field_names)] == field_names
+            for other_model, other_field_names in indexes
+        )
+    ]
+    return non_redundant_indexes
+
+
+def _is_index_present(model, field_names):
+    columns = [model._meta.get_field(name).column for name in field_names]
+    connection = connections[db_router.db_for_read(model)]
+    with connection.cursor() as cursor:
+        # The indexes of tables which have not been created yet cannot be
+        # known, and they are likely to be created by pending migrations
+        if model._meta.db_table not in \
+                connection.introspection.table_names(cursor):
+            return True
+
+        constraints = connection.introspection.get_constraints(
+            cursor,
+            model._meta.db_table,
+        )
+
+    for constraint in constraints.values():
+        is_index = constraint['index'] or \
+            constraint['unique'] or \
+            constraint['primary_key']
+        constraint_columns = constraint['columns'] or []
+        if is_index and constraint_columns[:len(columns)] == columns:
+            return True
+    return False
+
+
+def _make_add_index_operation(missing_index):
+    model = missing_index.model
+    index = Index(fields=list(missing_index.index_field_names))
+    index.set_name_with_model(model)
+    return AddIndex(model._meta.model_name, index)
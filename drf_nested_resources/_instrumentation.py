@@ -0,0 +1,214 @@
+##############################################################################
+#
+# Copyright (c) 2015-2020, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of drf-nested-resources
+# <https://github.com/2degrees/drf-nested-resources>, which is subject to the
+# provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from collections import Counter
+from contextlib import ExitStack
+from contextlib import contextmanager
+from threading import local
+from time import perf_counter
+
+from django.db import connections
+from pyrecord import Record
+
+URL_REVERSAL_EVENT = 'url_reversal'
+
+FORGED_REQUEST_EVENT = 'forged_request'
+
+PARENT_LOOKUP_EVENT = 'parent_lookup'
+
+VIEW_PHASE = 'view'
+
+LOOKUP_HELPER_PHASE = 'lookup_helper'
+
+QueryPlan = Record.create_type(
+    'QueryPlan',
+    'route_name',
+    'phase',
+    'sql',
+    'plan',
+)
+
+SubrequestNode = Record.create_type(
+    'SubrequestNode',
+    'url',
+    'method',
+    'status_code',
+    'duration',
+    'queries',
+    'lookup_helper_counts',
+    'children',
+)
+
+SubrequestQuery = Record.create_type('SubrequestQuery', 'sql', 'duration')
+
+_local = local()
+
+
+@contextmanager
+def record_events():
+    events = Counter()
+    previous_events = getattr(_local, 'events', None)
+    _local.events = events
+    try:
+        yield events
+    finally:
+        _local.events = previous_events
+
+
+def record_event(event_name):
+    events = getattr(_local, 'events', None)
+    if events is not None:
+        events[event_name] += 1
+
+
+@contextmanager
+def record_query_plans():
+    query_plans = []
+    previous_query_plans = getattr(_local, 'query_plans', None)
+    _local.query_plans = query_plans
+    try:
+        with ExitStack() as exit_stack:
+            for connection in connections.all():
+                exit_stack.enter_context(
+                    connection.execute_wrapper(_explain_query),
+                )
+            yield query_plans
+    finally:
+        _local.query_plans = previous_query_plans
+
+
+@contextmanager
+def instrumentation_phase(route_name, phase):
+    if getattr(_local, 'query_plans', None) is None:
+        yield
+        return
+
+    labels = _local.__dict__.setdefault('labels', [])
+    labels.append((route_name, phase))
+    try:
+        yield
+    finally:
+        labels.pop()
+
+
+def _explain_query(execute, sql, params, many, context):
+    result = execute(sql, params, many, context)
+
+    query_plans = getattr(_local, 'query_plans', None)
+    is_explainable = query_plans is not None and \
+        not many and \
+        not getattr(_local, 'is_explaining', False) and \
+        sql.lstrip().upper().startswith('SELECT')
+    if is_explainable:
+        labels = getattr(_local, 'labels', None)
+        route_name, phase = labels[-1] if labels else (None, None)
+        plan = _get_query_plan(context['connection'], sql, params)
+        query_plans.append(QueryPlan(route_name, phase, sql, plan))
+    return result
+
+
+def _get_query_plan(connection, sql, params):
+    # The wrapper is also applied to the EXPLAIN query itself
+    _local.is_explaining = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                '{} {}'.format(connection.ops.explain_query_prefix(), sql),
+                params,
+            )
+            rows = cursor.fetchall()
+    finally:
+        _local.is_explaining = False
+
+    plan = '\n'.join(' '.join(str(column) for column in row) for row in rows)
+    return plan
+
+
+@contextmanager
+def record_subrequests(url, method):
+    root_node = _make_subrequest_node(url, method)
+    previous_subrequest_nodes = getattr(_local, 'subrequest_nodes', None)
+    _local.subrequest_nodes = [root_node]
+    start_time = perf_counter()
+    try:
+        with ExitStack() as exit_stack:
+            for connection in connections.all():
+                exit_stack.enter_context(
+                    connection.execute_wrapper(_record_subrequest_query),
+                )
+            yield root_node
+    finally:
+        root_node.duration = perf_counter() - start_time
+        _local.subrequest_nodes = previous_subrequest_nodes
+
+
+def is_recording_subrequests():
+    return bool(getattr(_local, 'subrequest_nodes', None))
+
+
+@contextmanager
+def instrumentation_subrequest(url, method):
+    subrequest_node = _make_subrequest_node(url, method)
+    subrequest_nodes = getattr(_local, 'subrequest_nodes', None)
+    if not subrequest_nodes:
+        yield subrequest_node
+        return
+
+    subrequest_nodes[-1].children.append(subrequest_node)
+    subrequest_nodes.append(subrequest_node)
+    start_time = perf_counter()
+    try:
+        yield subrequest_node
+    finally:
+        subrequest_node.duration = perf_counter() - start_time
+        subrequest_nodes.pop()
+
+
+def record_lookup_helper(resource_name, lookup_helper):
+    subrequest_nodes = getattr(_local, 'subrequest_nodes', None)
+    if subrequest_nodes:
+        lookup_helper_key = (
+            resource_name,
+            type(lookup_helper).__name__,
+            str(lookup_helper),
+        )
+        subrequest_nodes[-1].lookup_helper_counts[lookup_helper_key] += 1
+
+
+def _make_subrequest_node(url, method):
+    subrequest_node = SubrequestNode(
+        url,
+        method,
+        None,
+        None,
+        [],
+        Counter(),
+        [],
+    )
+    return subrequest_node
+
+
+def _record_subrequest_query(execute, sql, params, many, context):
+    start_time = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        # The queries explaining the others are not made by the request
+        subrequest_nodes = getattr(_local, 'subrequest_nodes', None)
+        is_explaining = getattr(_local, 'is_explaining', False)
+        if subrequest_nodes and not is_explaining:
+            subrequest_query = \
+                SubrequestQuery(sql, perf_counter() - start_time)
+            subrequest_nodes[-1].queries.append(subrequest_query)
@@ -0,0 +1,224 @@
+##############################################################################
+#
+# Copyright (c) 2015-2020, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of drf-nested-resources
+# <https://github.com/2degrees/drf-nested-resources>, which is subject to the
+# provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from contextlib import ExitStack
+from time import perf_counter
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+from django.db.transaction import atomic
+from django.db.transaction import set_rollback
+from django.test.client import Client
+from django.test.client import ClientHandler
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.test.utils import setup_databases
+from django.test.utils import teardown_databases
+from django.urls import resolve
+from pyrecord import Record
+
+from drf_nested_resources import DETAIL_VIEW_NAME_SUFFIX
+from drf_nested_resources import LIST_VIEW_NAME_SUFFIX
+from drf_nested_resources._index_advisor import get_relational_routes
+from drf_nested_resources._instrumentation import FORGED_REQUEST_EVENT
+from drf_nested_resources._instrumentation import URL_REVERSAL_EVENT
+from drf_nested_resources._instrumentation import record_events
+from drf_nested_resources._instrumentation import record_query_plans
+from drf_nested_resources.routers import _URLGenerator
+from drf_nested_resources.routers import make_urlpatterns_from_resources
+
+RouteProfile = Record.create_type(
+    'RouteProfile',
+    'view_name',
+    'url',
+    'status_code',
+    'query_count',
+    'forged_request_count',
+    'url_reversal_count',
+    'object_count',
+    'wall_time',
+)
+
+
+RouteExplanation = Record.create_type(
+    'RouteExplanation',
+    'view_name',
+    'url',
+    'status_code',
+    'query_plans',
+)
+
+
+def profile_routes(resources, host=None):
+    route_profiles = [
+        _profile_route(client, view_name, url)
+        for client, view_name, url in _iter_route_urls(resources, host)
+    ]
+    route_profiles.sort(key=_get_route_profile_cost, reverse=True)
+    return route_profiles
+
+
+def explain_routes(resources, host=None):
+    route_explanations = []
+    for client, view_name, url in _iter_route_urls(resources, host):
+        with record_query_plans() as query_plans:
+            response = client.get(urlsplit(url).path)
+        route_explanation = RouteExplanation(
+            view_name,
+            url,
+            response.status_code,
+            query_plans,
+        )
+        route_explanations.append(route_explanation)
+    return route_explanations
+
+
+def run_with_database(fixtures, function, *args):
+    if fixtures:
+        old_database_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            call_command('loaddata', *fixtures, verbosity=0)
+            result = function(*args)
+        finally:
+            teardown_databases(old_database_config, verbosity=0)
+    else:
+        # Only safe requests are made, but this guarantees that no data is
+        # changed in the configured database
+        with atomic():
+            result = function(*args)
+            set_rollback(True)
+    return result
+
+
+def get_default_host():
+    for allowed_host in settings.ALLOWED_HOSTS:
+        if allowed_host != '*':
+            return allowed_host.lstrip('.')
+    return 'localhost'
+
+
+def _iter_route_urls(resources, host):
+    host = host or get_default_host()
+    urlpatterns = make_urlpatterns_from_resources(resources)
+    relational_routes = get_relational_routes(urlpatterns)
+    url_generator = _URLGenerator(relational_routes)
+    client = _ProfilingClient(urlpatterns, SERVER_NAME=host)
+
+    request = RequestFactory(SERVER_NAME=host).get('/')
+    request.urlconf = urlpatterns
+
+    for relational_route in relational_routes:
+        route_urls = _get_route_urls(relational_route, url_generator, request)
+        for view_name, url in route_urls:
+            yield client, view_name, url
+
+
+def _get_route_urls(relational_route, url_generator, request):
+    # Lookup helpers may require the request to a resource in the collection
+    # (e.g., to follow a many-to-many relationship), which does not exist yet
+    ancestor_lookups = \
+        relational_route.ancestor_lookup_by_resource_name.values()
+    if not all(isinstance(lookup, str) for lookup in ancestor_lookups):
+        return ()
+
+    resource_object = relational_route.viewset.queryset.first()
+    if resource_object is None:
+        return ()
+
+    detail_view_name = relational_route.name + DETAIL_VIEW_NAME_SUFFIX
+    detail_url = url_generator(detail_view_name, resource_object, request)
+
+    detail_url_path = urlsplit(detail_url).path
+    detail_view_kwargs = \
+        resolve(detail_url_path, urlconf=request.urlconf).kwargs
+    list_view_kwargs = {
+        resource_name: resource_pk
+        for resource_name, resource_pk in detail_view_kwargs.items()
+        if resource_name != relational_route.name
+    }
+    list_view_name = relational_route.name + LIST_VIEW_NAME_SUFFIX
+    list_url = url_generator.reverse(list_view_name, list_view_kwargs, request)
+    return (list_view_name, list_url), (detail_view_name, detail_url)
+
+
+def _profile_route(client, view_name, url):
+    # The queries may be routed to any database (e.g., to shards)
+    with record_events() as events, ExitStack() as exit_stack:
+        captured_queries_by_connection = [
+            exit_stack.enter_context(CaptureQueriesContext(connection))
+            for connection in connections.all()
+        ]
+        start_time = perf_counter()
+        response = client.get(urlsplit(url).path)
+        wall_time = perf_counter() - start_time
+
+    query_count = sum(
+        len(captured_queries)
+        for captured_queries in captured_queries_by_connection
+    )
+    route_profile = RouteProfile(
+        view_name,
+        url,
+        response.status_code,
+        query_count,
+        events[FORGED_REQUEST_EVENT],
+        events[URL_REVERSAL_EVENT],
+        _count_objects(response),
+        wall_time,
+    )
+    return route_profile
+
+
+def _count_objects(response):
+    data = getattr(response, 'data', None)
+    if isinstance(data, dict) and isinstance(data.get('results'), list):
+        data = data['results']
+
+    if isinstance(data, list):
+        object_count = len(data)
+    elif isinstance(data, dict):
+        object_count = 1
+    else:
+        object_count = 0
+    return object_count
+
+
+def _get_route_profile_cost(route_profile):
+    route_profile_cost = (
+        route_profile.query_count,
+        route_profile.forged_request_count,
+        route_profile.wall_time,
+    )
+    return route_profile_cost
+
+
+class _ProfilingClient(Client):
+
+    def __init__(self, urlconf, **defaults):
+        super(_ProfilingClient, self).__init__(**defaults)
+        self.handler = _ProfilingClientHandler(urlconf)
+
+
+class _ProfilingClientHandler(ClientHandler):
+
+    def __init__(self, urlconf, *args, **kwargs):
+        super(_ProfilingClientHandler, self).__init__(*args, **kwargs)
+        self._urlconf = urlconf
+
+    def get_response(self, request):
+        request.urlconf = self._urlconf
+        return super(_ProfilingClientHandler, self).get_response(request)
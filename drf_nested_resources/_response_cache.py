@@ -0,0 +1,245 @@
+##############################################################################
+#
+# Copyright (c) 2015-2020, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of drf-nested-resources
+# <https://github.com/2degrees/drf-nested-resources>, which is subject to the
+# provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from collections import defaultdict
+from functools import partial
+from hashlib import md5
+from time import time
+from zlib import compress
+from zlib import decompress
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.transaction import on_commit
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.http.response import HttpResponse
+
+from drf_nested_resources.lookup_helpers import SimpleParentLookupHelper
+
+_CACHE_KEY_PREFIX = 'drf_nested_resources'
+
+_COLLECTION_GENERATION_MARKER = '*'
+
+_relational_routes_by_model = defaultdict(dict)
+
+_cache_aliases = set()
+
+
+def get_cached_response(
+    cache_alias,
+    request,
+    relational_route,
+    view_kwargs,
+    url_generator,
+):
+    cache = caches[cache_alias]
+    response_cache_key = _make_response_cache_key(
+        cache,
+        request,
+        relational_route,
+        view_kwargs,
+        url_generator,
+    )
+    cached_response_data = cache.get(response_cache_key)
+    if cached_response_data is None:
+        response = None
+    else:
+        status_code, headers, compressed_content = cached_response_data
+        response = \
+            HttpResponse(decompress(compressed_content), status=status_code)
+        for header_name, header_value in headers:
+            response[header_name] = header_value
+    return response, response_cache_key
+
+
+def cache_response(cache_alias, response_cache_key, response, timeout):
+    headers = [
+        (header_name, header_value)
+        for header_name, header_value in response.items()
+        if header_name.lower() != 'set-cookie'
+    ]
+    cached_response_data = (
+        response.status_code,
+        headers,
+        compress(response.content),
+    )
+    caches[cache_alias].set(response_cache_key, cached_response_data, timeout)
+
+
+def register_relational_routes_for_invalidation(
+    relational_routes,
+    cache_alias,
+):
+    _cache_aliases.add(cache_alias)
+    for relational_route in relational_routes:
+        model = relational_route.viewset.queryset.model
+        relational_route_key = (
+            relational_route.name,
+            tuple(
+                (resource_name, str(lookup)) for resource_name, lookup in
+                relational_route.ancestor_lookup_by_resource_name.items()
+            ),
+        )
+        _relational_routes_by_model[model][relational_route_key] = \
+            relational_route
+
+        dispatch_uid = '{}:{}'.format(_CACHE_KEY_PREFIX, model._meta.label)
+        post_save.connect(
+            _invalidate_cached_responses_on_signal,
+            sender=model,
+            dispatch_uid=dispatch_uid,
+        )
+        post_delete.connect(
+            _invalidate_cached_responses_on_signal,
+            sender=model,
+            dispatch_uid=dispatch_uid,
+        )
+
+
+def invalidate_cached_responses(instance):
+    _increment_generations(_get_generation_keys(instance))
+
+
+def _invalidate_cached_responses_on_signal(sender, instance, using, **kwargs):
+    # The ancestors are looked up right away, as they may be gone by the time
+    # the transaction is committed, but the responses must not be invalidated
+    # before then or they could be cached again from the previous state
+    generation_keys = _get_generation_keys(instance)
+    on_commit(partial(_increment_generations, generation_keys), using=using)
+
+
+def _get_generation_keys(instance):
+    generation_keys = {
+        _make_generation_key(type(instance), instance.pk),
+        _make_generation_key(type(instance), _COLLECTION_GENERATION_MARKER),
+    }
+    relational_routes = _relational_routes_by_model[type(instance)].values()
+    for relational_route in relational_routes:
+        ancestor_objects = _iter_ancestor_objects(instance, relational_route)
+        for ancestor_object in ancestor_objects:
+            ancestor_model = type(ancestor_object)
+            # The collections of the ancestors may include, expand or count
+            # the instance too
+            generation_keys.add(
+                _make_generation_key(ancestor_model, ancestor_object.pk),
+            )
+            generation_keys.add(
+                _make_generation_key(
+                    ancestor_model,
+                    _COLLECTION_GENERATION_MARKER,
+                ),
+            )
+    return generation_keys
+
+
+def _increment_generations(generation_keys):
+    for cache_alias in _cache_aliases:
+        cache = caches[cache_alias]
+        for generation_key in generation_keys:
+            try:
+                cache.incr(generation_key)
+            except ValueError:
+                cache.set(generation_key, _make_initial_generation(), None)
+
+
+def _iter_ancestor_objects(instance, relational_route):
+    current_object = instance
+    ancestor_lookups = \
+        tuple(relational_route.ancestor_lookup_by_resource_name.values())
+    for parent_lookup in reversed(ancestor_lookups):
+        # Lookup helpers other than the simple ones may require the request,
+        # which is not available when the invalidation is triggered
+        if not isinstance(parent_lookup, str):
+            break
+
+        parent_lookup_helper = SimpleParentLookupHelper(parent_lookup)
+        try:
+            current_object = parent_lookup_helper(current_object, None)
+        except (AttributeError, ObjectDoesNotExist):
+            break
+
+        if current_object is None:
+            break
+
+        yield current_object
+
+
+def _make_response_cache_key(
+    cache,
+    request,
+    relational_route,
+    view_kwargs,
+    url_generator,
+):
+    generation_keys = []
+    resource_names = \
+        list(relational_route.ancestor_lookup_by_resource_name) + \
+        [relational_route.name]
+    for resource_name in resource_names:
+        if resource_name in view_kwargs:
+            model = url_generator.get_model_class_for_resource(resource_name)
+            generation_keys.append(
+                _make_generation_key(model, view_kwargs[resource_name]),
+            )
+    if not generation_keys:
+        model = url_generator.get_model_class_for_resource(
+            relational_route.name,
+        )
+        generation_keys.append(
+            _make_generation_key(model, _COLLECTION_GENERATION_MARKER),
+        )
+    generations = _get_generations(cache, generation_keys)
+
+    request_variant = (
+        request.build_absolute_uri(),
+        request.META.get('HTTP_ACCEPT', ''),
+        request.META.get('HTTP_AUTHORIZATION', ''),
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME, ''),
+    )
+    request_variant_hash = md5(repr(request_variant).encode('utf-8'))
+
+    response_cache_key = '{}:response:{}:{}:{}'.format(
+        _CACHE_KEY_PREFIX,
+        relational_route.name,
+        request_variant_hash.hexdigest(),
+        '.'.join(str(generation) for generation in generations),
+    )
+    return response_cache_key
+
+
+def _get_generations(cache, generation_keys):
+    generations_by_key = cache.get_many(generation_keys)
+    for generation_key in generation_keys:
+        if generation_key not in generations_by_key:
+            cache.add(generation_key, _make_initial_generation(), None)
+            generations_by_key[generation_key] = cache.get(generation_key)
+    return [generations_by_key[key] for key in generation_keys]
+
+
+def _make_generation_key(model, pk):
+    generation_key = '{}:generation:{}:{}'.format(
+        _CACHE_KEY_PREFIX,
+        model._meta.label,
+        pk,
+    )
+    return generation_key
+
+
+def _make_initial_generation():
+    # Generations must not restart from the same value after being evicted,
+    # or else stale responses cached with that value would be served again
+    return int(time() * 1000000)
@@ -0,0 +1,82 @@
+##############################################################################
+#
+# Copyright (c) 2015-2020, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of drf-nested-resources
+# <https://github.com/2degrees/drf-nested-resources>, which is subject to the
+# provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from django.db.models.query import prefetch_related_objects
+from django.http.response import StreamingHttpResponse
+
+
+def make_streaming_list_response(
+    queryset,
+    serializer_factory,
+    renderer,
+    accepted_media_type,
+    renderer_context,
+    chunk_size,
+):
+    json_fragments = _iter_json_array_fragments(
+        queryset,
+        serializer_factory,
+        renderer,
+        accepted_media_type,
+        renderer_context,
+        chunk_size,
+    )
+    response = StreamingHttpResponse(
+        json_fragments,
+        content_type=accepted_media_type or renderer.media_type,
+    )
+    return response
+
+
+def _iter_json_array_fragments(
+    queryset,
+    serializer_factory,
+    renderer,
+    accepted_media_type,
+    renderer_context,
+    chunk_size,
+):
+    yield b'['
+    is_first_object = True
+    for objects in _iter_queryset_chunks(queryset, chunk_size):
+        serializer = serializer_factory(objects)
+        for object_data in serializer.data:
+            if not is_first_object:
+                yield b','
+            is_first_object = False
+
+            yield renderer.render(
+                object_data,
+                accepted_media_type,
+                renderer_context,
+            )
+    yield b']'
+
+
+def _iter_queryset_chunks(queryset, chunk_size):
+    # QuerySet.iterator() ignores prefetch_related() in this version of
+    # Django, so the prefetching is done explicitly on each chunk
+    prefetch_lookups = queryset._prefetch_related_lookups
+    objects = []
+    for object_ in queryset.iterator(chunk_size=chunk_size):
+        objects.append(object_)
+        if len(objects) == chunk_size:
+            prefetch_related_objects(objects, *prefetch_lookups)
+            yield objects
+            objects = []
+
+    if objects:
+        prefetch_related_objects(objects, *prefetch_lookups)
+        yield objects
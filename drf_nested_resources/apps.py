@@ -0,0 +1,32 @@
+##############################################################################
+#
+# Copyright (c) 2015-2020, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of drf-nested-resources
+# <https://github.com/2degrees/drf-nested-resources>, which is subject to the
+# provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from django.apps import AppConfig
+from django.core.checks import Tags
+from django.core.checks import register
+
+from drf_nested_resources.checks import check_nested_resource_indexes
+
+
+class NestedResourcesConfig(AppConfig):
+
+    name = 'drf_nested_resources'
+
+    verbose_name = 'Nested resources'
+
+    def ready(self):
+        # The check queries the database to introspect the indexes, so it is
+        # only run when the database checks are requested
+        register(check_nested_resource_indexes, Tags.database)
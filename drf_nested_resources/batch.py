@@ -0,0 +1,122 @@
+##############################################################################
+#
+# Copyright (c) 2015-2020, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of drf-nested-resources
+# <https://github.com/2degrees/drf-nested-resources>, which is subject to the
+# provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from json import loads as json_loads
+from urllib.parse import urlparse
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.urls import Resolver404
+from django.urls import resolve
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.status import HTTP_404_NOT_FOUND
+from rest_framework.views import APIView
+
+from drf_nested_resources._batch import BATCH_CACHES_ENVIRON_KEY
+from drf_nested_resources._batch import make_batch_caches
+from drf_nested_resources._forged_request import make_forged_environ
+from drf_nested_resources._instrumentation import instrumentation_subrequest
+
+
+class NestedBatchView(APIView):
+
+    max_batch_size = 50
+
+    def post(self, request, *args, **kwargs):
+        urls = self._get_urls(request)
+
+        # The ancestors shared by the sub-requests are retrieved and checked
+        # once for the whole batch
+        batch_caches = make_batch_caches()
+        responses_data = []
+        for url in urls:
+            subrequest = instrumentation_subrequest(url, 'GET')
+            with subrequest as subrequest_node:
+                response = self._make_response_for_url(
+                    request,
+                    url,
+                    batch_caches,
+                )
+                subrequest_node.status_code = response.status_code
+            responses_data.append({
+                'url': url,
+                'status': response.status_code,
+                'data': _get_response_data(response),
+            })
+        return Response({'responses': responses_data})
+
+    def _get_urls(self, request):
+        urls = request.data
+        is_url_list = isinstance(urls, list) and \
+            all(isinstance(url, str) for url in urls)
+        if not is_url_list:
+            raise ValidationError('Expected a list of URLs.')
+        if self.max_batch_size < len(urls):
+            raise ValidationError(
+                'Expected at most {} URLs.'.format(self.max_batch_size),
+            )
+        return urls
+
+    @staticmethod
+    def _make_response_for_url(request, url, batch_caches):
+        urlconf = getattr(request._request, 'urlconf', None)
+        url_path = urlparse(url).path
+        try:
+            resolver_match = resolve(url_path, urlconf)
+        except Resolver404:
+            return Response(status=HTTP_404_NOT_FOUND)
+
+        viewset = getattr(resolver_match.func, 'cls', None)
+        if getattr(viewset, 'relational_route', None) is None:
+            return Response(status=HTTP_404_NOT_FOUND)
+
+        # The sub-requests are made in-process, without going through the
+        # middleware, so they are authenticated like the batch request
+        environ = make_forged_environ(
+            request._request.environ,
+            'GET',
+            url,
+            {
+                'HTTP_ACCEPT': 'application/json',
+                BATCH_CACHES_ENVIRON_KEY: batch_caches,
+            },
+        )
+        subrequest = WSGIRequest(environ)
+        if urlconf is not None:
+            subrequest.urlconf = urlconf
+        subrequest.user = request.user
+        subrequest._force_auth_user = request.user
+        subrequest._force_auth_token = request.auth
+
+        response = resolver_match.func(
+            subrequest,
+            *resolver_match.args,
+            **resolver_match.kwargs
+        )
+        return response
+
+
+def _get_response_data(response):
+    if hasattr(response, 'data'):
+        return response.data
+
+    # Cached and streamed responses are already rendered
+    if response.streaming:
+        content = b''.join(response.streaming_content)
+    else:
+        content = response.content
+    response_data = json_loads(content.decode(response.charset)) \
+        if content else None
+    return response_data
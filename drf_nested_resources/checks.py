@@ -0,0 +1,43 @@
+##############################################################################
+#
+# Copyright (c) 2015-2020, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of drf-nested-resources
+# <https://github.com/2degrees/drf-nested-resources>, which is subject to the
+# provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from django.core.checks import Warning
+from django.urls import get_resolver
+
+from drf_nested_resources._index_advisor import get_missing_indexes
+from drf_nested_resources._index_advisor import get_relational_routes
+
+
+def check_nested_resource_indexes(app_configs=None, **kwargs):
+    relational_routes = get_relational_routes(get_resolver().url_patterns)
+    warnings = []
+    for missing_index in get_missing_indexes(relational_routes):
+        if app_configs is not None and \
+                missing_index.model._meta.app_config not in app_configs:
+            continue
+
+        warning = Warning(
+            'No index supports the lookups on ({}) made by the nested '
+            'resources {}'.format(
+                ', '.join(missing_index.index_field_names),
+                ', '.join(missing_index.route_names),
+            ),
+            hint='Run the "nested_resource_indexes" management command to '
+                 'create a migration adding the index.',
+            obj=missing_index.model,
+            id='drf_nested_resources.W001',
+        )
+        warnings.append(warning)
+    return warnings
@@ -0,0 +1,112 @@
+##############################################################################
+#
+# Copyright (c) 2015-2020, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of drf-nested-resources
+# <https://github.com/2degrees/drf-nested-resources>, which is subject to the
+# provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from collections import deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404
+from django.http import JsonResponse
+
+from drf_nested_resources._instrumentation import is_recording_subrequests
+from drf_nested_resources._instrumentation import record_query_plans
+from drf_nested_resources._instrumentation import record_subrequests
+
+QUERY_PLANS_SETTING_NAME = 'DRF_NESTED_RESOURCES_DEBUG_QUERY_PLANS'
+
+_REQUEST_TREE_HISTORY_LENGTH = 20
+
+_request_trees = deque(maxlen=_REQUEST_TREE_HISTORY_LENGTH)
+
+
+class NestedRequestTreeMiddleware:
+
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed()
+
+        super(NestedRequestTreeMiddleware, self).__init__()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # The requests forged to check the ancestors are recorded as part of
+        # the original request
+        if is_recording_subrequests():
+            return self.get_response(request)
+
+        with ExitStack() as exit_stack:
+            request_tree = exit_stack.enter_context(
+                record_subrequests(request.get_full_path(), request.method),
+            )
+            # Every query is explained again, so this is opt-in
+            if getattr(settings, QUERY_PLANS_SETTING_NAME, False):
+                query_plans = exit_stack.enter_context(record_query_plans())
+            else:
+                query_plans = []
+            response = self.get_response(request)
+            request_tree.status_code = response.status_code
+        _request_trees.appendleft((request_tree, query_plans))
+        return response
+
+
+def nested_request_trees_view(request):
+    if not settings.DEBUG:
+        raise Http404()
+
+    request_trees_data = []
+    for request_tree, query_plans in list(_request_trees):
+        request_tree_data = _serialize_subrequest_node(request_tree)
+        request_tree_data['query_plans'] = [
+            {
+                'route_name': query_plan.route_name,
+                'phase': query_plan.phase,
+                'sql': query_plan.sql,
+                'plan': query_plan.plan,
+            }
+            for query_plan in query_plans
+        ]
+        request_trees_data.append(request_tree_data)
+    return JsonResponse({'requests': request_trees_data})
+
+
+def _serialize_subrequest_node(subrequest_node):
+    queries_data = [
+        {'sql': query.sql, 'duration': query.duration}
+        for query in subrequest_node.queries
+    ]
+    lookup_helpers_data = [
+        {
+            'resource_name': resource_name,
+            'lookup_helper': lookup_helper_class_name,
+            'lookup': lookup,
+            'count': count,
+        }
+        for (resource_name, lookup_helper_class_name, lookup), count
+        in subrequest_node.lookup_helper_counts.items()
+    ]
+    subrequest_node_data = {
+        'url': subrequest_node.url,
+        'method': subrequest_node.method,
+        'status_code': subrequest_node.status_code,
+        'duration': subrequest_node.duration,
+        'queries': queries_data,
+        'lookup_helpers': lookup_helpers_data,
+        'children': [
+            _serialize_subrequest_node(child)
+            for child in subrequest_node.children
+        ],
+    }
+    return subrequest_node_data
@@ -14,13 +14,26 @@
 #
 ##############################################################################
 
+from collections import OrderedDict
+
+from django.db.models import Count
+from rest_framework.fields import Field
 from rest_framework.relations import HyperlinkedIdentityField
 from rest_framework.relations import HyperlinkedRelatedField
 from rest_framework.serializers import HyperlinkedModelSerializer
+from rest_framework.status import HTTP_200_OK
 
 from drf_nested_resources import DETAIL_VIEW_NAME_SUFFIX
 from drf_nested_resources import LIST_VIEW_NAME_SUFFIX
 
+INCLUDE_QUERY_PARAM = 'include'
+
+EXPAND_QUERY_PARAM = 'expand'
+
+FIELDS_QUERY_PARAM = 'fields'
+
+RELATIONSHIP_COUNT_FIELD_NAME_SUFFIX = '_count'
+
 
 class HyperlinkedNestedRelatedField(HyperlinkedRelatedField):
 
@@ -32,9 +45,16 @@ class HyperlinkedNestedRelatedField(HyperlinkedRelatedField):
         self._url_generator = url_generator
 
     def use_pk_only_optimization(self):
-        # Ensure that we never get PKOnlyObject in get_url since we require the
-        # full instance
-        return False
+        # The URL of a resource without ancestors (or with a shallow URL) only
+        # requires its primary key, but the full instance is required to look
+        # up any ancestor
+        if not self.view_name.endswith(DETAIL_VIEW_NAME_SUFFIX):
+            return False
+
+        resource_name = self.view_name[:-len(DETAIL_VIEW_NAME_SUFFIX)]
+        return self._url_generator.is_detail_url_reversible_from_pk(
+            resource_name,
+        )
 
     def get_url(self, obj, view_name, request, format):
         if hasattr(obj, 'pk'):
@@ -72,12 +92,222 @@ class HyperlinkedNestedIdentityField(HyperlinkedIdentityField):
         return self._url_generator(view_name, obj, request, format)
 
 
+class _ExpandedHyperlinkedNestedRelatedField(Field):
+
+    def __init__(
+        self,
+        hyperlink_field,
+        related_serializer,
+        related_resource_name,
+        url_generator,
+    ):
+        super(_ExpandedHyperlinkedNestedRelatedField, self).__init__(
+            read_only=True,
+            source=hyperlink_field.source,
+        )
+        self._hyperlink_field = hyperlink_field
+        self._related_serializer = related_serializer
+        self._related_resource_name = related_resource_name
+        self._url_generator = url_generator
+        # The expanded resources tend to share their ancestors
+        self._ancestor_check_statuses = {}
+
+    def bind(self, field_name, parent):
+        super(_ExpandedHyperlinkedNestedRelatedField, self).bind(
+            field_name,
+            parent,
+        )
+        self._hyperlink_field.bind(field_name, parent)
+        self._related_serializer.bind(field_name, parent)
+
+    def to_representation(self, value):
+        is_object_visible = _is_object_visible(
+            self._related_resource_name,
+            value,
+            self.context['request'],
+            self._url_generator,
+            self._ancestor_check_statuses,
+        )
+        if is_object_visible:
+            representation = self._related_serializer.to_representation(value)
+        else:
+            representation = self._hyperlink_field.to_representation(value)
+        return representation
+
+
+class _IncludedCollectionField(Field):
+
+    def __init__(self, hyperlink_field, related_serializer, related_view):
+        super(_IncludedCollectionField, self).__init__(
+            read_only=True,
+            source=hyperlink_field.source,
+        )
+        self._related_serializer = related_serializer
+        self._related_view = related_view
+
+    def bind(self, field_name, parent):
+        super(_IncludedCollectionField, self).bind(field_name, parent)
+        self._related_serializer.bind(field_name, parent)
+
+    def get_attribute(self, instance):
+        related_manager = \
+            super(_IncludedCollectionField, self).get_attribute(instance)
+        return related_manager.all()
+
+    def to_representation(self, value):
+        representation = [
+            self._related_serializer.to_representation(related_object)
+            for related_object in value
+            if _has_object_permission(self._related_view, related_object)
+        ]
+        return representation
+
+
+class _RelationshipCountField(Field):
+
+    def __init__(self, relationship_source):
+        super(_RelationshipCountField, self).__init__(read_only=True)
+        self.relationship_source = relationship_source
+
+    def get_attribute(self, instance):
+        # The count is annotated on the querysets of the nested viewsets, but
+        # not on objects obtained otherwise (e.g., newly-created ones)
+        if hasattr(instance, self.field_name):
+            return getattr(instance, self.field_name)
+        return getattr(instance, self.relationship_source).count()
+
+    def to_representation(self, value):
+        return value
+
+
 class HyperlinkedNestedModelSerializer(HyperlinkedModelSerializer):
 
     serializer_related_field = HyperlinkedNestedRelatedField
 
     serializer_url_field = HyperlinkedNestedIdentityField
 
+    def __init__(self, *args, **kwargs):
+        self._included_relationships = \
+            kwargs.pop('included_relationships', None)
+        self._expanded_relationships = \
+            kwargs.pop('expanded_relationships', None)
+        self._requested_field_names = \
+            kwargs.pop('requested_field_names', None)
+        super(HyperlinkedNestedModelSerializer, self).__init__(*args, **kwargs)
+
+    def get_fields(self):
+        fields = super(HyperlinkedNestedModelSerializer, self).get_fields()
+
+        if getattr(self.Meta, 'relationship_counts', False):
+            fields = _add_relationship_count_fields(fields)
+
+        requested_field_names = self._get_requested_field_names()
+        if requested_field_names:
+            fields = OrderedDict(
+                (field_name, field) for field_name, field in fields.items()
+                if field_name in requested_field_names
+            )
+
+        included_relationships = self._get_relationship_tree(
+            self._included_relationships,
+            INCLUDE_QUERY_PARAM,
+        )
+        for relationship_name, included_sub_relationships in \
+                included_relationships.items():
+            field = fields.get(relationship_name)
+            if not _is_collection_hyperlink_field(field):
+                continue
+
+            related_serializer_class = \
+                self._get_related_serializer_class(relationship_name)
+            if not _is_nested_serializer_class(related_serializer_class):
+                continue
+
+            # The collection is only included if it could be listed by itself
+            related_viewset = self.Meta.url_generator.get_viewset_for_resource(
+                self.Meta.view_names_by_relationship[relationship_name],
+            )
+            view = self.context.get('view')
+            related_view = make_included_collection_view(
+                related_viewset,
+                self.context.get('request'),
+                getattr(view, 'kwargs', {}),
+            )
+            if not has_view_permission(related_view):
+                continue
+
+            related_serializer = related_serializer_class(
+                read_only=True,
+                included_relationships=included_sub_relationships,
+                expanded_relationships={},
+                requested_field_names=(),
+            )
+            fields[relationship_name] = _IncludedCollectionField(
+                field,
+                related_serializer,
+                related_view,
+            )
+
+        expanded_relationships = self._get_relationship_tree(
+            self._expanded_relationships,
+            EXPAND_QUERY_PARAM,
+        )
+        for relationship_name, expanded_sub_relationships in \
+                expanded_relationships.items():
+            field = fields.get(relationship_name)
+            if not _is_resource_hyperlink_field(field):
+                continue
+
+            related_serializer_class = \
+                self._get_related_serializer_class(relationship_name)
+            if not _is_nested_serializer_class(related_serializer_class):
+                continue
+            related_serializer = related_serializer_class(
+                read_only=True,
+                included_relationships={},
+                expanded_relationships=expanded_sub_relationships,
+                requested_field_names=(),
+            )
+            fields[relationship_name] = _ExpandedHyperlinkedNestedRelatedField(
+                field,
+                related_serializer,
+                self.Meta.view_names_by_relationship[relationship_name],
+                self.Meta.url_generator,
+            )
+        return fields
+
+    def _get_related_serializer_class(self, relationship_name):
+        related_resource_name = \
+            self.Meta.view_names_by_relationship[relationship_name]
+        related_serializer_class = \
+            self.Meta.get_nested_serializer_class(related_resource_name)
+        return related_serializer_class
+
+    def _get_requested_field_names(self):
+        if self._requested_field_names is not None:
+            return self._requested_field_names
+
+        request = self.context.get('request')
+        if request is None or hasattr(self, 'initial_data'):
+            return ()
+
+        requested_field_names = parse_requested_field_names(
+            request.query_params.get(FIELDS_QUERY_PARAM, ''),
+        )
+        return requested_field_names
+
+    def _get_relationship_tree(self, relationship_tree, query_param):
+        if relationship_tree is not None:
+            return relationship_tree
+
+        request = self.context.get('request')
+        if request is None:
+            return {}
+
+        relationship_tree = \
+            parse_relationship_tree(request.query_params.get(query_param, ''))
+        return relationship_tree
+
     def build_url_field(self, field_name, model_class):
         field_class, field_kwargs = \
             super(HyperlinkedNestedModelSerializer, self).build_url_field(
@@ -107,3 +337,125 @@ class HyperlinkedNestedModelSerializer(HyperlinkedModelSerializer):
         field_kwargs['view_name'] = view_name + view_name_suffix
         field_kwargs['url_generator'] = self.Meta.url_generator
         return field_class, field_kwargs
+
+
+def get_relationship_count_annotations(serializer):
+    annotations = {
+        field_name: Count(field.relationship_source, distinct=True)
+        for field_name, field in serializer.fields.items()
+        if isinstance(field, _RelationshipCountField)
+    }
+    return annotations
+
+
+def make_included_collection_view(viewset_class, request, view_kwargs):
+    view = viewset_class(
+        request=request,
+        args=(),
+        kwargs=dict(view_kwargs),
+        format_kwarg=None,
+        action='list',
+    )
+    return view
+
+
+def has_view_permission(view):
+    has_permission = all(
+        permission.has_permission(view.request, view)
+        for permission in view.get_permissions()
+    )
+    return has_permission
+
+
+def parse_requested_field_names(field_names):
+    requested_field_names = frozenset(
+        field_name.strip() for field_name in field_names.split(',')
+        if field_name.strip()
+    )
+    return requested_field_names
+
+
+def parse_relationship_tree(relationship_paths):
+    relationship_tree = {}
+    for relationship_path in relationship_paths.split(','):
+        subtree = relationship_tree
+        for relationship_name in relationship_path.split('.'):
+            relationship_name = relationship_name.strip()
+            if not relationship_name:
+                break
+            subtree = subtree.setdefault(relationship_name, {})
+    return relationship_tree
+
+
+def _add_relationship_count_fields(fields):
+    fields_with_counts = OrderedDict()
+    for field_name, field in fields.items():
+        fields_with_counts[field_name] = field
+
+        relationship_source = field.source or field_name
+        is_countable = _is_collection_hyperlink_field(field) and \
+            '.' not in relationship_source
+        if is_countable:
+            count_field_name = \
+                field_name + RELATIONSHIP_COUNT_FIELD_NAME_SUFFIX
+            fields_with_counts[count_field_name] = \
+                _RelationshipCountField(relationship_source)
+    return fields_with_counts
+
+
+def _is_resource_hyperlink_field(field):
+    is_resource_hyperlink_field = \
+        isinstance(field, HyperlinkedNestedRelatedField) and \
+        field.view_name.endswith(DETAIL_VIEW_NAME_SUFFIX)
+    return is_resource_hyperlink_field
+
+
+def _is_nested_serializer_class(serializer_class):
+    # Other serializers cannot be told which relationships to include or expand
+    return issubclass(serializer_class, HyperlinkedNestedModelSerializer)
+
+
+def _is_object_visible(
+    resource_name,
+    object_,
+    request,
+    url_generator,
+    ancestor_check_statuses,
+):
+    # The resource is checked as if its own URL had been requested
+    view_kwargs = \
+        url_generator.get_view_kwargs(resource_name, object_, request)
+    viewset_class = url_generator.get_viewset_for_resource(resource_name)
+    view = viewset_class(
+        request=request,
+        args=(),
+        kwargs=view_kwargs,
+        format_kwarg=None,
+        action='retrieve',
+    )
+    is_object_visible = \
+        has_view_permission(view) and _has_object_permission(view, object_)
+    if is_object_visible:
+        ancestor_check_status = url_generator.get_ancestor_check_status(
+            resource_name,
+            view_kwargs,
+            request,
+            ancestor_check_statuses,
+        )
+        is_object_visible = ancestor_check_status in (None, HTTP_200_OK)
+    return is_object_visible
+
+
+def _has_object_permission(view, object_):
+    has_object_permission = all(
+        permission.has_object_permission(view.request, view, object_)
+        for permission in view.get_permissions()
+    )
+    return has_object_permission
+
+
+def _is_collection_hyperlink_field(field):
+    is_collection_hyperlink_field = \
+        isinstance(field, HyperlinkedNestedRelatedField) and \
+        field.view_name.endswith(LIST_VIEW_NAME_SUFFIX)
+    return is_collection_hyperlink_field
@@ -22,6 +22,10 @@ from django.db.models import ManyToManyField
 from django.db.models import ManyToManyRel
 from django.db.models.constants import LOOKUP_SEP
 
+from drf_nested_resources._batch import get_ancestor_object
+from drf_nested_resources._database_routing import \
+    get_database_alias_for_request
+
 
 class BaseParentLookupHelper(metaclass=ABCMeta):
 
@@ -56,7 +60,12 @@ class RequestParentLookupHelper(BaseParentLookupHelper):
     def __call__(self, current_object, request):
         parent_object_pk = self._extract_parent_object_pk_from_request(request)
         parent_model = self._get_parent_model(current_object)
-        parent_model_instance = parent_model.objects.get(pk=parent_object_pk)
+        parent_queryset = parent_model.objects.all()
+        database_alias = get_database_alias_for_request(request)
+        if database_alias:
+            parent_queryset = parent_queryset.using(database_alias)
+        parent_model_instance = \
+            get_ancestor_object(request, parent_queryset, parent_object_pk)
         return parent_model_instance
 
     def _extract_parent_object_pk_from_request(self, request):
@@ -0,0 +1,66 @@
+##############################################################################
+#
+# Copyright (c) 2015-2020, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of drf-nested-resources
+# <https://github.com/2degrees/drf-nested-resources>, which is subject to the
+# provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from abc import ABCMeta
+from abc import abstractmethod
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from drf_nested_resources._profiling import get_default_host
+from drf_nested_resources._profiling import run_with_database
+
+
+class BaseRoutesCommand(BaseCommand, metaclass=ABCMeta):
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'resources',
+            help='Dotted path to the resources passed to '
+                 'make_urlpatterns_from_resources()',
+        )
+        parser.add_argument(
+            '--fixture',
+            action='append',
+            dest='fixtures',
+            default=[],
+            help='Fixture to load into a test database to request the routes '
+                 'against, instead of the configured database',
+        )
+        parser.add_argument(
+            '--host',
+            default=None,
+            help='Host name of the requests (defaults to the first entry in '
+                 'ALLOWED_HOSTS)',
+        )
+
+    def handle(self, *args, **options):
+        resources = import_string(options['resources'])
+        host = options['host'] or get_default_host()
+        results = run_with_database(
+            options['fixtures'],
+            self.request_routes,
+            resources,
+            host,
+        )
+        self.write_results(results)
+
+    @abstractmethod
+    def request_routes(self, resources, host):
+        pass  # pragma: no cover
+
+    @abstractmethod
+    def write_results(self, results):
+        pass  # pragma: no cover
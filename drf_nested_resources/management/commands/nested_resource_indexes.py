@@ -0,0 +1,52 @@
+##############################################################################
+#
+# Copyright (c) 2015-2020, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of drf-nested-resources
+# <https://github.com/2degrees/drf-nested-resources>, which is subject to the
+# provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from django.core.management.base import BaseCommand
+from django.db.migrations.writer import MigrationWriter
+from django.urls import get_resolver
+
+from drf_nested_resources._index_advisor import get_missing_indexes
+from drf_nested_resources._index_advisor import get_relational_routes
+from drf_nested_resources._index_advisor import make_index_migrations
+
+
+class Command(BaseCommand):
+
+    help = 'Report the lookups of the nested resources which no index ' \
+        'supports, and optionally write migrations adding the indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--write-migrations',
+            action='store_true',
+            help='Write a migration adding the missing indexes to each app',
+        )
+
+    def handle(self, *args, **options):
+        relational_routes = get_relational_routes(get_resolver().url_patterns)
+        missing_indexes = get_missing_indexes(relational_routes)
+        for missing_index in missing_indexes:
+            self.stdout.write('{} ({}): {}'.format(
+                missing_index.model._meta.label,
+                ', '.join(missing_index.index_field_names),
+                ', '.join(missing_index.route_names),
+            ))
+
+        if options['write_migrations']:
+            for migration in make_index_migrations(missing_indexes):
+                migration_writer = MigrationWriter(migration)
+                with open(migration_writer.path, 'w') as migration_file:
+                    migration_file.write(migration_writer.as_string())
+                self.stdout.write('Wrote ' + migration_writer.path)
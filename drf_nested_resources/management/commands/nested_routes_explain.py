@@ -0,0 +1,42 @@
+##############################################################################
+#
+# Copyright (c) 2015-2020, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of drf-nested-resources
+# <https://github.com/2degrees/drf-nested-resources>, which is subject to the
+# provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from drf_nested_resources._profiling import explain_routes
+from drf_nested_resources.management._base import BaseRoutesCommand
+
+
+class Command(BaseRoutesCommand):
+
+    help = 'Explain the queries made by the list and detail routes of a ' \
+        'tree of nested resources'
+
+    def request_routes(self, resources, host):
+        return explain_routes(resources, host)
+
+    def write_results(self, route_explanations):
+        for route_explanation in route_explanations:
+            self.stdout.write('{} {} ({})'.format(
+                route_explanation.view_name,
+                route_explanation.url,
+                route_explanation.status_code,
+            ))
+            for query_plan in route_explanation.query_plans:
+                self.stdout.write('  [{} / {}] {}'.format(
+                    query_plan.route_name,
+                    query_plan.phase,
+                    query_plan.sql,
+                ))
+                for plan_line in query_plan.plan.splitlines():
+                    self.stdout.write('    ' + plan_line)
@@ -0,0 +1,52 @@
+##############################################################################
+#
+# Copyright (c) 2015-2020, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of drf-nested-resources
+# <https://github.com/2degrees/drf-nested-resources>, which is subject to the
+# provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from drf_nested_resources._profiling import profile_routes
+from drf_nested_resources.management._base import BaseRoutesCommand
+
+
+class Command(BaseRoutesCommand):
+
+    help = 'Profile the list and detail routes of a tree of nested resources'
+
+    def request_routes(self, resources, host):
+        return profile_routes(resources, host)
+
+    def write_results(self, route_profiles):
+        self.stdout.write('{:<30} {:>6} {:>7} {:>6} {:>13} {:>9}'.format(
+            'View',
+            'Status',
+            'Queries',
+            'Forged',
+            'URLs / object',
+            'Time (ms)',
+        ))
+        for route_profile in route_profiles:
+            if route_profile.object_count:
+                url_reversals_per_object = \
+                    route_profile.url_reversal_count / \
+                    route_profile.object_count
+            else:
+                url_reversals_per_object = 0
+            self.stdout.write(
+                '{:<30} {:>6} {:>7} {:>6} {:>13.1f} {:>9.1f}'.format(
+                    route_profile.view_name,
+                    route_profile.status_code,
+                    route_profile.query_count,
+                    route_profile.forged_request_count,
+                    url_reversals_per_object,
+                    route_profile.wall_time * 1000,
+                ),
+            )
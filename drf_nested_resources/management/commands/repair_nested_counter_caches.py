@@ -0,0 +1,47 @@
+##############################################################################
+#
+# Copyright (c) 2015-2020, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of drf-nested-resources
+# <https://github.com/2degrees/drf-nested-resources>, which is subject to the
+# provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from django.urls import get_resolver
+
+from drf_nested_resources._counter_cache import repair_counter_caches
+
+
+class Command(BaseCommand):
+
+    help = 'Recompute the counter caches of the nested resources'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='Database to repair the counter caches in (defaults to '
+                 '"{}")'.format(DEFAULT_DB_ALIAS),
+        )
+
+    def handle(self, *args, **options):
+        # The counter caches are registered when the URL patterns are made
+        get_resolver().url_patterns
+
+        counter_caches = repair_counter_caches(options['database'])
+        for counter_cache in counter_caches:
+            parent_foreign_key = counter_cache.parent_foreign_key
+            self.stdout.write('Repaired {}.{} (from {}.{})'.format(
+                parent_foreign_key.related_model._meta.label,
+                counter_cache.counter_field_name,
+                parent_foreign_key.model._meta.label,
+                parent_foreign_key.name,
+            ))
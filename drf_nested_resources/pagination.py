@@ -0,0 +1,314 @@
+##############################################################################
+#
+# Copyright (c) 2015-2020, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of drf-nested-resources
+# <https://github.com/2degrees/drf-nested-resources>, which is subject to the
+# provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from base64 import b64decode
+from base64 import b64encode
+from collections import OrderedDict
+from functools import partial
+from urllib.parse import parse_qs
+from urllib.parse import urlencode
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.fields.related import ForeignKey
+from pyrecord import Record
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from drf_nested_resources import LIST_VIEW_NAME_SUFFIX
+
+_Cursor = Record.create_type('Cursor', 'position', 'pk', 'is_reversed')
+
+
+class NestedKeysetPagination(BasePagination):
+
+    page_size = api_settings.PAGE_SIZE
+
+    cursor_query_param = 'cursor'
+
+    ordering = 'pk'
+
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        super(NestedKeysetPagination, self).__init__()
+        self._request = None
+        self._view = None
+        self._next_cursor = None
+        self._previous_cursor = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.page_size:
+            return None
+
+        self._request = request
+        self._view = view
+
+        model = queryset.model
+        ordering_field_name, is_descending = _parse_ordering(self.ordering)
+        pk_field = model._meta.pk
+        if ordering_field_name == 'pk':
+            ordering_field = pk_field
+        else:
+            ordering_field = model._meta.get_field(ordering_field_name)
+        # NULLs cannot be sought past, nor encoded in the cursor. The primary
+        # key breaks the ties between equal values of the ordering field
+        if ordering_field.null:
+            raise ImproperlyConfigured(
+                'Keyset pagination cannot be ordered by the nullable field '
+                '{}.{}'.format(model.__name__, ordering_field.name),
+            )
+
+        cursor = self._decode_cursor(request, ordering_field, pk_field)
+        is_reversed = bool(cursor and cursor.is_reversed)
+        if cursor:
+            seek_filter = _make_seek_filter(
+                ordering_field,
+                pk_field,
+                cursor,
+                is_descending != is_reversed,
+            )
+            queryset = queryset.filter(seek_filter)
+
+        order_by = _make_seek_ordering(
+            view,
+            model,
+            ordering_field,
+            pk_field,
+            is_descending != is_reversed,
+        )
+        objects = list(queryset.order_by(*order_by)[:self.page_size + 1])
+        has_following_objects = len(objects) > self.page_size
+        objects = objects[:self.page_size]
+        if is_reversed:
+            objects.reverse()
+            has_next_page = True
+            has_previous_page = has_following_objects
+        else:
+            has_next_page = has_following_objects
+            has_previous_page = cursor is not None
+
+        if objects and has_next_page:
+            self._next_cursor = _make_cursor(
+                objects[-1],
+                ordering_field,
+                pk_field,
+                False,
+            )
+        if objects and has_previous_page:
+            self._previous_cursor = _make_cursor(
+                objects[0],
+                ordering_field,
+                pk_field,
+                True,
+            )
+
+        return objects
+
+    def get_paginated_response(self, data):
+        response_data = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ])
+        return Response(response_data)
+
+    def get_next_link(self):
+        return self._make_link(self._next_cursor)
+
+    def get_previous_link(self):
+        return self._make_link(self._previous_cursor)
+
+    def _make_link(self, cursor):
+        if cursor is None:
+            return None
+
+        collection_view_name = \
+            self._view.relational_route.name + LIST_VIEW_NAME_SUFFIX
+        collection_view_kwargs = {
+            resource_name: self._view.kwargs[resource_name]
+            for resource_name in
+            self._view.relational_route.ancestor_lookup_by_resource_name
+        }
+        url = self._view._url_generator.reverse(
+            collection_view_name,
+            collection_view_kwargs,
+            self._request,
+        )
+        query_string = self._request.META.get('QUERY_STRING')
+        if query_string:
+            url = '{}?{}'.format(url, query_string)
+
+        url = replace_query_param(
+            url,
+            self.cursor_query_param,
+            _encode_cursor(cursor),
+        )
+        return url
+
+    def _decode_cursor(self, request, ordering_field, pk_field):
+        encoded_cursor = request.query_params.get(self.cursor_query_param)
+        if encoded_cursor is None:
+            return None
+
+        try:
+            query_string = \
+                b64decode(encoded_cursor.encode('ascii')).decode('ascii')
+            tokens = parse_qs(query_string, keep_blank_values=True)
+            position = ordering_field.to_python(tokens['o'][0])
+            pk = pk_field.to_python(tokens['p'][0])
+            is_reversed = bool(int(tokens.get('r', ['0'])[0]))
+        except (KeyError, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return _Cursor(position, pk, is_reversed)
+
+
+class NestedPageNumberPagination(PageNumberPagination):
+
+    def paginate_queryset(self, queryset, request, view=None):
+        collection_count = _get_cached_collection_count(view)
+        if collection_count is not None:
+            self.django_paginator_class = \
+                partial(_CountedPaginator, count=collection_count)
+        return super(NestedPageNumberPagination, self).paginate_queryset(
+            queryset,
+            request,
+            view,
+        )
+
+
+class NestedLimitOffsetPagination(LimitOffsetPagination):
+
+    def __init__(self):
+        super(NestedLimitOffsetPagination, self).__init__()
+        self._view = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self._view = view
+        return super(NestedLimitOffsetPagination, self).paginate_queryset(
+            queryset,
+            request,
+            view,
+        )
+
+    def get_count(self, queryset):
+        collection_count = _get_cached_collection_count(self._view)
+        if collection_count is None:
+            collection_count = \
+                super(NestedLimitOffsetPagination, self).get_count(queryset)
+        return collection_count
+
+
+class _CountedPaginator(DjangoPaginator):
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super(_CountedPaginator, self).__init__(
+            object_list,
+            per_page,
+            **kwargs
+        )
+        self.count = count
+
+
+def _get_cached_collection_count(view):
+    get_cached_collection_count = \
+        getattr(view, 'get_cached_collection_count', None)
+    if get_cached_collection_count is None:
+        return None
+    return get_cached_collection_count()
+
+
+def _parse_ordering(ordering):
+    is_descending = ordering.startswith('-')
+    field_name = ordering.lstrip('-')
+    return field_name, is_descending
+
+
+def _make_seek_filter(ordering_field, pk_field, cursor, is_descending):
+    comparison = 'lt' if is_descending else 'gt'
+    pk_filter = Q(**{'pk__' + comparison: cursor.pk})
+    if ordering_field == pk_field:
+        seek_filter = pk_filter
+    else:
+        ordering_field_name = ordering_field.name
+        seek_filter = \
+            Q(**{ordering_field_name + '__' + comparison: cursor.position}) | \
+            (Q(**{ordering_field_name: cursor.position}) & pk_filter)
+    return seek_filter
+
+
+def _make_seek_ordering(view, model, ordering_field, pk_field, is_descending):
+    field_names = []
+
+    # The parent FK is constant within the collection, but ordering by it as
+    # well lets the database use a composite index starting with that column
+    direct_parent_field = _get_direct_parent_foreign_key(view, model)
+    if direct_parent_field:
+        field_names.append(direct_parent_field.attname)
+
+    if ordering_field != pk_field:
+        field_names.append(ordering_field.name)
+    field_names.append('pk')
+
+    direction_prefix = '-' if is_descending else ''
+    return [direction_prefix + field_name for field_name in field_names]
+
+
+def _get_direct_parent_foreign_key(view, model):
+    relational_route = getattr(view, 'relational_route', None)
+    if not relational_route:
+        return None
+
+    ancestor_lookups = \
+        tuple(relational_route.ancestor_lookup_by_resource_name.values())
+    if not ancestor_lookups:
+        return None
+
+    # The first column of a lookup spanning several relationships (or of a
+    # lookup helper) varies within the collection, so it would have to be
+    # sought past along with the ordering field
+    direct_parent_lookup = ancestor_lookups[-1]
+    if not isinstance(direct_parent_lookup, str) or \
+            LOOKUP_SEP in direct_parent_lookup:
+        return None
+
+    field = model._meta.get_field(direct_parent_lookup)
+    if not isinstance(field, ForeignKey):
+        return None
+    return field
+
+
+def _make_cursor(object_, ordering_field, pk_field, is_reversed):
+    position = ordering_field.value_to_string(object_)
+    pk = pk_field.value_to_string(object_)
+    return _Cursor(position, pk, is_reversed)
+
+
+def _encode_cursor(cursor):
+    tokens = {'o': cursor.position, 'p': cursor.pk}
+    if cursor.is_reversed:
+        tokens['r'] = '1'
+    query_string = urlencode(tokens)
+    encoded_cursor = b64encode(query_string.encode('ascii')).decode('ascii')
+    return encoded_cursor
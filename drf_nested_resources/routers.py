@@ -16,30 +16,92 @@
 
 from collections import OrderedDict
 from collections import defaultdict
+from functools import lru_cache
+from functools import partial
 from re import IGNORECASE
 from re import compile as compile_regex
 
 from django.conf import settings
-from django.core.exceptions import ObjectDoesNotExist
+from django.core.cache import DEFAULT_CACHE_ALIAS
+from django.core.exceptions import FieldDoesNotExist
+from django.core.exceptions import ImproperlyConfigured
+from django.core.exceptions import ValidationError
+from django.db import router as db_router
+from django.db.models import Prefetch
 from django.db.models.constants import LOOKUP_SEP
 from django.db.models.fields.related import ForeignKey
 from django.db.models.fields.related import ManyToManyField
 from django.db.models.fields.related import ManyToManyRel
 from django.db.models.fields.related import OneToOneRel
+from django.db.transaction import atomic
 from django.http import Http404
 from pyrecord import Record
 from rest_framework.exceptions import NotAuthenticated
 from rest_framework.exceptions import PermissionDenied
+from rest_framework.generics import GenericAPIView
+from rest_framework.mixins import ListModelMixin
+from rest_framework.mixins import RetrieveModelMixin
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
 from rest_framework.reverse import reverse
 from rest_framework.routers import DefaultRouter
+from rest_framework.routers import Route
+from rest_framework.serializers import ModelSerializer
+from rest_framework.serializers import raise_errors_on_nested_writes
 from rest_framework.status import HTTP_200_OK
 from rest_framework.status import HTTP_401_UNAUTHORIZED
 from rest_framework.status import HTTP_403_FORBIDDEN
 from rest_framework.status import HTTP_404_NOT_FOUND
+from rest_framework.utils.model_meta import get_field_info
 
 from drf_nested_resources import DETAIL_VIEW_NAME_SUFFIX
 from drf_nested_resources import LIST_VIEW_NAME_SUFFIX
+from drf_nested_resources import SHALLOW_DETAIL_VIEW_NAME_SUFFIX
+from drf_nested_resources._batch import get_batch_caches
+from drf_nested_resources._conditional_requests import \
+    get_collection_validators
+from drf_nested_resources._conditional_requests import get_resource_validators
+from drf_nested_resources._conditional_requests import \
+    is_resource_not_modified
+from drf_nested_resources._conditional_requests import \
+    make_not_modified_response
+from drf_nested_resources._conditional_requests import set_validator_headers
+from drf_nested_resources._counter_cache import TOTAL_COUNT_HEADER_NAME
+from drf_nested_resources._counter_cache import get_counter_cache
+from drf_nested_resources._counter_cache import get_counter_cache_value
+from drf_nested_resources._counter_cache import register_counter_cache
+from drf_nested_resources._database_routing import \
+    ROOT_ANCESTOR_DATABASE_ROUTER_SETTING_NAME
+from drf_nested_resources._database_routing import \
+    get_database_alias_for_request
+from drf_nested_resources._database_routing import \
+    get_database_alias_for_route
+from drf_nested_resources._database_routing import pin_to_primary_database
 from drf_nested_resources._forged_request import RequestForger
+from drf_nested_resources._instrumentation import FORGED_REQUEST_EVENT
+from drf_nested_resources._instrumentation import LOOKUP_HELPER_PHASE
+from drf_nested_resources._instrumentation import PARENT_LOOKUP_EVENT
+from drf_nested_resources._instrumentation import URL_REVERSAL_EVENT
+from drf_nested_resources._instrumentation import VIEW_PHASE
+from drf_nested_resources._instrumentation import instrumentation_phase
+from drf_nested_resources._instrumentation import instrumentation_subrequest
+from drf_nested_resources._instrumentation import record_event
+from drf_nested_resources._instrumentation import record_lookup_helper
+from drf_nested_resources._response_cache import cache_response
+from drf_nested_resources._response_cache import get_cached_response
+from drf_nested_resources._response_cache import \
+    register_relational_routes_for_invalidation
+from drf_nested_resources._streaming import make_streaming_list_response
+from drf_nested_resources.fields import EXPAND_QUERY_PARAM
+from drf_nested_resources.fields import FIELDS_QUERY_PARAM
+from drf_nested_resources.fields import INCLUDE_QUERY_PARAM
+from drf_nested_resources.fields import HyperlinkedNestedModelSerializer
+from drf_nested_resources.fields import get_relationship_count_annotations
+from drf_nested_resources.fields import has_view_permission
+from drf_nested_resources.fields import make_included_collection_view
+from drf_nested_resources.fields import parse_relationship_tree
+from drf_nested_resources.fields import parse_requested_field_names
 from drf_nested_resources.lookup_helpers import SimpleParentLookupHelper, \
     BaseParentLookupHelper
 
@@ -57,6 +119,8 @@ Resource = Record.create_type(
 NestedResource = Resource.extend_type(
     'NestedResource',
     'parent_field_lookup',
+    'parent_counter_cache_field',
+    parent_counter_cache_field=None,
 )
 
 _RelationalRoute = Record.create_type(
@@ -66,22 +130,69 @@ _RelationalRoute = Record.create_type(
     'viewset',
     'ancestor_lookup_by_resource_name',
     'ancestor_collection_name_by_resource_name',
+    'parent_counter_cache_field',
+    parent_counter_cache_field=None,
 )
 
 _VALID_PYTHON_IDENTIFIER_RE = compile_regex(r"^[a-z_]\w*$", IGNORECASE)
 
 
-def make_urlpatterns_from_resources(resources, router_class=None):
+def make_urlpatterns_from_resources(
+    resources,
+    router_class=None,
+    shallow_detail_routes=False,
+    shallow_detail_urls=False,
+):
+    if shallow_detail_urls and not shallow_detail_routes:
+        raise ImproperlyConfigured(
+            'Shallow detail URLs require shallow detail routes',
+        )
+
+    # The database of a resource routed by its root ancestor is unknown until
+    # the ancestors are retrieved along with the resource, on that database
+    is_root_ancestor_database_routing_enabled = getattr(
+        settings,
+        ROOT_ANCESTOR_DATABASE_ROUTER_SETTING_NAME,
+        None,
+    ) is not None
+    if shallow_detail_routes and is_root_ancestor_database_routing_enabled:
+        raise ImproperlyConfigured(
+            'Shallow detail routes cannot be used along with {}'.format(
+                ROOT_ANCESTOR_DATABASE_ROUTER_SETTING_NAME,
+            ),
+        )
+
     _format_resource_names(resources)
 
+    flattened_resources = _flatten_nested_resources(resources)
+    if shallow_detail_routes:
+        shallow_detail_resource_names = frozenset(
+            flattened_resource.name
+            for flattened_resource in flattened_resources
+            if _is_shallow_detail_route_supported(flattened_resource)
+        )
+    else:
+        shallow_detail_resource_names = frozenset()
+    _check_shallow_detail_route_prefixes(
+        flattened_resources,
+        shallow_detail_resource_names,
+    )
+
     router_class = router_class or DefaultRouter
-    nested_router_class = _create_nested_route_router(router_class, resources)
+    nested_router_class = _create_nested_route_router(
+        router_class,
+        resources,
+        shallow_detail_resource_names if shallow_detail_urls else frozenset(),
+    )
     router = nested_router_class()
+    shallow_detail_router = \
+        _create_shallow_detail_route_router(nested_router_class)()
 
     relationships_by_resource_name = defaultdict(dict)
     _populate_resource_relationships(resources, relationships_by_resource_name)
 
-    flattened_resources = _flatten_nested_resources(resources)
+    _register_flattened_resources_for_cache_invalidation(flattened_resources)
+    _register_flattened_resources_counter_caches(flattened_resources)
 
     for flattened_resource in flattened_resources:
         url_path = _create_url_path_from_flattened_resource(flattened_resource)
@@ -91,10 +202,64 @@ def make_urlpatterns_from_resources(resources, router_class=None):
         )
 
         router.register(url_path, nested_viewset, flattened_resource.name)
-    urlpatterns = router.urls
+
+        if flattened_resource.name in shallow_detail_resource_names:
+            shallow_detail_router.register(
+                flattened_resource.collection_name,
+                _create_shallow_detail_viewset(
+                    nested_viewset,
+                    flattened_resource,
+                ),
+                flattened_resource.name + '-shallow',
+            )
+    urlpatterns = router.urls + shallow_detail_router.urls
     return tuple(urlpatterns)
 
 
+def _register_flattened_resources_for_cache_invalidation(flattened_resources):
+    cached_resource_names = {
+        flattened_resource.name for flattened_resource in flattened_resources
+        if getattr(flattened_resource.viewset, 'response_cache_timeout', None)
+        is not None
+    }
+    # The cached responses are invalidated through the ancestors of the
+    # resources changed, which lookup helpers cannot give without a request.
+    # The ancestors of such routes are covered too, as they may include them
+    for flattened_resource in flattened_resources:
+        ancestor_lookups = \
+            flattened_resource.ancestor_lookup_by_resource_name.values()
+        if all(isinstance(lookup, str) for lookup in ancestor_lookups):
+            continue
+
+        resource_names = \
+            {flattened_resource.name} | \
+            set(flattened_resource.ancestor_lookup_by_resource_name)
+        if resource_names & cached_resource_names:
+            raise ImproperlyConfigured(
+                'Responses cannot be cached for {!r} nor its ancestors, as it '
+                'is looked up with a helper'.format(flattened_resource.name),
+            )
+
+    for flattened_resource in flattened_resources:
+        viewset = flattened_resource.viewset
+        if getattr(viewset, 'response_cache_timeout', None) is not None:
+            register_relational_routes_for_invalidation(
+                flattened_resources,
+                getattr(viewset, 'response_cache_alias', DEFAULT_CACHE_ALIAS),
+            )
+
+
+def _register_flattened_resources_counter_caches(flattened_resources):
+    for flattened_resource in flattened_resources:
+        counter_field_name = flattened_resource.parent_counter_cache_field
+        if counter_field_name:
+            register_counter_cache(
+                flattened_resource.viewset.queryset.model,
+                _get_parent_field_lookup(flattened_resource),
+                counter_field_name,
+            )
+
+
 def _format_resource_names(resources):
     for resource in resources:
         resource.name = _format_resource_name(resource.name)
@@ -107,17 +272,22 @@ def _format_resource_name(name):
     return formatted_name
 
 
-def _create_nested_route_router(router_class, resources):
+def _create_nested_route_router(
+    router_class,
+    resources,
+    shallow_detail_resource_names,
+):
     relational_routes = _flatten_nested_resources(resources)
+    url_generator_kwargs = {
+        'relational_routes': relational_routes,
+        'shallow_detail_resource_names': shallow_detail_resource_names,
+    }
 
     class NestedRouteRouter(router_class):
         def get_routes(self, viewset):
             routes = []
             for route in super(NestedRouteRouter, self).get_routes(viewset):
-                viewset_kwargs = dict(
-                    route.initkwargs,
-                    relational_routes=relational_routes,
-                )
+                viewset_kwargs = dict(route.initkwargs, **url_generator_kwargs)
                 route = route._replace(initkwargs=viewset_kwargs)
                 routes.append(route)
             return routes
@@ -125,6 +295,63 @@ def _create_nested_route_router(router_class, resources):
     return NestedRouteRouter
 
 
+def _create_shallow_detail_route_router(nested_router_class):
+
+    class ShallowDetailRouteRouter(nested_router_class):
+        routes = [
+            route for route in nested_router_class.routes
+            if isinstance(route, Route) and
+            route.name == '{basename}' + DETAIL_VIEW_NAME_SUFFIX
+        ]
+
+        include_root_view = False
+
+    return ShallowDetailRouteRouter
+
+
+def _is_shallow_detail_route_supported(flattened_resource):
+    if not flattened_resource.ancestor_lookup_by_resource_name or \
+            not hasattr(flattened_resource.viewset, 'retrieve'):
+        return False
+
+    # The ancestors of the resource are retrieved along with it, so each one
+    # must be unique and reachable without a lookup helper
+    model = flattened_resource.viewset.queryset.model
+    for _, parent_lookup in \
+            _get_resource_ancestors_and_lookups(flattened_resource):
+        if not isinstance(parent_lookup, str):
+            return False
+        for field_name in parent_lookup.split(LOOKUP_SEP):
+            if not _is_to_one_relationship(model, field_name):
+                return False
+            model = model._meta.get_field(field_name).related_model
+    return True
+
+
+def _check_shallow_detail_route_prefixes(
+    flattened_resources,
+    shallow_detail_resource_names,
+):
+    # The shallow routes are registered at the root, next to the top-level
+    # resources, so their collection names must not clash with any of these
+    route_prefixes = {
+        flattened_resource.collection_name
+        for flattened_resource in flattened_resources
+        if not flattened_resource.ancestor_lookup_by_resource_name
+    }
+    for flattened_resource in flattened_resources:
+        if flattened_resource.name not in shallow_detail_resource_names:
+            continue
+
+        route_prefix = flattened_resource.collection_name
+        if route_prefix in route_prefixes:
+            raise ImproperlyConfigured(
+                'Shallow detail route for {!r} clashes with another route at '
+                '{!r}'.format(flattened_resource.name, route_prefix),
+            )
+        route_prefixes.add(route_prefix)
+
+
 def _flatten_nested_resources(
         resources,
         ancestor_lookup_by_resource_name=None,
@@ -166,6 +393,7 @@ def _flatten_nested_resources(
             resource.viewset,
             parent_lookups_by_resource_collection_name,
             resource_ancestor_collection_name_by_resource_name,
+            getattr(resource, 'parent_counter_cache_field', None),
         )
         descendant_resources = _flatten_nested_resources(
             resource.sub_resources,
@@ -281,65 +509,213 @@ def _create_url_path_from_flattened_resource(flattened_resource):
 
 def _create_nested_viewset(flattened_resource, relationships_by_resource_name):
     route_viewset = flattened_resource.viewset
+    nested_viewset_bases = \
+        _get_nested_viewset_mixins(flattened_resource) + (route_viewset,)
+    nested_serializer_classes = {}
 
-    class NestedViewSet(route_viewset):
+    class NestedViewSet(*nested_viewset_bases):
 
         lookup_url_kwarg = flattened_resource.name
 
+        relational_route = flattened_resource
+
         def __init__(self, *args, **kwargs):
             relational_routes = kwargs.pop('relational_routes', ())
+            shallow_detail_resource_names = \
+                kwargs.pop('shallow_detail_resource_names', frozenset())
             super(NestedViewSet, self).__init__(*args, **kwargs)
-            self._url_generator = _URLGenerator(relational_routes)
+            self._relational_routes = relational_routes
+            self._url_generator = _URLGenerator(
+                relational_routes,
+                shallow_detail_resource_names,
+            )
 
         @property
         def relational_routes(self):
             return self._relational_routes
 
-        def get_serializer_class(self):
-            base_serializer_class = \
-                super(NestedViewSet, self).get_serializer_class()
-
-            class NestedSerializer(base_serializer_class):
-                class Meta(base_serializer_class.Meta):
-                    url_generator = self._url_generator
+        @property
+        def shallow_detail_resource_names(self):
+            return self._url_generator.shallow_detail_resource_names
 
-                    resource_name = flattened_resource.name
+        def dispatch(self, request, *args, **kwargs):
+            with instrumentation_phase(flattened_resource.name, VIEW_PHASE):
+                return self._dispatch(request, *args, **kwargs)
 
-                    view_names_by_relationship = \
-                        relationships_by_resource_name[resource_name]
+        def _dispatch(self, request, *args, **kwargs):
+            self._response_cache_key = None
+            response = super(NestedViewSet, self).dispatch(
+                request,
+                *args,
+                **kwargs
+            )
+            if self._response_cache_key is not None:
+                is_response_cacheable = \
+                    response.status_code == HTTP_200_OK and \
+                    not response.streaming
+                if is_response_cacheable:
+                    if hasattr(response, 'render'):
+                        response.render()
+                    cache_response(
+                        self._get_response_cache_alias(),
+                        self._response_cache_key,
+                        response,
+                        self.response_cache_timeout,
+                    )
+            return response
+
+        def initial(self, request, *args, **kwargs):
+            super(NestedViewSet, self).initial(request, *args, **kwargs)
+
+            # The cache is only looked up once the request has been
+            # authenticated, authorized and throttled
+            cache_timeout = getattr(self, 'response_cache_timeout', None)
+            if cache_timeout is None or request.method != 'GET':
+                return
 
-                def __init__(self, *args, **kwargs):
-                    super().__init__(*args, **kwargs)
+            cached_response, response_cache_key = get_cached_response(
+                self._get_response_cache_alias(),
+                request,
+                flattened_resource,
+                self.kwargs,
+                self._url_generator,
+            )
+            if cached_response is None:
+                self._response_cache_key = response_cache_key
+            else:
+                self.get = lambda *args, **kwargs: cached_response
 
-                    is_creation_or_update = hasattr(self, 'initial_data')
-                    field_forced_to_ancestor = \
-                        getattr(self.Meta, 'field_forced_to_ancestor', None)
-                    if is_creation_or_update and field_forced_to_ancestor:
-                        field = self.fields[field_forced_to_ancestor]
-                        ancestor_object = \
-                            _extract_ancestor_object_from_field(field)
-                        ancestor_url = self.Meta.url_generator(
-                            field.view_name,
-                            ancestor_object,
-                            field.context['request'],
-                        )
-                        self.initial_data[field_forced_to_ancestor] = \
-                            ancestor_url
+        def _get_response_cache_alias(self):
+            cache_alias = \
+                getattr(self, 'response_cache_alias', DEFAULT_CACHE_ALIAS)
+            return cache_alias
 
-            return NestedSerializer
+        def get_serializer_class(self):
+            base_serializer_class = \
+                super(NestedViewSet, self).get_serializer_class()
+            # The serializer class references the URL generator, which keeps
+            # the relational routes alive and their id unique
+            serializer_class_key = \
+                (base_serializer_class, id(self._relational_routes))
+            if serializer_class_key not in nested_serializer_classes:
+                nested_serializer_classes[serializer_class_key] = \
+                    _create_nested_serializer_class(
+                        base_serializer_class,
+                        flattened_resource.name,
+                        self._url_generator,
+                        relationships_by_resource_name,
+                    )
+            return nested_serializer_classes[serializer_class_key]
 
         def get_queryset(self):
-            filters = {}
-            ancestor_lookups = []
             resource_names_and_lookups = \
-                _get_resource_ancestors_and_lookups(flattened_resource)
-            for resource_name, lookup in resource_names_and_lookups:
-                urlvar_value = self.kwargs[resource_name]
-                ancestor_lookups.append(lookup)
-                lookup = LOOKUP_SEP.join(str(_) for _ in ancestor_lookups)
-                filters[lookup] = urlvar_value
+                tuple(_get_resource_ancestors_and_lookups(flattened_resource))
+            # The consistency of the other ancestors is checked by the request
+            # to the parent, whose queryset is filtered by its own ancestors
+            if getattr(self, 'filter_by_direct_parent_only', False):
+                resource_names_and_lookups = resource_names_and_lookups[:1]
+            filters = _make_ancestor_filters(
+                resource_names_and_lookups,
+                self.kwargs,
+            )
             queryset = super(NestedViewSet, self).get_queryset()
             queryset = queryset.filter(**filters)
+            database_alias = self._get_database_alias()
+            if database_alias:
+                queryset = queryset.using(database_alias)
+            if self.request.method != 'HEAD':
+                queryset = \
+                    self._optimize_queryset_for_representation(queryset)
+            return queryset
+
+        def _get_database_alias(self):
+            database_alias = get_database_alias_for_route(
+                flattened_resource,
+                self.kwargs,
+                getattr(self, 'request', None),
+            )
+            return database_alias
+
+        def finalize_response(self, request, response, *args, **kwargs):
+            response = super(NestedViewSet, self).finalize_response(
+                request,
+                response,
+                *args,
+                **kwargs
+            )
+            pin_to_primary_database(request, response)
+            return response
+
+        def _optimize_queryset_for_representation(self, queryset):
+            # Only the nested serializers handle the query parameters below
+            serializer_class = self.get_serializer_class()
+            if not issubclass(
+                serializer_class,
+                HyperlinkedNestedModelSerializer,
+            ):
+                return queryset
+
+            query_params = self.request.query_params
+            requested_field_names = parse_requested_field_names(
+                query_params.get(FIELDS_QUERY_PARAM, ''),
+            )
+            if requested_field_names:
+                queryset = _restrict_queryset_to_fields(
+                    queryset,
+                    requested_field_names,
+                    self.get_serializer(requested_field_names=()),
+                )
+
+            serializer_meta = serializer_class.Meta
+            is_read_request = self.request.method in SAFE_METHODS
+            is_relationship_count_requested = \
+                getattr(serializer_meta, 'relationship_counts', False)
+            if is_read_request and is_relationship_count_requested:
+                queryset = _annotate_relationship_counts(
+                    queryset,
+                    self.get_serializer(
+                        included_relationships={},
+                        expanded_relationships={},
+                    ),
+                )
+
+            included_relationships = _filter_relationship_tree(
+                parse_relationship_tree(
+                    query_params.get(INCLUDE_QUERY_PARAM, ''),
+                ),
+                requested_field_names,
+            )
+            included_relationship_prefetches = \
+                _get_included_relationship_prefetches(
+                    included_relationships,
+                    flattened_resource.name,
+                    queryset.model,
+                    relationships_by_resource_name,
+                    self._url_generator,
+                    self.request,
+                    self.kwargs,
+                )
+            queryset = queryset.prefetch_related(
+                *included_relationship_prefetches
+            )
+
+            expanded_relationships = _filter_relationship_tree(
+                parse_relationship_tree(
+                    query_params.get(EXPAND_QUERY_PARAM, ''),
+                ),
+                requested_field_names,
+            )
+            expanded_relationship_lookups = \
+                _get_expanded_relationship_lookups(
+                    expanded_relationships,
+                    flattened_resource.name,
+                    queryset.model,
+                    relationships_by_resource_name,
+                    self._url_generator,
+                )
+            if expanded_relationship_lookups:
+                queryset = \
+                    queryset.select_related(*expanded_relationship_lookups)
             return queryset
 
         def check_object_permissions(self, request, obj):
@@ -367,49 +743,652 @@ def _create_nested_viewset(flattened_resource, relationships_by_resource_name):
             urlconf = \
                 getattr(request._request, 'urlconf', settings.ROOT_URLCONF)
 
-            parent_detail_view_url = \
-                self._get_parent_resource_detail_view_url(request)
-
-            if parent_detail_view_url:
-                request_forger = RequestForger(request)
-                response = request_forger.head(parent_detail_view_url)
-                status_code = response.status_code
-            else:
-                status_code = None
-
+            status_code = _get_ancestor_check_status(
+                flattened_resource,
+                self.kwargs,
+                request,
+                self._url_generator,
+            )
             return status_code
 
         def _get_parent_resource_detail_view_url(self, request):
-            ancestors_and_lookups = \
-                _get_resource_ancestors_and_lookups(flattened_resource)
-            try:
-                parent_base_name = next(ancestors_and_lookups)[0]
-            except StopIteration:
-                return
+            parent_detail_view_url = _get_parent_resource_detail_view_url(
+                flattened_resource,
+                self.kwargs,
+                request,
+                self._url_generator,
+            )
+            return parent_detail_view_url
+
+    NestedViewSet.__name__ = '{}{}'.format(flattened_resource.name, 'ViewSet')
+    return NestedViewSet
 
-            parent_model_class = \
-                self._url_generator.get_model_class_for_resource(
-                    parent_base_name,
-                )
-            parent_object_pk = self.kwargs[parent_base_name]
 
+def _create_shallow_detail_viewset(nested_viewset, flattened_resource):
+    ancestor_pk_lookup_by_resource_name = OrderedDict()
+    ancestor_lookups = []
+    for resource_name, parent_lookup in \
+            _get_resource_ancestors_and_lookups(flattened_resource):
+        ancestor_lookups.append(parent_lookup)
+        ancestor_pk_lookup_by_resource_name[resource_name] = \
+            LOOKUP_SEP.join(ancestor_lookups + ['pk'])
+
+    class ShallowDetailViewSet(nested_viewset):
+
+        # The responses would only be keyed on the resource itself
+        response_cache_timeout = None
+
+        def initial(self, request, *args, **kwargs):
+            # The ancestors are checked as if they were in the URL, once they
+            # have been retrieved along with the resource
+            self.kwargs.update(self._get_ancestor_view_kwargs())
+            super(ShallowDetailViewSet, self).initial(request, *args, **kwargs)
+
+        def _get_ancestor_view_kwargs(self):
+            queryset = flattened_resource.viewset.queryset.all()
+            database_alias = self._get_database_alias()
+            if database_alias:
+                queryset = queryset.using(database_alias)
+
+            ancestor_pk_lookups = ancestor_pk_lookup_by_resource_name.values()
             try:
-                parent_model_instance = parent_model_class.objects.get(
-                    pk=parent_object_pk,
+                ancestor_pks = queryset \
+                    .filter(pk=self.kwargs[flattened_resource.name]) \
+                    .values_list(*ancestor_pk_lookups) \
+                    .first()
+            except (TypeError, ValueError, ValidationError):
+                ancestor_pks = None
+            if ancestor_pks is None or None in ancestor_pks:
+                raise Http404()
+
+            ancestor_view_kwargs = dict(
+                zip(ancestor_pk_lookup_by_resource_name, ancestor_pks),
+            )
+            return ancestor_view_kwargs
+
+    ShallowDetailViewSet.__name__ = \
+        '{}{}'.format(flattened_resource.name, 'ShallowDetailViewSet')
+    return ShallowDetailViewSet
+
+
+def _create_nested_serializer_class(
+    base_serializer_class,
+    resource_name,
+    url_generator,
+    relationships_by_resource_name,
+):
+    get_nested_serializer_class = partial(
+        _get_nested_serializer_class_for_resource,
+        url_generator=url_generator,
+        relationships_by_resource_name=relationships_by_resource_name,
+    )
+    nested_serializer_meta_class = type(
+        'Meta',
+        (base_serializer_class.Meta,),
+        {
+            'url_generator': url_generator,
+            'resource_name': resource_name,
+            'view_names_by_relationship':
+                relationships_by_resource_name[resource_name],
+            'get_nested_serializer_class': get_nested_serializer_class,
+        },
+    )
+
+    class NestedSerializer(base_serializer_class):
+        Meta = nested_serializer_meta_class
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+
+            is_creation_or_update = hasattr(self, 'initial_data')
+            field_forced_to_ancestor = \
+                getattr(self.Meta, 'field_forced_to_ancestor', None)
+            if is_creation_or_update and field_forced_to_ancestor:
+                field = self.fields[field_forced_to_ancestor]
+                database_alias = \
+                    get_database_alias_for_request(field.context['request'])
+                if database_alias:
+                    field.queryset = field.queryset.using(database_alias)
+                ancestor_object = _extract_ancestor_object_from_field(field)
+                ancestor_url = self.Meta.url_generator(
+                    field.view_name,
+                    ancestor_object,
+                    field.context['request'],
                 )
-            except ObjectDoesNotExist as exc:
-                raise Http404() from exc
+                self.initial_data[field_forced_to_ancestor] = ancestor_url
+
+        def create(self, validated_data):
+            # Existing resources are saved back to the database they were
+            # retrieved from, but ModelSerializer.create() always uses the
+            # default database for new ones
+            database_alias = \
+                get_database_alias_for_request(self.context.get('request'))
+            is_create_customized = \
+                base_serializer_class.create is not ModelSerializer.create
+            if database_alias is None or is_create_customized:
+                return super().create(validated_data)
+
+            raise_errors_on_nested_writes('create', self, validated_data)
+            model = self.Meta.model
+            many_to_many = {
+                field_name: validated_data.pop(field_name)
+                for field_name, relation_info
+                in get_field_info(model).relations.items()
+                if relation_info.to_many and field_name in validated_data
+            }
+            instance = model._default_manager \
+                .db_manager(database_alias) \
+                .create(**validated_data)
+            for field_name, value in many_to_many.items():
+                getattr(instance, field_name).set(value)
+            return instance
+
+    return NestedSerializer
+
+
+def _get_nested_serializer_class_for_resource(
+    resource_name,
+    url_generator,
+    relationships_by_resource_name,
+):
+    viewset = url_generator.get_viewset_for_resource(resource_name)
+    serializer_class = _create_nested_serializer_class(
+        viewset.serializer_class,
+        resource_name,
+        url_generator,
+        relationships_by_resource_name,
+    )
+    return serializer_class
 
-            parent_detail_view_name = parent_base_name + DETAIL_VIEW_NAME_SUFFIX
-            parent_detail_view_url = self._url_generator(
-                parent_detail_view_name,
-                parent_model_instance,
+
+def _restrict_queryset_to_fields(queryset, requested_field_names, serializer):
+    model_options = queryset.model._meta
+
+    requested_sources = set()
+    unrequested_sources = set()
+    for field_name, field in serializer.fields.items():
+        source = field.source.partition('.')[0]
+        if field_name in requested_field_names:
+            requested_sources.add(source)
+        else:
+            unrequested_sources.add(source)
+    unrequested_sources -= requested_sources
+
+    # Requested fields that read the whole object (e.g., method fields) or
+    # attributes other than model fields may use any column or relationship
+    for source in requested_sources:
+        if source == '*' or not _is_model_field(model_options, source):
+            return queryset
+
+    deferrable_field_names = []
+    for source in unrequested_sources:
+        try:
+            model_field = model_options.get_field(source)
+        except FieldDoesNotExist:
+            continue
+        is_deferrable = model_field.concrete and \
+            not model_field.is_relation and \
+            not model_field.primary_key
+        if is_deferrable:
+            deferrable_field_names.append(model_field.name)
+    if deferrable_field_names:
+        queryset = queryset.defer(*deferrable_field_names)
+
+    select_related = queryset.query.select_related
+    if isinstance(select_related, dict):
+        select_related_lookups = [
+            lookup for lookup in _flatten_select_related(select_related)
+            if lookup.partition(LOOKUP_SEP)[0] not in unrequested_sources
+        ]
+        queryset = queryset.select_related(None)
+        if select_related_lookups:
+            queryset = queryset.select_related(*select_related_lookups)
+    return queryset
+
+
+def _is_model_field(model_options, field_name):
+    try:
+        model_options.get_field(field_name)
+    except FieldDoesNotExist:
+        return False
+    return True
+
+
+def _flatten_select_related(select_related, lookup_prefix=''):
+    lookups = []
+    for field_name, sub_select_related in select_related.items():
+        lookup = lookup_prefix + field_name
+        if sub_select_related:
+            lookups.extend(_flatten_select_related(
+                sub_select_related,
+                lookup + LOOKUP_SEP,
+            ))
+        else:
+            lookups.append(lookup)
+    return lookups
+
+
+def _filter_relationship_tree(relationship_tree, requested_field_names):
+    if not requested_field_names:
+        return relationship_tree
+
+    filtered_relationship_tree = {
+        relationship_name: sub_relationships
+        for relationship_name, sub_relationships in relationship_tree.items()
+        if relationship_name in requested_field_names
+    }
+    return filtered_relationship_tree
+
+
+def _get_included_relationship_prefetches(
+    included_relationships,
+    resource_name,
+    model,
+    relationships_by_resource_name,
+    url_generator,
+    request,
+    view_kwargs,
+    lookup_prefix='',
+):
+    prefetches = []
+    view_names_by_relationship = relationships_by_resource_name[resource_name]
+    for relationship_name, included_sub_relationships in \
+            included_relationships.items():
+        related_resource_name = \
+            view_names_by_relationship.get(relationship_name)
+        is_to_many_relationship = \
+            _is_to_many_relationship(model, relationship_name)
+        if not related_resource_name or not is_to_many_relationship:
+            continue
+
+        if not _has_nested_serializer(related_resource_name, url_generator):
+            continue
+
+        # The serializer leaves out the collections that cannot be listed
+        related_viewset = \
+            url_generator.get_viewset_for_resource(related_resource_name)
+        related_view = make_included_collection_view(
+            related_viewset,
+            request,
+            view_kwargs,
+        )
+        if not has_view_permission(related_view):
+            continue
+
+        related_queryset = related_view.get_queryset()
+        related_serializer_class = _get_nested_serializer_class_for_resource(
+            related_resource_name,
+            url_generator,
+            relationships_by_resource_name,
+        )
+        related_serializer_meta = related_serializer_class.Meta
+        is_relationship_count_requested = \
+            getattr(related_serializer_meta, 'relationship_counts', False)
+        if is_relationship_count_requested:
+            related_queryset = _annotate_relationship_counts(
+                related_queryset,
+                related_serializer_class(
+                    included_relationships={},
+                    expanded_relationships={},
+                    requested_field_names=(),
+                ),
+            )
+        lookup = lookup_prefix + relationship_name
+        prefetches.append(Prefetch(lookup, queryset=related_queryset))
+
+        prefetches.extend(_get_included_relationship_prefetches(
+            included_sub_relationships,
+            related_resource_name,
+            related_queryset.model,
+            relationships_by_resource_name,
+            url_generator,
+            request,
+            view_kwargs,
+            lookup + LOOKUP_SEP,
+        ))
+    return prefetches
+
+
+def _has_nested_serializer(resource_name, url_generator):
+    viewset = url_generator.get_viewset_for_resource(resource_name)
+    return issubclass(
+        viewset.serializer_class,
+        HyperlinkedNestedModelSerializer,
+    )
+
+
+def _annotate_relationship_counts(queryset, serializer):
+    relationship_count_annotations = \
+        get_relationship_count_annotations(serializer)
+    if relationship_count_annotations:
+        queryset = queryset.annotate(**relationship_count_annotations)
+    return queryset
+
+
+def _get_expanded_relationship_lookups(
+    expanded_relationships,
+    resource_name,
+    model,
+    relationships_by_resource_name,
+    url_generator,
+    lookup_prefix='',
+):
+    lookups = []
+    view_names_by_relationship = relationships_by_resource_name[resource_name]
+    for relationship_name, expanded_sub_relationships in \
+            expanded_relationships.items():
+        related_resource_name = \
+            view_names_by_relationship.get(relationship_name)
+        is_to_one_relationship = \
+            _is_to_one_relationship(model, relationship_name)
+        if not related_resource_name or not is_to_one_relationship:
+            continue
+
+        if not _has_nested_serializer(related_resource_name, url_generator):
+            continue
+
+        lookup = lookup_prefix + relationship_name
+        lookups.append(lookup)
+
+        related_model = \
+            url_generator.get_model_class_for_resource(related_resource_name)
+        lookups.extend(_get_expanded_relationship_lookups(
+            expanded_sub_relationships,
+            related_resource_name,
+            related_model,
+            relationships_by_resource_name,
+            url_generator,
+            lookup + LOOKUP_SEP,
+        ))
+    return lookups
+
+
+def _is_to_one_relationship(model, field_name):
+    try:
+        field = model._meta.get_field(field_name)
+    except FieldDoesNotExist:
+        return False
+    return field.is_relation and (field.many_to_one or field.one_to_one)
+
+
+def _is_to_many_relationship(model, field_name):
+    try:
+        field = model._meta.get_field(field_name)
+    except FieldDoesNotExist:
+        return False
+    return field.is_relation and (field.one_to_many or field.many_to_many)
+
+
+def _get_nested_viewset_mixins(flattened_resource):
+    route_viewset = flattened_resource.viewset
+    mixins = ()
+    if flattened_resource.parent_counter_cache_field:
+        mixins += (_NestedCounterCacheMixin,)
+    if hasattr(route_viewset, 'list'):
+        mixins += (_NestedListMixin,)
+    if hasattr(route_viewset, 'retrieve'):
+        mixins += (_NestedRetrieveMixin,)
+    return mixins
+
+
+class _NestedCounterCacheMixin:
+
+    def list(self, request, *args, **kwargs):
+        super_ = super(_NestedCounterCacheMixin, self)
+        response = super_.list(request, *args, **kwargs)
+        if response.status_code == HTTP_200_OK:
+            collection_count = self.get_cached_collection_count()
+            if collection_count is not None:
+                response[TOTAL_COUNT_HEADER_NAME] = str(collection_count)
+        return response
+
+    def get_cached_collection_count(self):
+        # Filter backends and the viewset itself may exclude some of the
+        # children of the parent, which the counter would not reflect
+        relational_route = self.relational_route
+        if self.filter_backends or \
+                _is_queryset_narrowed(relational_route.viewset):
+            return None
+
+        counter_cache = get_counter_cache(
+            relational_route.viewset.queryset.model,
+            _get_parent_field_lookup(relational_route),
+        )
+        parent_resource_name = \
+            next(reversed(relational_route.ancestor_lookup_by_resource_name))
+        collection_count = get_counter_cache_value(
+            counter_cache,
+            self.kwargs[parent_resource_name],
+            self._get_database_alias(),
+        )
+        return collection_count
+
+    def perform_create(self, serializer):
+        with self._get_counter_cache_transaction():
+            super(_NestedCounterCacheMixin, self).perform_create(serializer)
+
+    def perform_update(self, serializer):
+        with self._get_counter_cache_transaction():
+            super(_NestedCounterCacheMixin, self).perform_update(serializer)
+
+    def perform_destroy(self, instance):
+        with self._get_counter_cache_transaction():
+            super(_NestedCounterCacheMixin, self).perform_destroy(instance)
+
+    def _get_counter_cache_transaction(self):
+        model = self.relational_route.viewset.queryset.model
+        database_alias = \
+            self._get_database_alias() or db_router.db_for_write(model)
+        return atomic(using=database_alias)
+
+
+def _is_queryset_narrowed(viewset):
+    if viewset.get_queryset is not GenericAPIView.get_queryset:
+        return True
+    return bool(viewset.queryset.query.where)
+
+
+class _NestedListMixin:
+
+    def list(self, request, *args, **kwargs):
+        # A list customized by the viewset may deny or alter the response, so
+        # none of the shortcuts below can be taken
+        super_ = super(_NestedListMixin, self)
+        if _is_action_customized(self, _NestedListMixin, ListModelMixin.list):
+            return super_.list(request, *args, **kwargs)
+
+        validators = self._get_collection_validators(request)
+        if validators and is_resource_not_modified(request, validators):
+            return make_not_modified_response(validators)
+
+        # The permissions, and therefore the ancestors, have been checked by
+        # now and the representation would be discarded
+        if request.method == 'HEAD':
+            response = Response()
+        elif self._is_list_streamable(request):
+            response = self._get_streaming_list_response(request)
+        else:
+            response = super_.list(request, *args, **kwargs)
+
+        if validators:
+            set_validator_headers(response, validators)
+        return response
+
+    def _get_collection_validators(self, request):
+        if not _use_conditional_requests(self, request):
+            return None
+
+        queryset = self.filter_queryset(self.get_queryset())
+        validators = get_collection_validators(
+            queryset,
+            getattr(self, 'last_modified_field', None),
+            request,
+        )
+        return validators
+
+    def _is_list_streamable(self, request):
+        streaming_chunk_size = getattr(self, 'streaming_chunk_size', None)
+        is_list_streamable = bool(streaming_chunk_size) and \
+            self.paginator is None and \
+            isinstance(request.accepted_renderer, JSONRenderer)
+        return is_list_streamable
+
+    def _get_streaming_list_response(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        response = make_streaming_list_response(
+            queryset,
+            lambda objects: self.get_serializer(objects, many=True),
+            request.accepted_renderer,
+            request.accepted_media_type,
+            self.get_renderer_context(),
+            self.streaming_chunk_size,
+        )
+        return response
+
+
+class _NestedRetrieveMixin:
+
+    def retrieve(self, request, *args, **kwargs):
+        is_retrieve_customized = _is_action_customized(
+            self,
+            _NestedRetrieveMixin,
+            RetrieveModelMixin.retrieve,
+        )
+        use_conditional_requests = not is_retrieve_customized and \
+            _use_conditional_requests(self, request)
+        is_head_request_shortcut = \
+            not is_retrieve_customized and request.method == 'HEAD'
+        if not use_conditional_requests and not is_head_request_shortcut:
+            return super(_NestedRetrieveMixin, self).retrieve(
                 request,
+                *args,
+                **kwargs
             )
-            return parent_detail_view_url
 
-    NestedViewSet.__name__ = '{}{}'.format(flattened_resource.name, 'ViewSet')
-    return NestedViewSet
+        instance = self.get_object()
+        if use_conditional_requests:
+            validators = get_resource_validators(
+                instance,
+                getattr(self, 'last_modified_field', None),
+                request,
+            )
+            if is_resource_not_modified(request, validators):
+                return make_not_modified_response(validators)
+        else:
+            validators = None
+
+        # The object and its ancestors have been checked by now, and the
+        # representation would be discarded (e.g., by the requests forged to
+        # check the ancestors)
+        if request.method == 'HEAD':
+            response = Response()
+        else:
+            serializer = self.get_serializer(instance)
+            response = Response(serializer.data)
+        if validators:
+            set_validator_headers(response, validators)
+        return response
+
+
+def _is_action_customized(view, nested_mixin_class, default_action):
+    action = getattr(super(nested_mixin_class, view), default_action.__name__)
+    return getattr(action, '__func__', None) is not default_action
+
+
+def _use_conditional_requests(view, request):
+    if not getattr(view, 'use_conditional_requests', False):
+        return False
+
+    # The validators only reflect the resources requested, not those
+    # included, expanded or counted in their representation
+    query_params = request.query_params
+    serializer_meta = getattr(view.get_serializer_class(), 'Meta', None)
+    is_representation_with_related_resources = \
+        bool(query_params.get(INCLUDE_QUERY_PARAM)) or \
+        bool(query_params.get(EXPAND_QUERY_PARAM)) or \
+        getattr(serializer_meta, 'relationship_counts', False)
+    return not is_representation_with_related_resources
+
+
+def _get_parent_field_lookup(flattened_resource):
+    ancestor_lookups = \
+        tuple(flattened_resource.ancestor_lookup_by_resource_name.values())
+    return ancestor_lookups[-1]
+
+
+def _get_ancestor_check_status(
+    flattened_resource,
+    view_kwargs,
+    request,
+    url_generator,
+    ancestor_check_statuses=None,
+):
+    parent_detail_view_url = _get_parent_resource_detail_view_url(
+        flattened_resource,
+        view_kwargs,
+        request,
+        url_generator,
+    )
+    if not parent_detail_view_url:
+        return None
+
+    # The sub-requests of a batch share the verdicts on their ancestors
+    batch_caches = get_batch_caches(request)
+    if batch_caches is not None:
+        ancestor_check_statuses = batch_caches.ancestor_check_statuses
+    if ancestor_check_statuses is not None and \
+            parent_detail_view_url in ancestor_check_statuses:
+        return ancestor_check_statuses[parent_detail_view_url]
+
+    record_event(FORGED_REQUEST_EVENT)
+    request_forger = RequestForger(request)
+    subrequest = instrumentation_subrequest(parent_detail_view_url, 'HEAD')
+    with subrequest as subrequest_node:
+        response = request_forger.head(parent_detail_view_url)
+        subrequest_node.status_code = response.status_code
+    status_code = response.status_code
+
+    if ancestor_check_statuses is not None:
+        ancestor_check_statuses[parent_detail_view_url] = status_code
+    return status_code
+
+
+def _get_parent_resource_detail_view_url(
+    flattened_resource,
+    view_kwargs,
+    request,
+    url_generator,
+):
+    ancestors_and_lookups = \
+        tuple(_get_resource_ancestors_and_lookups(flattened_resource))
+    if not ancestors_and_lookups:
+        return None
+    parent_base_name = ancestors_and_lookups[0][0]
+
+    # The URL variables of the parent are a subset of those of the current
+    # view, so the parent need not be retrieved to reverse it
+    parent_view_kwargs = {
+        resource_name: view_kwargs[resource_name]
+        for resource_name, _ in ancestors_and_lookups
+    }
+    parent_detail_view_name = parent_base_name + DETAIL_VIEW_NAME_SUFFIX
+    parent_detail_view_url = url_generator.reverse(
+        parent_detail_view_name,
+        parent_view_kwargs,
+        request,
+    )
+    return parent_detail_view_url
+
+
+def _make_ancestor_filters(resource_names_and_lookups, view_kwargs):
+    filters = {}
+    ancestor_lookups = []
+    for resource_name, lookup in resource_names_and_lookups:
+        urlvar_value = view_kwargs[resource_name]
+        ancestor_lookups.append(lookup)
+        lookup = LOOKUP_SEP.join(str(_) for _ in ancestor_lookups)
+        filters[lookup] = urlvar_value
+    return filters
 
 
 def _get_resource_ancestors_and_lookups(flattened_resource):
@@ -426,26 +1405,108 @@ def _extract_ancestor_object_from_field(field):
     return ancestor_object
 
 
+@lru_cache(maxsize=None)
+def _get_foreign_key_attname_lookup(model, parent_lookup):
+    *intermediate_lookups, last_lookup = parent_lookup.split(LOOKUP_SEP)
+    current_model = model
+    try:
+        for lookup in intermediate_lookups:
+            current_model = current_model._meta.get_field(lookup).related_model
+        field = current_model._meta.get_field(last_lookup)
+    except (AttributeError, FieldDoesNotExist):
+        return None
+
+    is_foreign_key_to_primary_key = \
+        field.concrete and \
+        (field.many_to_one or field.one_to_one) and \
+        field.target_field.primary_key
+    if not is_foreign_key_to_primary_key:
+        return None
+
+    foreign_key_lookup = \
+        LOOKUP_SEP.join(intermediate_lookups + [field.attname])
+    return foreign_key_lookup
+
+
 class _URLGenerator:
 
-    def __init__(self, relational_routes):
+    def __init__(self, relational_routes, shallow_detail_resource_names=()):
         super(_URLGenerator, self).__init__()
 
         self._relational_route_by_resource_name = \
             {r.name: r for r in relational_routes}
+        self._shallow_detail_resource_names = \
+            frozenset(shallow_detail_resource_names)
 
-    def get_model_class_for_resource(self, resource_name):
+    @property
+    def shallow_detail_resource_names(self):
+        return self._shallow_detail_resource_names
+
+    def get_viewset_for_resource(self, resource_name):
+        relational_route = \
+            self._relational_route_by_resource_name[resource_name]
+        return relational_route.viewset
+
+    def get_view_kwargs(self, resource_name, resource_object, request):
         relational_route = \
             self._relational_route_by_resource_name[resource_name]
-        viewset = relational_route.viewset
+        view_kwargs = self._build_view_kwargs(
+            resource_object,
+            resource_name,
+            relational_route,
+            request,
+        )
+        return view_kwargs
+
+    def get_ancestor_check_status(
+        self,
+        resource_name,
+        view_kwargs,
+        request,
+        ancestor_check_statuses=None,
+    ):
+        relational_route = \
+            self._relational_route_by_resource_name[resource_name]
+        status_code = _get_ancestor_check_status(
+            relational_route,
+            view_kwargs,
+            request,
+            self,
+            ancestor_check_statuses,
+        )
+        return status_code
+
+    def get_model_class_for_resource(self, resource_name):
+        viewset = self.get_viewset_for_resource(resource_name)
         model_class = viewset.queryset.model
         return model_class
 
+    def is_detail_url_reversible_from_pk(self, resource_name):
+        relational_route = \
+            self._relational_route_by_resource_name[resource_name]
+        is_detail_url_reversible_from_pk = \
+            not relational_route.ancestor_lookup_by_resource_name or \
+            resource_name in self._shallow_detail_resource_names
+        return is_detail_url_reversible_from_pk
+
     def __call__(self, view_name, leaf_resource_object, request, format_=None):
         resource_name, separator, view_type = view_name.partition('-')
         view_name_suffix = '{}{}'.format(separator, view_type)
         self._assert_valid_view_name_suffix(view_name_suffix)
 
+        # The shallow URL is canonical, so no ancestor is looked up
+        is_shallow_detail_url = \
+            view_name_suffix == DETAIL_VIEW_NAME_SUFFIX and \
+            resource_name in self._shallow_detail_resource_names
+        if is_shallow_detail_url:
+            url = self.reverse(
+                resource_name + SHALLOW_DETAIL_VIEW_NAME_SUFFIX,
+                {resource_name: leaf_resource_object.pk},
+                request,
+                format_,
+            )
+            return url
+
         resource_name, relation_route = \
             self._resolve_resource_and_relationships(
                 resource_name,
@@ -458,6 +1519,12 @@ class _URLGenerator:
             relation_route,
             request,
         )
+        url = self.reverse(view_name, view_kwargs, request, format_)
+        return url
+
+    @staticmethod
+    def reverse(view_name, view_kwargs, request, format_=None):
+        record_event(URL_REVERSAL_EVENT)
         url = reverse(
             view_name,
             kwargs=view_kwargs,
@@ -492,9 +1559,27 @@ class _URLGenerator:
     ):
         current_object = leaf_resource_object
         view_kwargs = {leaf_resource_name: leaf_resource_object.pk}
-        resource_names_and_parent_lookups = \
-            reversed(relation_route.ancestor_lookup_by_resource_name.items())
+        resource_names_and_parent_lookups = tuple(
+            reversed(relation_route.ancestor_lookup_by_resource_name.items()),
+        )
+        root_resource_name = resource_names_and_parent_lookups[-1][0] \
+            if resource_names_and_parent_lookups else None
         for resource_name, parent_lookup in resource_names_and_parent_lookups:
+            # Only the primary key of the root ancestor is needed, so it is
+            # taken from the foreign key column instead of loading the object
+            if resource_name == root_resource_name and \
+                    isinstance(parent_lookup, str):
+                foreign_key_lookup = _get_foreign_key_attname_lookup(
+                    type(current_object),
+                    parent_lookup,
+                )
+                if foreign_key_lookup:
+                    foreign_key_lookup_helper = \
+                        SimpleParentLookupHelper(foreign_key_lookup)
+                    view_kwargs[resource_name] = \
+                        foreign_key_lookup_helper(current_object, request)
+                    continue
+
             if isinstance(parent_lookup, str):
                 parent_lookup_helper = SimpleParentLookupHelper(parent_lookup)
             elif isinstance(parent_lookup, BaseParentLookupHelper):
@@ -502,7 +1587,10 @@ class _URLGenerator:
             else:
                 assert False, \
                     'parent lookup must be either a string or lookup helper'
-            current_object = parent_lookup_helper(current_object, request)
+            record_event(PARENT_LOOKUP_EVENT)
+            record_lookup_helper(resource_name, parent_lookup_helper)
+            with instrumentation_phase(resource_name, LOOKUP_HELPER_PHASE):
+                current_object = parent_lookup_helper(current_object, request)
             view_kwargs[resource_name] = current_object.pk
         return view_kwargs
 
@@ -0,0 +1,119 @@
+##############################################################################
+#
+# Copyright (c) 2015-2020, 2degrees Limited.
+# All Rights Reserved.
+#
+# This file is part of drf-nested-resources
+# <https://github.com/2degrees/drf-nested-resources>, which is subject to the
+# provisions of the BSD at
+# <http://dev.2degreesnetwork.com/p/2degrees-license.html>. A copy of the
+# license should accompany this distribution. THIS SOFTWARE IS PROVIDED "AS IS"
+# AND ANY AND ALL EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED, INCLUDING, BUT
+# NOT LIMITED TO, THE IMPLIED WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST
+# INFRINGEMENT, AND FITNESS FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+from copy import deepcopy
+from re import compile as compile_regex
+from weakref import WeakKeyDictionary
+
+from django.db.models import AutoField
+from django.db.models import IntegerField
+from django.db.models import UUIDField
+from rest_framework.schemas.openapi import AutoSchema
+from rest_framework.schemas.openapi import SchemaGenerator
+from rest_framework.schemas.utils import get_pk_description
+
+_PATH_VARIABLE_REGEX = compile_regex(r'{(?P<variable>[^}]+)}')
+
+_operations_by_view_class = WeakKeyDictionary()
+
+
+class NestedAutoSchema(AutoSchema):
+
+    def get_operation(self, path, method):
+        # The view classes are recreated when the tree of resources changes,
+        # so the operations cached for the previous tree are no longer used
+        view_class = type(self.view)
+        operations = _operations_by_view_class.setdefault(view_class, {})
+        operation_key = (path, method)
+        if operation_key not in operations:
+            operations[operation_key] = \
+                super(NestedAutoSchema, self).get_operation(path, method)
+        return deepcopy(operations[operation_key])
+
+    def get_path_parameters(self, path, method):
+        relational_route = getattr(self.view, 'relational_route', None)
+        if relational_route is None:
+            return self._get_default_path_parameters(path, method)
+
+        resource_names = \
+            set(relational_route.ancestor_lookup_by_resource_name) | \
+            {relational_route.name}
+        parameters = []
+        for path_variable_match in _PATH_VARIABLE_REGEX.finditer(path):
+            variable = path_variable_match.group('variable')
+            if variable in resource_names:
+                model = self.view._url_generator.get_model_class_for_resource(
+                    variable,
+                )
+                primary_key = _get_concrete_primary_key(model)
+                description = get_pk_description(model, primary_key)
+                schema = _get_primary_key_schema(primary_key)
+            else:
+                description = ''
+                schema = {'type': 'string'}
+            parameter = {
+                'name': variable,
+                'in': 'path',
+                'required': True,
+                'description': description,
+                'schema': schema,
+            }
+            parameters.append(parameter)
+        return parameters
+
+    # Rest Framework made this method public in version 3.12
+    def _get_path_parameters(self, path, method):
+        return self.get_path_parameters(path, method)
+
+    def _get_default_path_parameters(self, path, method):
+        super_ = super(NestedAutoSchema, self)
+        get_path_parameters = getattr(super_, 'get_path_parameters', None) or \
+            super_._get_path_parameters
+        return get_path_parameters(path, method)
+
+
+class NestedSchemaGenerator(SchemaGenerator):
+
+    def create_view(self, callback, method, request=None):
+        view = super(NestedSchemaGenerator, self).create_view(
+            callback,
+            method,
+            request,
+        )
+        # Only the default schema is replaced, as others may be customised
+        is_nested_view = hasattr(view, 'relational_route')
+        if is_nested_view and type(view.schema) is AutoSchema:
+            schema = NestedAutoSchema()
+            schema.view = view
+            view.schema = schema
+        return view
+
+
+def _get_concrete_primary_key(model):
+    # Multi-table inheritance makes the primary key a link to the parent
+    primary_key = model._meta.pk
+    while primary_key.remote_field is not None:
+        primary_key = primary_key.target_field
+    return primary_key
+
+
+def _get_primary_key_schema(primary_key):
+    if isinstance(primary_key, (AutoField, IntegerField)):
+        schema = {'type': 'integer'}
+    elif isinstance(primary_key, UUIDField):
+        schema = {'type': 'string', 'format': 'uuid'}
+    else:
+        schema = {'type': 'string'}
+    return schema
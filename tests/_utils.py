@@ -1,7 +1,16 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db import connections
 from django.test.client import Client
 from django.test.client import ClientHandler
 from django.urls import reverse
 
+from django_project.languages.views import DeveloperViewSet
+from django_project.languages.views import ProgrammingLanguageVersionViewSet
+from django_project.languages.views import ProgrammingLanguageViewSet
+from drf_nested_resources.routers import NestedResource
+from drf_nested_resources.routers import Resource
 from drf_nested_resources.routers import make_urlpatterns_from_resources
 
 
@@ -46,3 +55,55 @@ def make_response_for_request(
     method = getattr(client, method_name.lower())
     response = method(url_path, **kwargs)
     return response
+
+
+@contextmanager
+def run_on_commit_callbacks(using=DEFAULT_DB_ALIAS):
+    # The test cases are never committed, so the callbacks registered within
+    # the block are run at the end of it instead
+    connection = connections[using]
+    callback_count = len(connection.run_on_commit)
+    yield
+    callbacks = connection.run_on_commit[callback_count:]
+    del connection.run_on_commit[callback_count:]
+    for _, callback in callbacks:
+        callback()
+
+
+class VersionCreationViewSet(ProgrammingLanguageVersionViewSet):
+
+    def perform_create(self, serializer):
+        serializer.save(language_id=self.kwargs['language'])
+
+
+def build_resources(
+    version_viewset=ProgrammingLanguageVersionViewSet,
+    developer_viewset=DeveloperViewSet,
+    language_viewset=ProgrammingLanguageViewSet,
+    version_counter_cache_field=None,
+    language_sub_resources=(),
+):
+    version_resource = NestedResource(
+        'version',
+        'versions',
+        version_viewset,
+        parent_field_lookup='language',
+        parent_counter_cache_field=version_counter_cache_field,
+    )
+    resources = [
+        Resource(
+            'developer',
+            'developers',
+            developer_viewset,
+            [
+                NestedResource(
+                    'language',
+                    'languages',
+                    language_viewset,
+                    [version_resource] + list(language_sub_resources),
+                    parent_field_lookup='author',
+                ),
+            ],
+        ),
+    ]
+    return resources
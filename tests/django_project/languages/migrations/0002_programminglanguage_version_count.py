@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-19 12:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('languages', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='programminglanguage',
+            name='version_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -3,6 +3,7 @@ from django.db.models import SET_NULL
 from django.db.models.base import Model
 from django.db.models.fields import CharField
 from django.db.models.fields import DateTimeField
+from django.db.models.fields import PositiveIntegerField
 from django.db.models.fields import URLField
 from django.db.models.fields.related import ForeignKey
 from django.db.models.fields.related import ManyToManyField
@@ -30,6 +31,8 @@ class ProgrammingLanguage(Model):
         on_delete=SET_NULL,
     )
 
+    version_count = PositiveIntegerField(default=0)
+
 
 class ProgrammingLanguageVersion(Model):
     name = CharField(max_length=10)
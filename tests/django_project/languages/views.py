@@ -134,3 +134,54 @@ class WebsiteHostViewSet(ModelViewSet):
     queryset = WebsiteHost.objects.all()
 
     serializer_class = _WebsiteHostSerializer
+
+
+class StreamingWebsiteVisitViewSet(WebsiteVisitViewSet):
+    streaming_chunk_size = 2
+
+
+class _ProgrammingLanguageSerializer2(HyperlinkedNestedModelSerializer):
+    class Meta(object):
+        model = ProgrammingLanguage
+
+        fields = ('url', 'name', 'author', 'versions')
+
+
+class ProgrammingLanguageViewSet2(ProgrammingLanguageViewSet):
+    serializer_class = _ProgrammingLanguageSerializer2
+
+
+class ConditionalWebsiteVisitViewSet(WebsiteVisitViewSet):
+    use_conditional_requests = True
+
+    last_modified_field = 'timestamp'
+
+
+class _DeveloperSerializer3(HyperlinkedNestedModelSerializer):
+    class Meta(object):
+        model = Developer
+
+        fields = ('url', 'name', 'programming_languages')
+
+        relationship_counts = True
+
+
+class DeveloperViewSet3(DeveloperViewSet):
+    serializer_class = _DeveloperSerializer3
+
+
+class _ProgrammingLanguageSerializer3(HyperlinkedNestedModelSerializer):
+    class Meta(object):
+        model = ProgrammingLanguage
+
+        fields = ('url', 'name', 'author', 'versions')
+
+        relationship_counts = True
+
+
+class ProgrammingLanguageViewSet3(ProgrammingLanguageViewSet):
+    serializer_class = _ProgrammingLanguageSerializer3
+
+
+class DirectParentFilteredVersionViewSet(ProgrammingLanguageVersionViewSet):
+    filter_by_direct_parent_only = True
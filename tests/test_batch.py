@@ -0,0 +1,171 @@
+from json import dumps as json_dumps
+
+from django.conf.urls import url
+from django.test.client import RequestFactory
+from nose.tools import eq_
+from nose.tools import ok_
+
+from django_project.languages.models import Website
+from django_project.languages.views import DeveloperViewSet
+from django_project.languages.views import ProgrammingLanguageVersionViewSet
+from django_project.languages.views import ProgrammingLanguageViewSet
+from drf_nested_resources._batch import BATCH_CACHES_ENVIRON_KEY
+from drf_nested_resources._batch import get_ancestor_object
+from drf_nested_resources._batch import make_batch_caches
+from drf_nested_resources._instrumentation import FORGED_REQUEST_EVENT
+from drf_nested_resources._instrumentation import record_events
+from drf_nested_resources.batch import NestedBatchView
+from drf_nested_resources.routers import NestedResource
+from drf_nested_resources.routers import Resource
+from drf_nested_resources.routers import make_urlpatterns_from_resources
+from tests._testcases import FixtureTestCase
+from tests._utils import TestClient
+
+
+class TestBatch(FixtureTestCase):
+
+    def test_envelope(self):
+        versions_url = self._get_versions_url()
+        version_url = self._get_version_url()
+
+        response = self._make_response_for_batch([versions_url, version_url])
+
+        eq_(200, response.status_code)
+        versions_response_data, version_response_data = \
+            response.data['responses']
+        eq_(versions_url, versions_response_data['url'])
+        eq_(200, versions_response_data['status'])
+        eq_(1, len(versions_response_data['data']))
+        eq_(version_url, version_response_data['url'])
+        eq_(200, version_response_data['status'])
+        eq_(
+            self.programming_language_version.name,
+            version_response_data['data']['name'],
+        )
+
+    def test_shared_ancestor_checks(self):
+        with record_events() as events:
+            self._make_response_for_batch(
+                [self._get_versions_url(), self._get_version_url()],
+            )
+
+        # The language and then its developer are checked once for the batch
+        eq_(2, events[FORGED_REQUEST_EVENT])
+
+    def test_failed_ancestor_check(self):
+        response = self._make_response_for_batch([
+            '/developers/{}/languages/{}/versions/'.format(
+                self.developer2.pk,
+                self.programming_language1.pk,
+            ),
+            self._get_versions_url(),
+        ])
+
+        unrelated_language_response_data, versions_response_data = \
+            response.data['responses']
+        eq_(404, unrelated_language_response_data['status'])
+        eq_(200, versions_response_data['status'])
+
+    def test_non_nested_url(self):
+        response = self._make_response_for_batch(['/batch/', '/non-existing/'])
+
+        eq_(200, response.status_code)
+        for subresponse_data in response.data['responses']:
+            eq_(404, subresponse_data['status'])
+            eq_(None, subresponse_data['data'])
+
+    def test_absolute_url(self):
+        versions_url = 'http://example.org' + self._get_versions_url()
+
+        response = self._make_response_for_batch([versions_url])
+
+        versions_response_data, = response.data['responses']
+        eq_(200, versions_response_data['status'])
+
+    def test_invalid_urls(self):
+        response = self._make_response_for_batch({'url': '/developers/'})
+
+        eq_(400, response.status_code)
+
+    def test_too_many_urls(self):
+        max_batch_size = NestedBatchView.max_batch_size
+
+        response = self._make_response_for_batch(
+            ['/developers/'] * (max_batch_size + 1),
+        )
+
+        eq_(400, response.status_code)
+
+    def test_ancestor_objects(self):
+        request = RequestFactory().get(
+            '/',
+            **{BATCH_CACHES_ENVIRON_KEY: make_batch_caches()}
+        )
+
+        with self.assertNumQueries(1):
+            website = get_ancestor_object(
+                request,
+                Website.objects.all(),
+                str(self.website.pk),
+            )
+            cached_website = \
+                get_ancestor_object(request, Website.objects.all(), website.pk)
+
+        ok_(website is cached_website)
+
+    def test_ancestor_objects_outside_batch(self):
+        request = RequestFactory().get('/')
+
+        website_queryset = Website.objects.all()
+
+        with self.assertNumQueries(2):
+            get_ancestor_object(request, website_queryset, self.website.pk)
+            get_ancestor_object(request, website_queryset, self.website.pk)
+
+    def _get_versions_url(self):
+        return '/developers/{}/languages/{}/versions/'.format(
+            self.developer1.pk,
+            self.programming_language1.pk,
+        )
+
+    def _get_version_url(self):
+        return self._get_versions_url() + \
+            '{}/'.format(self.programming_language_version.pk)
+
+    @staticmethod
+    def _make_response_for_batch(urls):
+        urlpatterns = make_urlpatterns_from_resources(_RESOURCES) + (
+            url(r'^batch/$', NestedBatchView.as_view()),
+        )
+        client = TestClient(urlpatterns)
+        response = client.post(
+            '/batch/',
+            json_dumps(urls),
+            content_type='application/json',
+        )
+        return response
+
+
+_RESOURCES = [
+    Resource(
+        'developer',
+        'developers',
+        DeveloperViewSet,
+        [
+            NestedResource(
+                'language',
+                'languages',
+                ProgrammingLanguageViewSet,
+                [
+                    NestedResource(
+                        'version',
+                        'versions',
+                        ProgrammingLanguageVersionViewSet,
+                        parent_field_lookup='language',
+                    ),
+                ],
+                parent_field_lookup='author',
+            ),
+        ],
+    ),
+]
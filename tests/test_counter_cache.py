@@ -0,0 +1,305 @@
+from io import StringIO
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from nose.tools import assert_in
+from nose.tools import assert_not_in
+from nose.tools import assert_raises
+from nose.tools import eq_
+
+from django_project.languages.models import Developer
+from django_project.languages.models import ProgrammingLanguage
+from django_project.languages.models import ProgrammingLanguageVersion
+from django_project.languages.views import DeveloperViewSet
+from django_project.languages.views import ProgrammingLanguageVersionViewSet
+from django_project.languages.views import ProgrammingLanguageViewSet
+from drf_nested_resources.pagination import NestedLimitOffsetPagination
+from drf_nested_resources.pagination import NestedPageNumberPagination
+from drf_nested_resources.routers import NestedResource
+from drf_nested_resources.routers import Resource
+from drf_nested_resources.routers import make_urlpatterns_from_resources
+from tests._testcases import FixtureTestCase
+from tests._utils import VersionCreationViewSet
+from tests._utils import build_resources
+from tests._utils import make_response_for_request
+
+_SHARD_DATABASE_ALIAS = 'shard'
+
+
+class TestCounterCache(FixtureTestCase):
+
+    databases = {'default', _SHARD_DATABASE_ALIAS}
+
+    def setUp(self):
+        super(TestCounterCache, self).setUp()
+
+        make_urlpatterns_from_resources(
+            _build_resources(ProgrammingLanguageVersionViewSet),
+        )
+        call_command('repair_nested_counter_caches', stdout=StringIO())
+
+    def test_creation(self):
+        response = self._make_response_for_request(
+            VersionCreationViewSet,
+            'POST',
+            data={'name': '3.0'},
+        )
+
+        eq_(201, response.status_code)
+        self._assert_version_count(2, self.programming_language1)
+
+    def test_deletion(self):
+        response = make_response_for_request(
+            'version-detail',
+            {
+                'developer': self.developer1.pk,
+                'language': self.programming_language1.pk,
+                'version': self.programming_language_version.pk,
+            },
+            _build_resources(ProgrammingLanguageVersionViewSet),
+            'DELETE',
+        )
+
+        eq_(204, response.status_code)
+        self._assert_version_count(0, self.programming_language1)
+
+    def test_creation_outside_resource(self):
+        ProgrammingLanguageVersion.objects.create(
+            name='5.0',
+            language=self.programming_language2,
+        )
+
+        self._assert_version_count(1, self.programming_language1)
+        self._assert_version_count(1, self.programming_language2)
+
+    def test_creation_on_other_database(self):
+        # The primary keys are the same as those on the default database
+        sharded_developer = Developer.objects \
+            .using(_SHARD_DATABASE_ALIAS) \
+            .create(pk=self.developer1.pk, name='Yukihiro Matsumoto')
+        sharded_programming_language = ProgrammingLanguage.objects \
+            .using(_SHARD_DATABASE_ALIAS) \
+            .create(
+                pk=self.programming_language1.pk,
+                name='Ruby',
+                author=sharded_developer,
+            )
+
+        ProgrammingLanguageVersion.objects \
+            .using(_SHARD_DATABASE_ALIAS) \
+            .create(name='2.7', language=sharded_programming_language)
+
+        self._assert_version_count(1, self.programming_language1)
+        sharded_programming_language = ProgrammingLanguage.objects \
+            .using(_SHARD_DATABASE_ALIAS) \
+            .get(pk=sharded_programming_language.pk)
+        eq_(1, sharded_programming_language.version_count)
+
+    def test_change_of_parent(self):
+        version = ProgrammingLanguageVersion.objects \
+            .get(pk=self.programming_language_version.pk)
+        version.language = self.programming_language2
+        version.save()
+
+        self._assert_version_count(0, self.programming_language1)
+        self._assert_version_count(1, self.programming_language2)
+
+    def test_update_without_change_of_parent(self):
+        self.programming_language_version.name = '2.7.1'
+        self.programming_language_version.save()
+
+        self._assert_version_count(1, self.programming_language1)
+
+    def test_total_count_header(self):
+        self._set_version_count(42, self.programming_language1)
+
+        response = \
+            self._make_response_for_request(ProgrammingLanguageVersionViewSet)
+
+        eq_(200, response.status_code)
+        eq_('42', response['X-Total-Count'])
+
+    def test_page_number_pagination(self):
+        self._set_version_count(42, self.programming_language1)
+
+        response = \
+            self._make_response_for_request(_PageNumberPaginatedVersionViewSet)
+
+        eq_(200, response.status_code)
+        eq_(42, response.data['count'])
+        eq_(1, len(response.data['results']))
+
+    def test_limit_offset_pagination(self):
+        self._set_version_count(42, self.programming_language1)
+
+        response = self._make_response_for_request(
+            _LimitOffsetPaginatedVersionViewSet,
+            data={'limit': 10},
+        )
+
+        eq_(200, response.status_code)
+        eq_(42, response.data['count'])
+
+    def test_filter_backends(self):
+        self._set_version_count(42, self.programming_language1)
+
+        response = self._make_response_for_request(
+            _FilteredPageNumberPaginatedVersionViewSet,
+        )
+
+        eq_(200, response.status_code)
+        eq_(1, response.data['count'])
+        assert_not_in('X-Total-Count', response)
+
+    def test_filtered_queryset(self):
+        self._set_version_count(42, self.programming_language1)
+
+        response = \
+            self._make_response_for_request(_FilteredQuerysetVersionViewSet)
+
+        eq_(200, response.status_code)
+        eq_(1, response.data['count'])
+        assert_not_in('X-Total-Count', response)
+
+    def test_custom_get_queryset(self):
+        self._set_version_count(42, self.programming_language1)
+
+        response = \
+            self._make_response_for_request(_CustomQuerysetVersionViewSet)
+
+        eq_(200, response.status_code)
+        eq_(1, response.data['count'])
+        assert_not_in('X-Total-Count', response)
+
+    def test_repair(self):
+        self._set_version_count(42, self.programming_language1)
+        self._set_version_count(42, self.programming_language2)
+        stdout = StringIO()
+
+        call_command('repair_nested_counter_caches', stdout=stdout)
+
+        self._assert_version_count(1, self.programming_language1)
+        self._assert_version_count(0, self.programming_language2)
+        assert_in(
+            'languages.ProgrammingLanguage.version_count',
+            stdout.getvalue(),
+        )
+
+    def test_repair_on_other_database(self):
+        sharded_developer = Developer.objects \
+            .using(_SHARD_DATABASE_ALIAS) \
+            .create(pk=self.developer1.pk, name='Yukihiro Matsumoto')
+        sharded_programming_language = ProgrammingLanguage.objects \
+            .using(_SHARD_DATABASE_ALIAS) \
+            .create(
+                pk=self.programming_language1.pk,
+                name='Ruby',
+                author=sharded_developer,
+                version_count=42,
+            )
+        self._set_version_count(42, self.programming_language1)
+
+        call_command(
+            'repair_nested_counter_caches',
+            database=_SHARD_DATABASE_ALIAS,
+            stdout=StringIO(),
+        )
+
+        sharded_programming_language = ProgrammingLanguage.objects \
+            .using(_SHARD_DATABASE_ALIAS) \
+            .get(pk=sharded_programming_language.pk)
+        eq_(0, sharded_programming_language.version_count)
+        self._assert_version_count(42, self.programming_language1)
+
+    def test_unknown_counter_field(self):
+        resources = [
+            Resource(
+                'developer',
+                'developers',
+                DeveloperViewSet,
+                [
+                    NestedResource(
+                        'language',
+                        'languages',
+                        ProgrammingLanguageViewSet,
+                        parent_field_lookup='author',
+                        parent_counter_cache_field='language_count',
+                    ),
+                ],
+            ),
+        ]
+
+        with assert_raises(ImproperlyConfigured):
+            make_urlpatterns_from_resources(resources)
+
+    def _make_response_for_request(
+        self,
+        version_viewset,
+        method_name='GET',
+        **kwargs
+    ):
+        response = make_response_for_request(
+            'version-list',
+            {
+                'developer': self.developer1.pk,
+                'language': self.programming_language1.pk,
+            },
+            _build_resources(version_viewset),
+            method_name,
+            **kwargs
+        )
+        return response
+
+    @staticmethod
+    def _assert_version_count(expected_version_count, programming_language):
+        programming_language = \
+            ProgrammingLanguage.objects.get(pk=programming_language.pk)
+        eq_(expected_version_count, programming_language.version_count)
+
+    @staticmethod
+    def _set_version_count(version_count, programming_language):
+        ProgrammingLanguage.objects \
+            .filter(pk=programming_language.pk) \
+            .update(version_count=version_count)
+
+
+class _PageNumberPagination(NestedPageNumberPagination):
+    page_size = 10
+
+
+class _PageNumberPaginatedVersionViewSet(ProgrammingLanguageVersionViewSet):
+    pagination_class = _PageNumberPagination
+
+
+class _LimitOffsetPaginatedVersionViewSet(ProgrammingLanguageVersionViewSet):
+    pagination_class = NestedLimitOffsetPagination
+
+
+class _NoopFilterBackend:
+
+    def filter_queryset(self, request, queryset, view):
+        return queryset
+
+
+class _FilteredPageNumberPaginatedVersionViewSet(
+    _PageNumberPaginatedVersionViewSet,
+):
+    filter_backends = (_NoopFilterBackend,)
+
+
+class _FilteredQuerysetVersionViewSet(_PageNumberPaginatedVersionViewSet):
+    queryset = ProgrammingLanguageVersion.objects.exclude(name='')
+
+
+class _CustomQuerysetVersionViewSet(_PageNumberPaginatedVersionViewSet):
+
+    def get_queryset(self):
+        return super(_CustomQuerysetVersionViewSet, self).get_queryset()
+
+
+def _build_resources(version_viewset):
+    resources = build_resources(
+        version_viewset,
+        version_counter_cache_field='version_count',
+    )
+    return resources
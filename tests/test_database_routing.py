@@ -0,0 +1,388 @@
+from time import time
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.http.response import HttpResponse
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.test.utils import override_settings
+from nose.tools import assert_in
+from nose.tools import assert_not_in
+from nose.tools import assert_raises
+from nose.tools import eq_
+from nose.tools import ok_
+
+from django_project.languages.models import Developer
+from django_project.languages.models import ProgrammingLanguage
+from django_project.languages.models import ProgrammingLanguageImplementation
+from django_project.languages.models import ProgrammingLanguageVersion
+from django_project.languages.views import \
+    ProgrammingLanguageImplementationViewSet
+from django_project.languages.views import ProgrammingLanguageVersionViewSet
+from drf_nested_resources._database_routing import \
+    READ_REPLICA_PIN_COOKIE_NAME
+from drf_nested_resources._database_routing import \
+    get_database_alias_for_route
+from drf_nested_resources._database_routing import pin_to_primary_database
+from drf_nested_resources._index_advisor import get_relational_routes
+from drf_nested_resources.routers import NestedResource
+from drf_nested_resources.routers import make_urlpatterns_from_resources
+from tests._testcases import FixtureTestCase
+from tests._utils import VersionCreationViewSet
+from tests._utils import build_resources
+from tests._utils import make_response_for_request
+
+_SHARD_DATABASE_ALIAS = 'shard'
+
+_SHARDED_DEVELOPER_PK = 1000
+
+_REPLICA_DATABASE_ALIAS = 'replica'
+
+
+def _route_developer_to_shard(resource_name, resource_pk):
+    if int(resource_pk) == _SHARDED_DEVELOPER_PK:
+        database_alias = _SHARD_DATABASE_ALIAS
+    else:
+        database_alias = None
+    return database_alias
+
+
+_ROUTER_PATH = 'tests.test_database_routing._route_developer_to_shard'
+
+
+@override_settings(
+    DRF_NESTED_RESOURCES_ROOT_ANCESTOR_DATABASE_ROUTER=_ROUTER_PATH,
+)
+class TestRootAncestorDatabaseRouting(FixtureTestCase):
+
+    databases = {'default', _SHARD_DATABASE_ALIAS}
+
+    def setUp(self):
+        super(TestRootAncestorDatabaseRouting, self).setUp()
+
+        self.sharded_developer = Developer.objects \
+            .using(_SHARD_DATABASE_ALIAS) \
+            .create(pk=_SHARDED_DEVELOPER_PK, name='Yukihiro Matsumoto')
+        self.sharded_programming_language = ProgrammingLanguage.objects \
+            .using(_SHARD_DATABASE_ALIAS) \
+            .create(name='Ruby', author=self.sharded_developer)
+        self.sharded_programming_language_version = \
+            ProgrammingLanguageVersion.objects \
+            .using(_SHARD_DATABASE_ALIAS) \
+            .create(name='2.7', language=self.sharded_programming_language)
+
+    def test_root_resource(self):
+        response = make_response_for_request(
+            'developer-detail',
+            {'developer': self.sharded_developer.pk},
+            _RESOURCES,
+        )
+
+        eq_(200, response.status_code)
+        eq_(self.sharded_developer.name, response.data['name'])
+
+    def test_nested_collection(self):
+        response = make_response_for_request(
+            'version-list',
+            {
+                'developer': self.sharded_developer.pk,
+                'language': self.sharded_programming_language.pk,
+            },
+            _RESOURCES,
+        )
+
+        eq_(200, response.status_code)
+        eq_(1, len(response.data))
+        eq_(
+            self.sharded_programming_language_version.name,
+            response.data[0]['name'],
+        )
+
+    def test_nested_resource(self):
+        response = make_response_for_request(
+            'version-detail',
+            {
+                'developer': self.sharded_developer.pk,
+                'language': self.sharded_programming_language.pk,
+                'version': self.sharded_programming_language_version.pk,
+            },
+            _RESOURCES,
+        )
+
+        eq_(200, response.status_code)
+        eq_(
+            self.sharded_programming_language_version.name,
+            response.data['name'],
+        )
+
+    def test_creation(self):
+        response = make_response_for_request(
+            'version-list',
+            {
+                'developer': self.sharded_developer.pk,
+                'language': self.sharded_programming_language.pk,
+            },
+            _build_resources(VersionCreationViewSet),
+            'POST',
+            data={'name': '3.0'},
+        )
+
+        eq_(201, response.status_code)
+        ok_(
+            ProgrammingLanguageVersion.objects
+            .using(_SHARD_DATABASE_ALIAS)
+            .filter(name='3.0')
+            .exists(),
+        )
+        ok_(not ProgrammingLanguageVersion.objects.filter(name='3.0').exists())
+
+    def test_creation_with_field_forced_to_ancestor(self):
+        response = make_response_for_request(
+            'implementation-list',
+            {
+                'developer': self.sharded_developer.pk,
+                'language': self.sharded_programming_language.pk,
+            },
+            _RESOURCES,
+            'POST',
+            data='{"name": "MRI"}',
+            content_type='application/json',
+        )
+
+        eq_(201, response.status_code)
+        implementation = ProgrammingLanguageImplementation.objects \
+            .using(_SHARD_DATABASE_ALIAS) \
+            .get(name='MRI')
+        eq_(self.sharded_programming_language.pk, implementation.language_id)
+        ok_(
+            not ProgrammingLanguageImplementation.objects
+            .filter(name='MRI')
+            .exists(),
+        )
+
+    def test_unrouted_root_ancestor(self):
+        response = make_response_for_request(
+            'language-list',
+            {'developer': self.developer1.pk},
+            _RESOURCES,
+        )
+
+        eq_(200, response.status_code)
+        eq_(1, len(response.data))
+        eq_(self.programming_language1.name, response.data[0]['name'])
+
+    def test_root_ancestor_missing_from_shard(self):
+        Developer.objects \
+            .using(_SHARD_DATABASE_ALIAS) \
+            .filter(pk=self.sharded_developer.pk) \
+            .delete()
+        Developer.objects.create(pk=_SHARDED_DEVELOPER_PK, name='Matz')
+
+        response = make_response_for_request(
+            'language-list',
+            {'developer': _SHARDED_DEVELOPER_PK},
+            _RESOURCES,
+        )
+
+        eq_(404, response.status_code)
+
+    def test_shallow_detail_routes(self):
+        with assert_raises(ImproperlyConfigured):
+            make_urlpatterns_from_resources(
+                _RESOURCES,
+                shallow_detail_routes=True,
+            )
+
+
+@override_settings(
+    DRF_NESTED_RESOURCES_READ_REPLICA_DATABASE_ALIAS=_REPLICA_DATABASE_ALIAS,
+)
+class TestReadReplicaRouting(FixtureTestCase):
+
+    databases = {'default', _REPLICA_DATABASE_ALIAS}
+
+    def setUp(self):
+        super(TestReadReplicaRouting, self).setUp()
+
+        for fixture_object in (
+            self.developer1,
+            self.developer2,
+            self.website,
+            self.programming_language1,
+            self.programming_language2,
+            self.programming_language_version,
+        ):
+            fixture_object.save(using=_REPLICA_DATABASE_ALIAS)
+
+    def test_read(self):
+        response, primary_query_count, replica_query_count = \
+            self._make_response_for_versions()
+
+        eq_(200, response.status_code)
+        eq_(1, len(response.data))
+        eq_(0, primary_query_count)
+        ok_(replica_query_count)
+        assert_not_in(READ_REPLICA_PIN_COOKIE_NAME, response.cookies)
+
+    def test_write(self):
+        response, primary_query_count, _ = self._make_response_for_versions(
+            'POST',
+            VersionCreationViewSet,
+            data={'name': '3.0'},
+        )
+
+        eq_(201, response.status_code)
+        ok_(primary_query_count)
+        assert_in(READ_REPLICA_PIN_COOKIE_NAME, response.cookies)
+
+    def test_failed_write(self):
+        response, _, _ = self._make_response_for_versions(
+            'POST',
+            VersionCreationViewSet,
+            data={},
+        )
+
+        eq_(400, response.status_code)
+        assert_not_in(READ_REPLICA_PIN_COOKIE_NAME, response.cookies)
+
+    def test_read_after_write(self):
+        response, primary_query_count, replica_query_count = \
+            self._make_response_for_versions(
+                HTTP_COOKIE=_make_pin_cookie(time() + 60),
+            )
+
+        eq_(200, response.status_code)
+        ok_(primary_query_count)
+        eq_(0, replica_query_count)
+
+    def test_expired_pin(self):
+        _, primary_query_count, replica_query_count = \
+            self._make_response_for_versions(
+                HTTP_COOKIE=_make_pin_cookie(time() - 60),
+            )
+
+        eq_(0, primary_query_count)
+        ok_(replica_query_count)
+
+    def test_malformed_pin(self):
+        _, primary_query_count, replica_query_count = \
+            self._make_response_for_versions(
+                HTTP_COOKIE=_make_pin_cookie('tomorrow'),
+            )
+
+        eq_(0, primary_query_count)
+        ok_(replica_query_count)
+
+    def test_ancestor_checks_of_write(self):
+        response, primary_query_count, replica_query_count = \
+            self._make_response_for_versions(
+                'POST',
+                VersionCreationViewSet,
+                data={'name': '3.0'},
+            )
+
+        eq_(201, response.status_code)
+        ok_(primary_query_count)
+        eq_(0, replica_query_count)
+
+    def test_read_after_write_by_authenticated_user(self):
+        cache.clear()
+        relational_route = get_relational_routes(
+            make_urlpatterns_from_resources(_RESOURCES),
+        )[-1]
+        user = _AuthenticatedUser(1)
+
+        write_request = RequestFactory().post('/')
+        write_request.user = user
+        pin_to_primary_database(write_request, HttpResponse(status=201))
+
+        read_request = RequestFactory().get('/')
+        read_request.user = user
+        eq_(
+            None,
+            get_database_alias_for_route(relational_route, {}, read_request),
+        )
+        other_user_read_request = RequestFactory().get('/')
+        other_user_read_request.user = _AuthenticatedUser(2)
+        eq_(
+            _REPLICA_DATABASE_ALIAS,
+            get_database_alias_for_route(
+                relational_route,
+                {},
+                other_user_read_request,
+            ),
+        )
+
+    @override_settings(DRF_NESTED_RESOURCES_READ_REPLICA_DATABASE_ALIAS=None)
+    def test_no_replica(self):
+        response, _, replica_query_count = self._make_response_for_versions(
+            'POST',
+            VersionCreationViewSet,
+            data={'name': '3.0'},
+        )
+
+        eq_(201, response.status_code)
+        eq_(0, replica_query_count)
+        assert_not_in(READ_REPLICA_PIN_COOKIE_NAME, response.cookies)
+
+    def _make_response_for_versions(
+        self,
+        method_name='GET',
+        version_viewset=ProgrammingLanguageVersionViewSet,
+        **kwargs
+    ):
+        primary_connection = connections['default']
+        replica_connection = connections[_REPLICA_DATABASE_ALIAS]
+        with CaptureQueriesContext(primary_connection) as primary_queries, \
+                CaptureQueriesContext(replica_connection) as replica_queries:
+            response = make_response_for_request(
+                'version-list',
+                {
+                    'developer': self.developer1.pk,
+                    'language': self.programming_language1.pk,
+                },
+                _build_resources(version_viewset),
+                method_name,
+                **kwargs
+            )
+        return response, len(primary_queries), len(replica_queries)
+
+
+class _AuthenticatedUser:
+
+    is_authenticated = True
+
+    def __init__(self, pk):
+        self.pk = pk
+
+
+class _UnversionedImplementationViewSet(
+    ProgrammingLanguageImplementationViewSet,
+):
+
+    # The namespace versioning of the project cannot validate hyperlinks
+    # outside a namespace
+    versioning_class = None
+
+
+def _make_pin_cookie(pin_expiry):
+    return '{}={}'.format(READ_REPLICA_PIN_COOKIE_NAME, pin_expiry)
+
+
+def _build_resources(version_viewset):
+    resources = build_resources(
+        version_viewset,
+        language_sub_resources=[
+            NestedResource(
+                'implementation',
+                'implementations',
+                _UnversionedImplementationViewSet,
+                parent_field_lookup='language',
+            ),
+        ],
+    )
+    return resources
+
+
+_RESOURCES = _build_resources(ProgrammingLanguageVersionViewSet)
@@ -0,0 +1,164 @@
+from json import loads as json_loads
+
+from django.conf import settings
+from django.http import Http404
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+from nose.tools import assert_not_in
+from nose.tools import assert_raises
+from nose.tools import eq_
+from nose.tools import ok_
+
+from django_project.languages.views import DeveloperViewSet
+from django_project.languages.views import ProgrammingLanguageVersionViewSet
+from django_project.languages.views import ProgrammingLanguageViewSet
+from drf_nested_resources.debug import nested_request_trees_view
+from drf_nested_resources.routers import NestedResource
+from drf_nested_resources.routers import Resource
+from tests._testcases import FixtureTestCase
+from tests._utils import make_response_for_request
+
+_DEBUG_MIDDLEWARE = list(settings.MIDDLEWARE) + [
+    'drf_nested_resources.debug.NestedRequestTreeMiddleware',
+]
+
+
+@override_settings(DEBUG=True, MIDDLEWARE=_DEBUG_MIDDLEWARE)
+class TestNestedRequestTree(FixtureTestCase):
+
+    def test_request(self):
+        request_tree_data = self._get_request_tree_data()
+
+        eq_('GET', request_tree_data['method'])
+        eq_(self._get_version_url_path(), request_tree_data['url'])
+        eq_(200, request_tree_data['status_code'])
+        ok_(request_tree_data['queries'])
+        ok_(request_tree_data['duration'] > 0)
+
+    def test_ancestor_checks(self):
+        request_tree_data = self._get_request_tree_data()
+
+        # The ancestors are checked along with both the view and the object
+        # permissions of each detail view
+        eq_(2, len(request_tree_data['children']))
+        for language_request_data in request_tree_data['children']:
+            eq_('HEAD', language_request_data['method'])
+            eq_(
+                'http://example.org/developers/{}/languages/{}/'.format(
+                    self.developer1.pk,
+                    self.programming_language1.pk,
+                ),
+                language_request_data['url'],
+            )
+            eq_(200, language_request_data['status_code'])
+            ok_(language_request_data['queries'])
+
+            eq_(2, len(language_request_data['children']))
+            developer_request_data = language_request_data['children'][0]
+            eq_(
+                'http://example.org/developers/{}/'.format(self.developer1.pk),
+                developer_request_data['url'],
+            )
+            eq_([], developer_request_data['children'])
+
+    def test_lookup_helpers(self):
+        request_tree_data = self._get_request_tree_data()
+
+        lookup_helpers_data = {
+            lookup_helper_data['resource_name']: lookup_helper_data
+            for lookup_helper_data in request_tree_data['lookup_helpers']
+        }
+        language_lookup_helper_data = lookup_helpers_data['language']
+        eq_(
+            'SimpleParentLookupHelper',
+            language_lookup_helper_data['lookup_helper'],
+        )
+        eq_('language', language_lookup_helper_data['lookup'])
+        eq_(1, language_lookup_helper_data['count'])
+        # The primary key of the root ancestor is taken from the foreign key
+        assert_not_in('developer', lookup_helpers_data)
+
+    def test_query_plans_disabled(self):
+        request_tree_data = self._get_request_tree_data()
+
+        eq_([], request_tree_data['query_plans'])
+
+    @override_settings(DRF_NESTED_RESOURCES_DEBUG_QUERY_PLANS=True)
+    def test_query_plans(self):
+        request_tree_data = self._get_request_tree_data()
+
+        query_plans_data = request_tree_data['query_plans']
+        ok_(query_plans_data)
+        eq_(
+            {'version', 'language', 'developer'},
+            {
+                query_plan_data['route_name']
+                for query_plan_data in query_plans_data
+            },
+        )
+        for query_plan_data in query_plans_data:
+            ok_(query_plan_data['plan'])
+        # The queries explaining the others are not recorded as such
+        for query_data in request_tree_data['queries']:
+            ok_(not query_data['sql'].startswith('EXPLAIN'))
+
+    @override_settings(DEBUG=False)
+    def test_debug_disabled(self):
+        request = RequestFactory().get('/')
+
+        with assert_raises(Http404):
+            nested_request_trees_view(request)
+
+    def _get_request_tree_data(self):
+        response = make_response_for_request(
+            'version-detail',
+            self._get_version_view_kwargs(),
+            _RESOURCES,
+        )
+        eq_(200, response.status_code)
+
+        request = RequestFactory().get('/')
+        debug_response = nested_request_trees_view(request)
+        debug_response_data = json_loads(debug_response.content.decode())
+        return debug_response_data['requests'][0]
+
+    def _get_version_url_path(self):
+        url_path = '/developers/{}/languages/{}/versions/{}/'.format(
+            self.developer1.pk,
+            self.programming_language1.pk,
+            self.programming_language_version.pk,
+        )
+        return url_path
+
+    def _get_version_view_kwargs(self):
+        view_kwargs = {
+            'developer': self.developer1.pk,
+            'language': self.programming_language1.pk,
+            'version': self.programming_language_version.pk,
+        }
+        return view_kwargs
+
+
+_RESOURCES = [
+    Resource(
+        'developer',
+        'developers',
+        DeveloperViewSet,
+        [
+            NestedResource(
+                'language',
+                'languages',
+                ProgrammingLanguageViewSet,
+                [
+                    NestedResource(
+                        'version',
+                        'versions',
+                        ProgrammingLanguageVersionViewSet,
+                        parent_field_lookup='language',
+                    ),
+                ],
+                parent_field_lookup='author',
+            ),
+        ],
+    ),
+]
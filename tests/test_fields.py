@@ -8,32 +8,44 @@ from nose.tools import assert_in
 from nose.tools import assert_is_none
 from nose.tools import assert_raises
 from nose.tools import eq_
+from nose.tools import ok_
 from rest_framework.fields import empty
+from rest_framework.permissions import BasePermission
+from rest_framework.relations import PKOnlyObject
 from rest_framework.request import Request
 from rest_framework.reverse import reverse
+from rest_framework.serializers import ModelSerializer
+from rest_framework.serializers import SerializerMethodField
 from rest_framework.test import APIRequestFactory
 from rest_framework.utils.model_meta import get_field_info
 
 from django_project.languages.models import Developer
 from django_project.languages.models import ProgrammingLanguage
 from django_project.languages.models import ProgrammingLanguageImplementation
+from django_project.languages.models import ProgrammingLanguageVersion
 from django_project.languages.models import Website
 from django_project.languages.views import DeveloperViewSet
 from django_project.languages.views import DeveloperViewSet2
+from django_project.languages.views import DeveloperViewSet3
 from django_project.languages.views import \
     ProgrammingLanguageImplementationViewSet
 from django_project.languages.views import ProgrammingLanguageVersionViewSet
 from django_project.languages.views import ProgrammingLanguageViewSet
+from django_project.languages.views import ProgrammingLanguageViewSet2
+from django_project.languages.views import ProgrammingLanguageViewSet3
 from django_project.languages.views import WebsiteHostViewSet
 from django_project.languages.views import WebsiteViewSet
 from django_project.languages.views import WebsiteVisitViewSet
 from drf_nested_resources.fields import HyperlinkedNestedIdentityField
+from drf_nested_resources.fields import HyperlinkedNestedModelSerializer
 from drf_nested_resources.fields import HyperlinkedNestedRelatedField
 from drf_nested_resources.lookup_helpers import RequestParentLookupHelper
 from drf_nested_resources.routers import NestedResource
 from drf_nested_resources.routers import Resource
 from drf_nested_resources.routers import make_urlpatterns_from_resources
 from tests._testcases import FixtureTestCase
+from tests._utils import build_resources
+from tests._utils import make_response_for_request
 
 _REQUEST_FACTORY = APIRequestFactory(SERVER_NAME='example.org')
 
@@ -457,6 +469,79 @@ class TestRelatedLinkedFieldURLGeneration(_BaseHyperlinkedFieldTestCase):
         )
 
 
+class TestPkOnlyOptimization(_BaseTestCase):
+
+    def test_top_level_resource(self):
+        field = self._make_field('developer-detail')
+
+        ok_(field.use_pk_only_optimization())
+
+        url = field.get_url(
+            PKOnlyObject(self.developer1.pk),
+            'developer-detail',
+            self._drf_request,
+            None,
+        )
+        expected_url = self._make_url(
+            'developer-detail',
+            {'developer': self.developer1.pk},
+        )
+        eq_(expected_url, url)
+
+    def test_nested_resource(self):
+        field = self._make_field('language-detail')
+
+        assert_false(field.use_pk_only_optimization())
+
+    def test_nested_collection(self):
+        field = self._make_field('language-list')
+
+        assert_false(field.use_pk_only_optimization())
+
+    def test_root_ancestor_from_foreign_key(self):
+        field = self._make_field('version-detail')
+        version = ProgrammingLanguageVersion.objects \
+            .get(pk=self.programming_language_version.pk)
+
+        # Only the programming language is retrieved
+        with self.assertNumQueries(1):
+            url = field.get_url(
+                version,
+                'version-detail',
+                self._drf_request,
+                None,
+            )
+
+        expected_url = self._make_url(
+            'version-detail',
+            {
+                'developer': self.developer1.pk,
+                'language': self.programming_language1.pk,
+                'version': version.pk,
+            },
+        )
+        eq_(expected_url, url)
+
+    @property
+    def _drf_request(self):
+        django_request = self._make_django_request('developer-list', {})
+        return self._make_drf_request(django_request)
+
+    def _make_field(self, view_name):
+        url_generator = self._get_url_generator(self._drf_request)
+        field = HyperlinkedNestedRelatedField(
+            view_name,
+            url_generator=url_generator,
+            read_only=True,
+        )
+        return field
+
+    def _make_url(self, view_name, view_kwargs):
+        url_path = \
+            reverse(view_name, kwargs=view_kwargs, urlconf=self.urlpatterns)
+        return _REQUEST_FACTORY.get('/').build_absolute_uri(url_path)
+
+
 class TestSerializerURLFieldGeneration(_BaseTestCase):
 
     def test_identity_field(self):
@@ -629,6 +714,620 @@ class TestFieldForcedToAncestor(_BaseTestCase):
         return url
 
 
+class TestIncludedRelationships(FixtureTestCase):
+
+    def setUp(self):
+        super(TestIncludedRelationships, self).setUp()
+
+        self.programming_language3 = ProgrammingLanguage.objects.create(
+            name='Jython',
+            author=self.developer1,
+        )
+        ProgrammingLanguageVersion.objects.create(
+            name='2.5',
+            language=self.programming_language3,
+        )
+
+    def test_no_inclusion(self):
+        response = self._make_response_for_request()
+
+        eq_(200, response.status_code)
+        ok_(isinstance(response.data['programming_languages'], str))
+
+    def test_sub_collection_inclusion(self):
+        response = \
+            self._make_response_for_request(include='programming_languages')
+
+        eq_(200, response.status_code)
+        languages_data = response.data['programming_languages']
+        eq_(2, len(languages_data))
+        eq_(
+            {self.programming_language1.name, self.programming_language3.name},
+            {language_data['name'] for language_data in languages_data},
+        )
+        for language_data in languages_data:
+            ok_(isinstance(language_data['versions'], str))
+
+    def test_nested_sub_collection_inclusion(self):
+        with self.assertNumQueries(3):
+            response = self._make_response_for_request(
+                include='programming_languages.versions',
+            )
+
+        eq_(200, response.status_code)
+        version_names = [
+            version_data['name']
+            for language_data in response.data['programming_languages']
+            for version_data in language_data['versions']
+        ]
+        eq_(['2.7', '2.5'], version_names)
+
+    def test_forbidden_sub_collection(self):
+        resources = _build_included_resources(_AccessDeniedVersionViewSet)
+        view_kwargs = {
+            'developer': self.developer1.pk,
+            'language': self.programming_language1.pk,
+        }
+        versions_response = make_response_for_request(
+            'version-list',
+            view_kwargs,
+            resources,
+        )
+        eq_(403, versions_response.status_code)
+
+        language_response = make_response_for_request(
+            'language-detail',
+            view_kwargs,
+            resources,
+            data={'include': 'versions'},
+        )
+        eq_(200, language_response.status_code)
+        ok_(isinstance(language_response.data['versions'], str))
+
+    def test_scoped_sub_collection(self):
+        response = self._make_response_for_request(
+            _build_included_resources(_ScopedVersionViewSet),
+            include='programming_languages.versions',
+        )
+
+        eq_(200, response.status_code)
+        version_names = [
+            version_data['name']
+            for language_data in response.data['programming_languages']
+            for version_data in language_data['versions']
+        ]
+        eq_(['2.5'], version_names)
+
+    def test_forbidden_included_resources(self):
+        response = self._make_response_for_request(
+            _build_included_resources(_ObjectAccessDeniedVersionViewSet),
+            include='programming_languages.versions',
+        )
+
+        eq_(200, response.status_code)
+        version_names = [
+            version_data['name']
+            for language_data in response.data['programming_languages']
+            for version_data in language_data['versions']
+        ]
+        eq_(['2.5'], version_names)
+
+    def test_unknown_relationship(self):
+        response = self._make_response_for_request(include='name,foo.bar')
+
+        eq_(200, response.status_code)
+        eq_(self.developer1.name, response.data['name'])
+
+    def _make_response_for_request(self, resources=None, **query_params):
+        response = make_response_for_request(
+            'developer-detail',
+            {'developer': self.developer1.pk},
+            resources or _build_included_resources(
+                ProgrammingLanguageVersionViewSet,
+            ),
+            data=query_params,
+        )
+        return response
+
+
+class TestExpandedRelationships(FixtureTestCase):
+
+    def setUp(self):
+        super(TestExpandedRelationships, self).setUp()
+
+        ProgrammingLanguage.objects.create(
+            name='Jython',
+            author=self.developer1,
+        )
+
+    def test_no_expansion(self):
+        # The authors are not retrieved to link to them
+        with self.assertNumQueries(2):
+            response = self._make_response_for_request(DeveloperViewSet)
+
+        eq_(200, response.status_code)
+        for language_data in response.data:
+            ok_(isinstance(language_data['author'], str))
+
+    def test_to_one_relationship_expansion(self):
+        with self.assertNumQueries(2):
+            response = self._make_response_for_request(
+                DeveloperViewSet,
+                expand='author',
+            )
+
+        eq_(200, response.status_code)
+        eq_(2, len(response.data))
+        for language_data in response.data:
+            author_data = language_data['author']
+            eq_(self.developer1.name, author_data['name'])
+            ok_(isinstance(author_data['programming_languages'], str))
+
+    def test_expansion_of_forbidden_resource(self):
+        response = self._make_response_for_request(
+            _ObjectAccessDeniedDeveloperViewSet,
+            expand='author',
+        )
+
+        eq_(200, response.status_code)
+        for language_data in response.data:
+            ok_(isinstance(language_data['author'], str))
+
+    def test_to_many_relationship_expansion(self):
+        response = make_response_for_request(
+            'developer-detail',
+            {'developer': self.developer1.pk},
+            build_resources(developer_viewset=DeveloperViewSet),
+            data={'expand': 'programming_languages'},
+        )
+
+        eq_(200, response.status_code)
+        ok_(isinstance(response.data['programming_languages'], str))
+
+    def test_nested_resource_expansion(self):
+        response = self._make_response_for_website_request(
+            DeveloperViewSet,
+            _AncestorCheckingLanguageViewSet,
+        )
+
+        eq_(200, response.status_code)
+        eq_(self.programming_language1.name, response.data['language']['name'])
+
+    def test_expansion_of_resource_with_forbidden_ancestor(self):
+        response = self._make_response_for_website_request(
+            _HiddenDeveloperViewSet,
+            ProgrammingLanguageViewSet,
+        )
+
+        eq_(200, response.status_code)
+        ok_(isinstance(response.data['language'], str))
+
+    def _make_response_for_request(self, developer_viewset, **query_params):
+        response = make_response_for_request(
+            'language-list',
+            {'developer': self.developer1.pk},
+            build_resources(developer_viewset=developer_viewset),
+            data=query_params,
+        )
+        return response
+
+    def _make_response_for_website_request(
+        self,
+        developer_viewset,
+        language_viewset,
+    ):
+        website = Website.objects.create(base_url='http://python.org/')
+        self.programming_language1.website = website
+        self.programming_language1.save()
+
+        website_resource = Resource(
+            'website',
+            'websites',
+            _LanguageLinkedWebsiteViewSet,
+        )
+        resources = [
+            Resource(
+                'developer',
+                'developers',
+                developer_viewset,
+                [
+                    NestedResource(
+                        'language',
+                        'languages',
+                        language_viewset,
+                        parent_field_lookup='author',
+                        cross_linked_resources={'website': website_resource},
+                    ),
+                ],
+            ),
+            website_resource,
+        ]
+        response = make_response_for_request(
+            'website-detail',
+            {'website': website.pk},
+            resources,
+            data={'expand': 'language'},
+        )
+        return response
+
+
+class TestSparseFieldsets(FixtureTestCase):
+
+    def setUp(self):
+        super(TestSparseFieldsets, self).setUp()
+
+        ProgrammingLanguage.objects.create(
+            name='Jython',
+            author=self.developer1,
+        )
+
+    def test_all_fields(self):
+        response = self._make_response_for_request()
+
+        eq_(200, response.status_code)
+        for language_data in response.data:
+            eq_(['url', 'name', 'author'], list(language_data.keys()))
+
+    def test_requested_fields(self):
+        with self.assertNumQueries(2):
+            response = self._make_response_for_request(fields='name')
+
+        eq_(200, response.status_code)
+        eq_(2, len(response.data))
+        for language_data in response.data:
+            eq_(['name'], list(language_data.keys()))
+
+    def test_unknown_fields(self):
+        response = self._make_response_for_request(fields='name,foo')
+
+        eq_(200, response.status_code)
+        for language_data in response.data:
+            eq_(['name'], list(language_data.keys()))
+
+    def test_expansion_of_unrequested_field(self):
+        with self.assertNumQueries(2):
+            response = \
+                self._make_response_for_request(fields='name', expand='author')
+
+        eq_(200, response.status_code)
+        for language_data in response.data:
+            eq_(['name'], list(language_data.keys()))
+
+    def test_expansion_of_requested_field(self):
+        response = \
+            self._make_response_for_request(fields='author', expand='author')
+
+        eq_(200, response.status_code)
+        for language_data in response.data:
+            eq_(['author'], list(language_data.keys()))
+            eq_(self.developer1.name, language_data['author']['name'])
+
+    def test_requested_method_field(self):
+        resources = [
+            Resource(
+                'developer',
+                'developers',
+                DeveloperViewSet,
+                [
+                    NestedResource(
+                        'language',
+                        'languages',
+                        _LabelledLanguageViewSet,
+                        parent_field_lookup='author',
+                    ),
+                ],
+            ),
+        ]
+
+        with self.assertNumQueries(2):
+            response = make_response_for_request(
+                'language-list',
+                {'developer': self.developer1.pk},
+                resources,
+                data={'fields': 'label'},
+            )
+
+        eq_(200, response.status_code)
+        eq_(
+            {'PYTHON', 'JYTHON'},
+            {language_data['label'] for language_data in response.data},
+        )
+
+    def _make_response_for_request(self, **query_params):
+        response = make_response_for_request(
+            'language-list',
+            {'developer': self.developer1.pk},
+            build_resources(developer_viewset=DeveloperViewSet),
+            data=query_params,
+        )
+        return response
+
+
+class TestPlainSerializers(FixtureTestCase):
+
+    def test_requested_fields(self):
+        response = make_response_for_request(
+            'version-list',
+            {
+                'developer': self.developer1.pk,
+                'language': self.programming_language1.pk,
+            },
+            _build_included_resources(_PlainVersionViewSet),
+            data={'fields': 'name'},
+        )
+
+        eq_(200, response.status_code)
+        eq_(
+            [{'id': self.programming_language_version.pk, 'name': '2.7'}],
+            response.data,
+        )
+
+    def test_included_collection(self):
+        response = make_response_for_request(
+            'language-detail',
+            {
+                'developer': self.developer1.pk,
+                'language': self.programming_language1.pk,
+            },
+            _build_included_resources(_PlainVersionViewSet),
+            data={'include': 'versions'},
+        )
+
+        eq_(200, response.status_code)
+        ok_(isinstance(response.data['versions'], str))
+
+    def test_expanded_resource(self):
+        response = make_response_for_request(
+            'language-list',
+            {'developer': self.developer1.pk},
+            build_resources(developer_viewset=_PlainDeveloperViewSet),
+            data={'expand': 'author'},
+        )
+
+        eq_(200, response.status_code)
+        for language_data in response.data:
+            ok_(isinstance(language_data['author'], str))
+
+
+class TestRelationshipCounts(FixtureTestCase):
+
+    _RESOURCES = build_resources(
+        developer_viewset=DeveloperViewSet3,
+        language_viewset=ProgrammingLanguageViewSet3,
+    )
+
+    def setUp(self):
+        super(TestRelationshipCounts, self).setUp()
+
+        self.programming_language3 = ProgrammingLanguage.objects.create(
+            name='Jython',
+            author=self.developer1,
+        )
+
+    def test_collection(self):
+        with self.assertNumQueries(1):
+            response = self._make_response_for_request('developer-list', {})
+
+        eq_(200, response.status_code)
+        counts_by_developer_name = {
+            developer_data['name']:
+                developer_data['programming_languages_count']
+            for developer_data in response.data
+        }
+        eq_(
+            {self.developer1.name: 2, self.developer2.name: 1},
+            counts_by_developer_name,
+        )
+
+    def test_resource(self):
+        response = self._make_response_for_request(
+            'developer-detail',
+            {'developer': self.developer1.pk},
+        )
+
+        eq_(200, response.status_code)
+        eq_(
+            ['url', 'name', 'programming_languages',
+             'programming_languages_count'],
+            list(response.data.keys()),
+        )
+        eq_(2, response.data['programming_languages_count'])
+
+    def test_nested_collection(self):
+        response = self._make_response_for_request(
+            'language-list',
+            {'developer': self.developer1.pk},
+        )
+
+        eq_(200, response.status_code)
+        counts_by_language_name = {
+            language_data['name']: language_data['versions_count']
+            for language_data in response.data
+        }
+        eq_(
+            {
+                self.programming_language1.name: 1,
+                self.programming_language3.name: 0,
+            },
+            counts_by_language_name,
+        )
+
+    def test_included_sub_collection(self):
+        with self.assertNumQueries(2):
+            response = self._make_response_for_request(
+                'developer-detail',
+                {'developer': self.developer1.pk},
+                include='programming_languages',
+            )
+
+        eq_(200, response.status_code)
+        eq_(2, response.data['programming_languages_count'])
+        eq_(
+            [1, 0],
+            [
+                language_data['versions_count'] for language_data in
+                response.data['programming_languages']
+            ],
+        )
+
+    def test_requested_fields(self):
+        response = self._make_response_for_request(
+            'developer-list',
+            {},
+            fields='programming_languages_count',
+        )
+
+        eq_(200, response.status_code)
+        for developer_data in response.data:
+            eq_(['programming_languages_count'], list(developer_data.keys()))
+
+    def test_unannotated_resource(self):
+        response = make_response_for_request(
+            'developer-detail',
+            {'developer': self.developer2.pk},
+            self._RESOURCES,
+            'PATCH',
+            data='{"name": "Larry Wall"}',
+            content_type='application/json',
+        )
+
+        eq_(200, response.status_code)
+        eq_(1, response.data['programming_languages_count'])
+
+    def _make_response_for_request(self, view_name, view_kwargs, **params):
+        response = make_response_for_request(
+            view_name,
+            view_kwargs,
+            self._RESOURCES,
+            data=params,
+        )
+        return response
+
+
+class _ObjectAccessDeniedPermission(BasePermission):
+
+    def has_object_permission(self, request, view, obj):
+        # Grant access to the HEAD request used when checking the ancestors of
+        # the programming languages
+        return request.method == 'HEAD'
+
+
+class _ObjectAccessDeniedDeveloperViewSet(DeveloperViewSet):
+
+    permission_classes = (_ObjectAccessDeniedPermission,)
+
+
+class _HiddenDeveloperPermission(BasePermission):
+
+    def has_object_permission(self, request, view, obj):
+        return False
+
+
+class _HiddenDeveloperViewSet(DeveloperViewSet):
+
+    permission_classes = (_HiddenDeveloperPermission,)
+
+
+class _AncestorPermission(BasePermission):
+
+    def has_permission(self, request, view):
+        return 'developer' in view.kwargs
+
+
+class _AncestorCheckingLanguageViewSet(ProgrammingLanguageViewSet):
+
+    permission_classes = (_AncestorPermission,)
+
+
+class _LanguageLinkedWebsiteSerializer(HyperlinkedNestedModelSerializer):
+
+    class Meta(object):
+        model = Website
+
+        fields = ('url', 'base_url', 'language')
+
+
+class _LanguageLinkedWebsiteViewSet(WebsiteViewSet):
+
+    serializer_class = _LanguageLinkedWebsiteSerializer
+
+
+class _AccessDeniedPermission(BasePermission):
+
+    def has_permission(self, request, view):
+        return False
+
+
+class _AccessDeniedVersionViewSet(ProgrammingLanguageVersionViewSet):
+
+    permission_classes = (_AccessDeniedPermission,)
+
+
+class _ScopedVersionViewSet(ProgrammingLanguageVersionViewSet):
+
+    def get_queryset(self):
+        queryset = super(_ScopedVersionViewSet, self).get_queryset()
+        return queryset.exclude(name='2.7')
+
+
+class _VersionObjectAccessDeniedPermission(BasePermission):
+
+    def has_object_permission(self, request, view, obj):
+        return obj.name != '2.7'
+
+
+class _ObjectAccessDeniedVersionViewSet(ProgrammingLanguageVersionViewSet):
+
+    permission_classes = (_VersionObjectAccessDeniedPermission,)
+
+
+class _LabelledLanguageSerializer(HyperlinkedNestedModelSerializer):
+
+    label = SerializerMethodField()
+
+    class Meta(object):
+        model = ProgrammingLanguage
+
+        fields = ('url', 'name', 'author', 'label')
+
+    def get_label(self, language):
+        return language.name.upper()
+
+
+class _LabelledLanguageViewSet(ProgrammingLanguageViewSet):
+    serializer_class = _LabelledLanguageSerializer
+
+
+class _PlainVersionSerializer(ModelSerializer):
+    class Meta(object):
+        model = ProgrammingLanguageVersion
+
+        fields = ('id', 'name')
+
+
+class _PlainVersionViewSet(ProgrammingLanguageVersionViewSet):
+    serializer_class = _PlainVersionSerializer
+
+
+class _PlainDeveloperSerializer(ModelSerializer):
+    class Meta(object):
+        model = Developer
+
+        fields = ('id', 'name')
+
+
+class _PlainDeveloperViewSet(DeveloperViewSet):
+    serializer_class = _PlainDeveloperSerializer
+
+
+def _build_included_resources(version_viewset):
+    resources = build_resources(
+        version_viewset,
+        language_viewset=ProgrammingLanguageViewSet2,
+    )
+    return resources
+
+
 class _FakeParentLookupHelper(object):
 
     def __init__(self, value):
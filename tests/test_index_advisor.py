@@ -0,0 +1,110 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test.utils import override_settings
+from nose.tools import assert_in
+from nose.tools import eq_
+
+from django_project.languages.models import ProgrammingLanguageVersion
+from django_project.languages.views import ProgrammingLanguageVersionViewSet
+from drf_nested_resources._index_advisor import get_missing_indexes
+from drf_nested_resources._index_advisor import get_relational_routes
+from drf_nested_resources._index_advisor import make_index_migrations
+from drf_nested_resources.checks import check_nested_resource_indexes
+from drf_nested_resources.pagination import NestedKeysetPagination
+from drf_nested_resources.routers import make_urlpatterns_from_resources
+from tests._testcases import TestCase
+from tests._utils import build_resources
+
+
+class TestMissingIndexes(TestCase):
+
+    def test_foreign_keys(self):
+        missing_indexes = \
+            _get_missing_indexes(ProgrammingLanguageVersionViewSet)
+
+        eq_([], missing_indexes)
+
+    def test_queryset_ordering(self):
+        missing_indexes = _get_missing_indexes(_OrderedVersionViewSet)
+
+        eq_(1, len(missing_indexes))
+        missing_index = missing_indexes[0]
+        eq_(ProgrammingLanguageVersion, missing_index.model)
+        eq_(('language', 'name'), missing_index.index_field_names)
+        eq_(['version'], missing_index.route_names)
+
+    def test_pagination_ordering(self):
+        missing_indexes = _get_missing_indexes(_PaginatedVersionViewSet)
+
+        eq_(1, len(missing_indexes))
+        eq_(('language', 'name'), missing_indexes[0].index_field_names)
+
+    def test_primary_key_ordering(self):
+        missing_indexes = _get_missing_indexes(_PkOrderedVersionViewSet)
+
+        eq_([], missing_indexes)
+
+    def test_migration(self):
+        missing_indexes = _get_missing_indexes(_OrderedVersionViewSet)
+
+        migrations = make_index_migrations(missing_indexes)
+
+        eq_(1, len(migrations))
+        migration = migrations[0]
+        eq_('languages', migration.app_label)
+        eq_('0003_nested_resource_indexes', migration.name)
+        eq_([('languages', '0002_programminglanguage_version_count')],
+            migration.dependencies)
+        add_index_operation, = migration.operations[0].database_operations
+        eq_('programminglanguageversion', add_index_operation.model_name)
+        eq_(['language', 'name'], add_index_operation.index.fields)
+
+    @override_settings(ROOT_URLCONF='tests.test_index_advisor')
+    def test_check(self):
+        warnings = check_nested_resource_indexes()
+
+        eq_(1, len(warnings))
+        warning = warnings[0]
+        eq_('drf_nested_resources.W001', warning.id)
+        eq_(ProgrammingLanguageVersion, warning.obj)
+
+    @override_settings(ROOT_URLCONF='tests.test_index_advisor')
+    def test_command(self):
+        stdout = StringIO()
+
+        call_command('nested_resource_indexes', stdout=stdout)
+
+        assert_in(
+            'languages.ProgrammingLanguageVersion (language, name): version',
+            stdout.getvalue(),
+        )
+
+
+class _OrderedVersionViewSet(ProgrammingLanguageVersionViewSet):
+    queryset = ProgrammingLanguageVersion.objects.order_by('-name')
+
+
+class _PkOrderedVersionViewSet(ProgrammingLanguageVersionViewSet):
+    queryset = ProgrammingLanguageVersion.objects.order_by('-pk')
+
+
+class _NameKeysetPagination(NestedKeysetPagination):
+    ordering = 'name'
+
+
+class _PaginatedVersionViewSet(ProgrammingLanguageVersionViewSet):
+    pagination_class = _NameKeysetPagination
+
+
+def _get_missing_indexes(version_viewset):
+    urlpatterns = make_urlpatterns_from_resources(
+        build_resources(version_viewset),
+    )
+    relational_routes = get_relational_routes(urlpatterns)
+    return get_missing_indexes(relational_routes)
+
+
+urlpatterns = make_urlpatterns_from_resources(
+    build_resources(_OrderedVersionViewSet),
+)
@@ -0,0 +1,264 @@
+from django.core.exceptions import ImproperlyConfigured
+from nose.tools import assert_raises
+from nose.tools import eq_
+from nose.tools import ok_
+
+from django_project.languages.models import ProgrammingLanguage
+from django_project.languages.models import ProgrammingLanguageVersion
+from django_project.languages.views import DeveloperViewSet
+from django_project.languages.views import ProgrammingLanguageVersionViewSet
+from django_project.languages.views import ProgrammingLanguageViewSet
+from drf_nested_resources.pagination import NestedKeysetPagination
+from drf_nested_resources.routers import NestedResource
+from drf_nested_resources.routers import Resource
+from drf_nested_resources.routers import make_urlpatterns_from_resources
+from tests._testcases import FixtureTestCase
+from tests._utils import TestClient
+from tests._utils import build_resources
+from tests._utils import make_response_for_request
+
+
+class TestKeysetPagination(FixtureTestCase):
+
+    def setUp(self):
+        super(TestKeysetPagination, self).setUp()
+
+        self.versions = [self.programming_language_version]
+        for version_name in ('3.0', '3.1', '1.5', '3.2'):
+            version = ProgrammingLanguageVersion.objects.create(
+                name=version_name,
+                language=self.programming_language1,
+            )
+            self.versions.append(version)
+
+        ProgrammingLanguageVersion.objects.create(
+            name='5.0',
+            language=self.programming_language2,
+        )
+
+    def test_first_page(self):
+        response = self._make_response_for_request(_PkKeysetPagination)
+
+        eq_(200, response.status_code)
+        eq_(self._get_version_urls(self.versions[:2]), _get_urls(response))
+        eq_(None, response.data['previous'])
+        ok_(response.data['next'])
+
+    def test_following_pages(self):
+        response = self._make_response_for_request(_PkKeysetPagination)
+
+        urls = _get_urls(response)
+        client = TestClient(self._get_urlpatterns(_PkKeysetPagination))
+        while response.data['next']:
+            response = client.get(response.data['next'])
+            eq_(200, response.status_code)
+            urls.extend(_get_urls(response))
+
+        eq_(self._get_version_urls(self.versions), urls)
+
+    def test_previous_page(self):
+        client = TestClient(self._get_urlpatterns(_PkKeysetPagination))
+        first_page_response = \
+            self._make_response_for_request(_PkKeysetPagination)
+        second_page_response = client.get(first_page_response.data['next'])
+
+        previous_page_response = \
+            client.get(second_page_response.data['previous'])
+
+        eq_(200, previous_page_response.status_code)
+        eq_(_get_urls(first_page_response), _get_urls(previous_page_response))
+        eq_(None, previous_page_response.data['previous'])
+        eq_(
+            first_page_response.data['next'],
+            previous_page_response.data['next'],
+        )
+
+    def test_links_to_nested_collection(self):
+        response = self._make_response_for_request(_PkKeysetPagination)
+
+        expected_url_path = '/developers/{}/languages/{}/versions/'.format(
+            self.developer1.pk,
+            self.programming_language1.pk,
+        )
+        ok_(expected_url_path in response.data['next'])
+
+    def test_custom_ordering(self):
+        response = self._make_response_for_request(_NameKeysetPagination)
+
+        client = TestClient(self._get_urlpatterns(_NameKeysetPagination))
+        urls = _get_urls(response)
+        while response.data['next']:
+            response = client.get(response.data['next'])
+            urls.extend(_get_urls(response))
+
+        versions_by_name = \
+            sorted(self.versions, key=lambda v: v.name, reverse=True)
+        eq_(self._get_version_urls(versions_by_name), urls)
+
+    def test_duplicate_ordering_values(self):
+        for version in self.versions:
+            version.name = '1.0'
+            version.save()
+
+        response = self._make_response_for_request(_NameKeysetPagination)
+
+        client = TestClient(self._get_urlpatterns(_NameKeysetPagination))
+        urls = _get_urls(response)
+        while response.data['next']:
+            response = client.get(response.data['next'])
+            urls.extend(_get_urls(response))
+
+        # The ties are broken by the primary key, in the same direction
+        versions_by_pk = \
+            sorted(self.versions, key=lambda v: v.pk, reverse=True)
+        eq_(self._get_version_urls(versions_by_pk), urls)
+
+    def test_nullable_ordering_field(self):
+        resources = [
+            Resource(
+                'developer',
+                'developers',
+                DeveloperViewSet,
+                [
+                    NestedResource(
+                        'language',
+                        'languages',
+                        _WebsiteOrderedLanguageViewSet,
+                        parent_field_lookup='author',
+                    ),
+                ],
+            ),
+        ]
+
+        with assert_raises(ImproperlyConfigured):
+            make_response_for_request(
+                'language-list',
+                {'developer': self.developer1.pk},
+                resources,
+            )
+
+    def test_multi_hop_parent_lookup(self):
+        programming_language3 = ProgrammingLanguage.objects.create(
+            name='Jython',
+            author=self.developer1,
+        )
+        self.versions.append(ProgrammingLanguageVersion.objects.create(
+            name='2.5',
+            language=programming_language3,
+        ))
+        self.versions.append(ProgrammingLanguageVersion.objects.create(
+            name='3.3',
+            language=self.programming_language1,
+        ))
+        resources = [
+            Resource(
+                'developer',
+                'developers',
+                DeveloperViewSet,
+                [
+                    NestedResource(
+                        'version',
+                        'versions',
+                        _build_paginated_version_viewset(_PkKeysetPagination),
+                        parent_field_lookup='language__author',
+                    ),
+                ],
+            ),
+        ]
+
+        response = make_response_for_request(
+            'version-list',
+            {'developer': self.developer1.pk},
+            resources,
+        )
+
+        client = TestClient(make_urlpatterns_from_resources(resources))
+        urls = _get_urls(response)
+        while response.data['next']:
+            response = client.get(response.data['next'])
+            urls.extend(_get_urls(response))
+
+        expected_urls = [
+            'http://example.org/developers/{}/versions/{}/'.format(
+                self.developer1.pk,
+                version.pk,
+            )
+            for version in self.versions
+        ]
+        eq_(expected_urls, urls)
+
+    def test_invalid_cursor(self):
+        response = self._make_response_for_request(
+            _PkKeysetPagination,
+            data={'cursor': 'invalid'},
+        )
+
+        eq_(404, response.status_code)
+
+    def _make_response_for_request(self, pagination_class, **kwargs):
+        response = make_response_for_request(
+            'version-list',
+            {
+                'developer': self.developer1.pk,
+                'language': self.programming_language1.pk,
+            },
+            _build_resources(pagination_class),
+            **kwargs
+        )
+        return response
+
+    @staticmethod
+    def _get_urlpatterns(pagination_class):
+        resources = _build_resources(pagination_class)
+        return make_urlpatterns_from_resources(resources)
+
+    def _get_version_urls(self, versions):
+        url_template = \
+            'http://example.org/developers/{}/languages/{}/versions/{}/'
+        urls = [
+            url_template.format(
+                self.developer1.pk,
+                self.programming_language1.pk,
+                version.pk,
+            )
+            for version in versions
+        ]
+        return urls
+
+
+class _PkKeysetPagination(NestedKeysetPagination):
+    page_size = 2
+
+
+class _NameKeysetPagination(NestedKeysetPagination):
+    page_size = 2
+
+    ordering = '-name'
+
+
+class _WebsiteKeysetPagination(NestedKeysetPagination):
+    page_size = 2
+
+    ordering = 'website'
+
+
+class _WebsiteOrderedLanguageViewSet(ProgrammingLanguageViewSet):
+    pagination_class = _WebsiteKeysetPagination
+
+
+def _build_paginated_version_viewset(pagination_class):
+    class PaginatedVersionViewSet(ProgrammingLanguageVersionViewSet):
+        pass
+
+    PaginatedVersionViewSet.pagination_class = pagination_class
+    return PaginatedVersionViewSet
+
+
+def _build_resources(pagination_class):
+    resources = \
+        build_resources(_build_paginated_version_viewset(pagination_class))
+    return resources
+
+
+def _get_urls(response):
+    return [version['url'] for version in response.data['results']]
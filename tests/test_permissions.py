@@ -1,17 +1,26 @@
 from unittest.mock import patch
 
+from django.contrib.auth.models import User
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.test.client import ClientHandler
 from django.test.utils import override_settings
+from django.urls import reverse
 from nose.tools import assert_not_in
+from nose.tools import assert_raises
 from nose.tools.trivial import eq_
+from rest_framework.authentication import BaseAuthentication
 from rest_framework.permissions import BasePermission
 from rest_framework.permissions import IsAuthenticated
 
 from django_project.languages.views import DeveloperViewSet
 from django_project.languages.views import ProgrammingLanguageVersionViewSet
 from django_project.languages.views import ProgrammingLanguageViewSet
+from drf_nested_resources._forged_request import _ForgedRequestHandler
 from drf_nested_resources.routers import NestedResource
 from drf_nested_resources.routers import Resource
+from drf_nested_resources.routers import make_urlpatterns_from_resources
 from tests._testcases import FixtureTestCase
+from tests._utils import TestClient
 from tests._utils import make_response_for_request
 
 
@@ -155,6 +164,100 @@ class TestPermissions(FixtureTestCase):
         # Ensure other WSGI environment variables remain unchanged
         eq_(http_host, request.META.get('HTTP_HOST'))
 
+    def test_original_request_unchanged(self):
+        resources = \
+            self._build_resources(DeveloperViewSet, ProgrammingLanguageViewSet)
+
+        patched_method = \
+            _patch_method(ProgrammingLanguageViewSet, 'check_permissions')
+        with patched_method as check_permissions_mock:
+            make_response_for_request(
+                'language-list',
+                {'developer': self.developer1.pk},
+                resources,
+                environ_items={'QUERY_STRING': 'foo=bar'},
+            )
+
+        request = check_permissions_mock.call_args[0][0]
+        eq_('GET', request.method)
+        eq_('foo=bar', request.META['QUERY_STRING'])
+
+    def test_parent_exception_propagated(self):
+        resources = \
+            self._build_resources(DeveloperViewSet, ProgrammingLanguageViewSet)
+
+        patched_method = \
+            _patch_method(DeveloperViewSet, 'check_object_permissions')
+        with patched_method as check_obj_permissions_mock:
+            check_obj_permissions_mock.side_effect = RuntimeError()
+            with assert_raises(RuntimeError):
+                make_response_for_request(
+                    'language-list',
+                    {'developer': self.developer1.pk},
+                    resources,
+                )
+
+    def test_forged_request_handler_reused(self):
+        resources = \
+            self._build_resources(DeveloperViewSet, ProgrammingLanguageViewSet)
+        urlpatterns = make_urlpatterns_from_resources(resources)
+        client = TestClient(urlpatterns)
+        url_path = reverse(
+            'version-detail',
+            kwargs={
+                'developer': self.developer1.pk,
+                'language': self.programming_language1.pk,
+                'version': self.programming_language_version.pk,
+            },
+            urlconf=urlpatterns,
+        )
+
+        patched_method = patch.object(
+            _ForgedRequestHandler,
+            'load_middleware',
+            autospec=True,
+            side_effect=ClientHandler.load_middleware,
+        )
+        with patched_method as load_middleware_mock:
+            first_response = client.get(url_path)
+            second_response = client.get(url_path)
+
+        eq_(200, first_response.status_code)
+        eq_(200, second_response.status_code)
+        eq_(1, load_middleware_mock.call_count)
+
+    def test_forged_request_authentication(self):
+        authentication_count = self._count_authentications()
+
+        eq_(2, authentication_count)
+
+    @override_settings(DRF_NESTED_RESOURCES_FORGED_REQUEST_MIDDLEWARE=[])
+    def test_lean_forged_request_authentication(self):
+        authentication_count = self._count_authentications()
+
+        eq_(1, authentication_count)
+
+    def test_forged_request_middleware(self):
+        middleware_call_count = self._count_session_middleware_calls()
+
+        eq_(2, middleware_call_count)
+
+    @override_settings(DRF_NESTED_RESOURCES_FORGED_REQUEST_MIDDLEWARE=[])
+    def test_lean_forged_request_middleware(self):
+        middleware_call_count = self._count_session_middleware_calls()
+
+        eq_(1, middleware_call_count)
+
+    @override_settings(
+        DRF_NESTED_RESOURCES_FORGED_REQUEST_MIDDLEWARE=[
+            'django.contrib.sessions.middleware.SessionMiddleware',
+        ],
+    )
+    def test_lean_forged_request_whitelisted_middleware(self):
+        middleware_call_count = self._count_session_middleware_calls()
+
+        eq_(2, middleware_call_count)
+
     def test_no_explicit_urlconf(self):
         response = make_response_for_request(
             'language-list',
@@ -163,6 +266,49 @@ class TestPermissions(FixtureTestCase):
         )
         eq_(200, response.status_code)
 
+    def _count_authentications(self):
+        resources = self._build_resources(
+            _TokenRequiredDeveloperViewSet,
+            _TokenRequiredProgrammingLanguageViewSet,
+        )
+
+        patched_method = patch.object(
+            _EnvironTokenAuthentication,
+            'authenticate',
+            autospec=True,
+            side_effect=_EnvironTokenAuthentication.authenticate,
+        )
+        with patched_method as authenticate_mock:
+            response = make_response_for_request(
+                'language-list',
+                {'developer': self.developer1.pk},
+                resources,
+                environ_items=_EnvironTokenAuthentication.VARIABLES,
+            )
+
+        eq_(200, response.status_code)
+        return authenticate_mock.call_count
+
+    def _count_session_middleware_calls(self):
+        resources = \
+            self._build_resources(DeveloperViewSet, ProgrammingLanguageViewSet)
+
+        patched_method = patch.object(
+            SessionMiddleware,
+            'process_request',
+            autospec=True,
+            side_effect=SessionMiddleware.process_request,
+        )
+        with patched_method as process_request_mock:
+            response = make_response_for_request(
+                'language-list',
+                {'developer': self.developer1.pk},
+                resources,
+            )
+
+        eq_(200, response.status_code)
+        return process_request_mock.call_count
+
     def _assert_permission_granted_to_child_resource(
         self,
         parent_view_set,
@@ -311,6 +457,28 @@ class _HasRequiredEnvironPermission(BasePermission):
         return relevant_environ_items == cls.VARIABLES
 
 
+class _EnvironTokenAuthentication(BaseAuthentication):
+    VARIABLES = {'HTTP_X_TOKEN': 'abc'}
+
+    def authenticate(self, request):
+        token = request.META.get('HTTP_X_TOKEN')
+        if token is None:
+            authentication = None
+        else:
+            authentication = (User(username='guido'), token)
+        return authentication
+
+
+class _HasEnvironToken(BasePermission):
+    def has_permission(self, request, view):
+        return request.auth == _EnvironTokenAuthentication.VARIABLES[
+            'HTTP_X_TOKEN'
+        ]
+
+    def has_object_permission(self, request, view, obj):
+        return self.has_permission(request, view)
+
+
 class AccessDeniedDeveloperViewSet(DeveloperViewSet):
     permission_classes = (_DenyAll,)
 
@@ -327,6 +495,16 @@ class _HeadersRequiredDeveloperViewSet(DeveloperViewSet):
     permission_classes = (_HasRequiredEnvironPermission,)
 
 
+class _TokenRequiredDeveloperViewSet(DeveloperViewSet):
+    authentication_classes = (_EnvironTokenAuthentication,)
+    permission_classes = (_HasEnvironToken,)
+
+
+class _TokenRequiredProgrammingLanguageViewSet(ProgrammingLanguageViewSet):
+    authentication_classes = (_EnvironTokenAuthentication,)
+    permission_classes = (_HasEnvironToken,)
+
+
 def _patch_method(cls, method_name):
     python_path_to_method = _get_python_path_to_class_method(cls, method_name)
     return patch(python_path_to_method)
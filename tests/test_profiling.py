@@ -0,0 +1,251 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test.utils import override_settings
+from nose.tools import assert_in
+from nose.tools import eq_
+from nose.tools import ok_
+
+from django_project.languages.models import Developer
+from django_project.languages.models import ProgrammingLanguageVersion
+from django_project.languages.views import DeveloperViewSet
+from django_project.languages.views import ProgrammingLanguageVersionViewSet
+from django_project.languages.views import ProgrammingLanguageViewSet
+from django_project.languages.views import WebsiteHostViewSet
+from django_project.languages.views import WebsiteViewSet
+from drf_nested_resources._instrumentation import LOOKUP_HELPER_PHASE
+from drf_nested_resources._instrumentation import VIEW_PHASE
+from drf_nested_resources._instrumentation import record_query_plans
+from drf_nested_resources._profiling import _get_route_profile_cost
+from drf_nested_resources._profiling import explain_routes
+from drf_nested_resources._profiling import profile_routes
+from drf_nested_resources.lookup_helpers import RequestParentLookupHelper
+from drf_nested_resources.routers import NestedResource
+from drf_nested_resources.routers import Resource
+from tests._testcases import FixtureTestCase
+
+
+_SHARD_DATABASE_ALIAS = 'shard'
+
+_ROUTER_PATH = 'tests.test_profiling._route_to_shard'
+
+
+def _route_to_shard(resource_name, resource_pk):
+    return _SHARD_DATABASE_ALIAS
+
+
+class TestRouteProfiling(FixtureTestCase):
+
+    databases = {'default', _SHARD_DATABASE_ALIAS}
+
+    def test_routes(self):
+        route_profiles = profile_routes(_RESOURCES)
+
+        route_profiles_by_view_name = {
+            route_profile.view_name: route_profile
+            for route_profile in route_profiles
+        }
+        eq_(
+            {
+                'developer-list',
+                'developer-detail',
+                'language-list',
+                'language-detail',
+                'version-list',
+                'version-detail',
+            },
+            set(route_profiles_by_view_name),
+        )
+        for route_profile in route_profiles:
+            eq_(200, route_profile.status_code)
+            ok_(route_profile.query_count)
+            ok_(route_profile.object_count)
+
+    def test_forged_requests(self):
+        route_profiles = profile_routes(_RESOURCES)
+
+        forged_request_counts_by_view_name = {
+            route_profile.view_name: route_profile.forged_request_count
+            for route_profile in route_profiles
+        }
+        eq_(0, forged_request_counts_by_view_name['developer-list'])
+        eq_(1, forged_request_counts_by_view_name['language-list'])
+        # The ancestors are checked along with both the view and the object
+        # permissions of each detail view
+        eq_(6, forged_request_counts_by_view_name['version-detail'])
+
+    def test_url_reversals(self):
+        route_profiles = profile_routes(_RESOURCES)
+
+        developer_list_profile, = [
+            route_profile for route_profile in route_profiles
+            if route_profile.view_name == 'developer-list'
+        ]
+        # The URL of each developer and of its programming languages
+        eq_(2, developer_list_profile.object_count)
+        eq_(4, developer_list_profile.url_reversal_count)
+
+    def test_sorting_by_cost(self):
+        route_profiles = profile_routes(_RESOURCES)
+
+        route_profile_costs = \
+            [_get_route_profile_cost(profile) for profile in route_profiles]
+        eq_(sorted(route_profile_costs, reverse=True), route_profile_costs)
+
+    def test_empty_collection(self):
+        ProgrammingLanguageVersion.objects.all().delete()
+
+        route_profiles = profile_routes(_RESOURCES)
+
+        view_names = {profile.view_name for profile in route_profiles}
+        ok_('version-list' not in view_names)
+        ok_('language-list' in view_names)
+
+    @override_settings(
+        DRF_NESTED_RESOURCES_ROOT_ANCESTOR_DATABASE_ROUTER=_ROUTER_PATH,
+    )
+    def test_queries_on_other_databases(self):
+        Developer.objects \
+            .using(_SHARD_DATABASE_ALIAS) \
+            .create(pk=self.developer1.pk, name=self.developer1.name)
+
+        route_profiles = profile_routes(_RESOURCES)
+
+        developer_detail_profile, = [
+            route_profile for route_profile in route_profiles
+            if route_profile.view_name == 'developer-detail'
+        ]
+        eq_(200, developer_detail_profile.status_code)
+        ok_(developer_detail_profile.query_count)
+
+    def test_many_to_many_routes(self):
+        route_profiles = profile_routes(_MANY_TO_MANY_RESOURCES)
+
+        view_names = {profile.view_name for profile in route_profiles}
+        eq_({'website-list', 'website-detail'}, view_names)
+
+    def test_command(self):
+        stdout = StringIO()
+
+        call_command(
+            'nested_routes_profile',
+            'tests.test_profiling._RESOURCES',
+            stdout=stdout,
+        )
+
+        output = stdout.getvalue()
+        assert_in('Queries', output)
+        assert_in('version-detail', output)
+
+
+class TestRouteExplanation(FixtureTestCase):
+
+    def test_query_plans(self):
+        route_explanations = explain_routes(_RESOURCES)
+
+        version_list_explanation, = [
+            route_explanation for route_explanation in route_explanations
+            if route_explanation.view_name == 'version-list'
+        ]
+        eq_(200, version_list_explanation.status_code)
+        query_plans = version_list_explanation.query_plans
+        ok_(query_plans)
+        for query_plan in query_plans:
+            ok_(query_plan.sql.startswith('SELECT'))
+            ok_(query_plan.plan)
+
+    def test_query_labels(self):
+        route_explanations = explain_routes(_RESOURCES)
+
+        version_list_explanation, = [
+            route_explanation for route_explanation in route_explanations
+            if route_explanation.view_name == 'version-list'
+        ]
+        query_labels = {
+            (query_plan.route_name, query_plan.phase)
+            for query_plan in version_list_explanation.query_plans
+        }
+        assert_in(('version', VIEW_PHASE), query_labels)
+        assert_in(('language', VIEW_PHASE), query_labels)
+        assert_in(('language', LOOKUP_HELPER_PHASE), query_labels)
+
+    def test_many_to_many_routes(self):
+        route_explanations = explain_routes(_MANY_TO_MANY_RESOURCES)
+
+        view_names = {
+            route_explanation.view_name
+            for route_explanation in route_explanations
+        }
+        eq_({'website-list', 'website-detail'}, view_names)
+
+    def test_unlabelled_queries(self):
+        with record_query_plans() as query_plans:
+            list(Developer.objects.all())
+
+        query_plan, = query_plans
+        eq_(None, query_plan.route_name)
+        eq_(None, query_plan.phase)
+
+    def test_no_recording(self):
+        with record_query_plans() as query_plans:
+            pass
+        list(Developer.objects.all())
+
+        eq_([], query_plans)
+
+    def test_command(self):
+        stdout = StringIO()
+
+        call_command(
+            'nested_routes_explain',
+            'tests.test_profiling._RESOURCES',
+            stdout=stdout,
+        )
+
+        output = stdout.getvalue()
+        assert_in('version-detail', output)
+        assert_in('[language / view] SELECT', output)
+
+
+_RESOURCES = [
+    Resource(
+        'developer',
+        'developers',
+        DeveloperViewSet,
+        [
+            NestedResource(
+                'language',
+                'languages',
+                ProgrammingLanguageViewSet,
+                [
+                    NestedResource(
+                        'version',
+                        'versions',
+                        ProgrammingLanguageVersionViewSet,
+                        parent_field_lookup='language',
+                    ),
+                ],
+                parent_field_lookup='author',
+            ),
+        ],
+    ),
+]
+
+_MANY_TO_MANY_RESOURCES = [
+    Resource(
+        'website',
+        'websites',
+        WebsiteViewSet,
+        [
+            NestedResource(
+                'host',
+                'hosts',
+                WebsiteHostViewSet,
+                parent_field_lookup=RequestParentLookupHelper(
+                    'websites',
+                    'website',
+                ),
+            ),
+        ],
+    ),
+]
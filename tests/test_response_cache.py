@@ -0,0 +1,327 @@
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from nose.tools import assert_raises
+from nose.tools import eq_
+from nose.tools import ok_
+from rest_framework.permissions import BasePermission
+
+from django_project.languages.models import Developer
+from django_project.languages.models import ProgrammingLanguage
+from django_project.languages.models import ProgrammingLanguageVersion
+from django_project.languages.views import DeveloperViewSet
+from django_project.languages.views import ProgrammingLanguageVersionViewSet
+from django_project.languages.views import ProgrammingLanguageViewSet
+from django_project.languages.views import WebsiteHostViewSet
+from django_project.languages.views import WebsiteViewSet
+from drf_nested_resources.lookup_helpers import RequestParentLookupHelper
+from drf_nested_resources.routers import NestedResource
+from drf_nested_resources.routers import Resource
+from drf_nested_resources.routers import make_urlpatterns_from_resources
+from tests._testcases import FixtureTestCase
+from tests._utils import make_response_for_request
+from tests._utils import run_on_commit_callbacks
+
+
+class TestResponseCache(FixtureTestCase):
+
+    def setUp(self):
+        super(TestResponseCache, self).setUp()
+
+        cache.clear()
+
+    def test_cache_miss(self):
+        response, query_count = self._make_response_for_versions()
+
+        eq_(200, response.status_code)
+        ok_(query_count)
+
+    def test_cache_hit(self):
+        first_response, _ = self._make_response_for_versions()
+
+        second_response, query_count = self._make_response_for_versions()
+
+        eq_(200, second_response.status_code)
+        eq_(0, query_count)
+        eq_(first_response.content, second_response.content)
+        eq_(first_response['Content-Type'], second_response['Content-Type'])
+
+    def test_resource_cache_hit(self):
+        self._make_response_for_version()
+
+        response, query_count = self._make_response_for_version()
+
+        eq_(200, response.status_code)
+        eq_(0, query_count)
+
+    def test_different_authorization(self):
+        self._make_response_for_versions()
+
+        _, query_count = \
+            self._make_response_for_versions(HTTP_AUTHORIZATION='Token abc')
+
+        ok_(query_count)
+
+    def test_different_query_string(self):
+        self._make_response_for_versions()
+
+        _, query_count = self._make_response_for_versions(data={'page': 2})
+
+        ok_(query_count)
+
+    def test_creation_in_collection(self):
+        self._make_response_for_versions()
+        with run_on_commit_callbacks():
+            ProgrammingLanguageVersion.objects.create(
+                name='3.0',
+                language=self.programming_language1,
+            )
+
+        response, query_count = self._make_response_for_versions()
+
+        ok_(query_count)
+        eq_(2, len(response.data))
+
+    def test_creation_in_other_collection(self):
+        self._make_response_for_versions()
+        with run_on_commit_callbacks():
+            ProgrammingLanguageVersion.objects.create(
+                name='5.0',
+                language=self.programming_language2,
+            )
+
+        _, query_count = self._make_response_for_versions()
+
+        eq_(0, query_count)
+
+    def test_resource_update(self):
+        self._make_response_for_version()
+        self._make_response_for_versions()
+        self.programming_language_version.name = '2.7.1'
+        with run_on_commit_callbacks():
+            self.programming_language_version.save()
+
+        response, version_query_count = self._make_response_for_version()
+        _, versions_query_count = self._make_response_for_versions()
+
+        ok_(version_query_count)
+        ok_(versions_query_count)
+        eq_('2.7.1', response.data['name'])
+
+    def test_resource_deletion(self):
+        self._make_response_for_versions()
+        with run_on_commit_callbacks():
+            self.programming_language_version.delete()
+
+        response, query_count = self._make_response_for_versions()
+
+        ok_(query_count)
+        eq_([], response.data)
+
+    def test_ancestor_update(self):
+        self._make_response_for_versions()
+        self.developer1.name = 'Guido van Rossum'
+        with run_on_commit_callbacks():
+            self.developer1.save()
+
+        _, query_count = self._make_response_for_versions()
+
+        ok_(query_count)
+
+    def test_unrelated_ancestor_update(self):
+        self._make_response_for_versions()
+        self.developer2.name = 'Larry Wall'
+        with run_on_commit_callbacks():
+            self.developer2.save()
+
+        _, query_count = self._make_response_for_versions()
+
+        eq_(0, query_count)
+
+    def test_top_level_collection(self):
+        self._make_response_for_developers()
+
+        _, query_count = self._make_response_for_developers()
+
+        eq_(0, query_count)
+
+    def test_creation_in_sub_collection_of_top_level_collection(self):
+        self._make_response_for_developers(include='programming_languages')
+        with run_on_commit_callbacks():
+            ProgrammingLanguage.objects.create(
+                name='Ruby',
+                author=self.developer2,
+            )
+
+        response, query_count = \
+            self._make_response_for_developers(include='programming_languages')
+
+        ok_(query_count)
+        language_names = {
+            language_data['name']
+            for developer_data in response.data
+            for language_data in developer_data['programming_languages']
+        }
+        ok_('Ruby' in language_names)
+
+    def test_uncommitted_update(self):
+        self._make_response_for_versions()
+        self.programming_language_version.name = '2.7.1'
+        with run_on_commit_callbacks():
+            self.programming_language_version.save()
+
+            _, query_count = self._make_response_for_versions()
+
+            eq_(0, query_count)
+
+        _, query_count = self._make_response_for_versions()
+
+        ok_(query_count)
+
+    def test_forbidden_request(self):
+        self._make_response_for_versions()
+
+        response, _ = \
+            self._make_response_for_versions(HTTP_X_FORBIDDEN='true')
+
+        eq_(403, response.status_code)
+
+    def test_route_with_lookup_helper(self):
+        resources = _build_host_resources(WebsiteViewSet, _CachedHostViewSet)
+
+        with assert_raises(ImproperlyConfigured):
+            make_urlpatterns_from_resources(resources)
+
+    def test_ancestor_of_route_with_lookup_helper(self):
+        resources = \
+            _build_host_resources(_CachedWebsiteViewSet, WebsiteHostViewSet)
+
+        with assert_raises(ImproperlyConfigured):
+            make_urlpatterns_from_resources(resources)
+
+    def _make_response_for_versions(self, **kwargs):
+        return self._make_response_for_request(
+            'version-list',
+            {
+                'developer': self.developer1.pk,
+                'language': self.programming_language1.pk,
+            },
+            ProgrammingLanguageVersion,
+            **kwargs
+        )
+
+    def _make_response_for_version(self, **kwargs):
+        return self._make_response_for_request(
+            'version-detail',
+            {
+                'developer': self.developer1.pk,
+                'language': self.programming_language1.pk,
+                'version': self.programming_language_version.pk,
+            },
+            ProgrammingLanguageVersion,
+            **kwargs
+        )
+
+    def _make_response_for_developers(self, **query_params):
+        return self._make_response_for_request(
+            'developer-list',
+            {},
+            Developer,
+            data=query_params,
+        )
+
+    @staticmethod
+    def _make_response_for_request(view_name, view_kwargs, model, **kwargs):
+        # The ancestors are checked on every request, so only the queries on
+        # the resources requested are counted
+        with CaptureQueriesContext(connection) as captured_queries:
+            response = make_response_for_request(
+                view_name,
+                view_kwargs,
+                _RESOURCES,
+                **kwargs
+            )
+        model_table_reference = 'FROM "{}"'.format(model._meta.db_table)
+        query_count = len([
+            query for query in captured_queries
+            if model_table_reference in query['sql']
+        ])
+        return response, query_count
+
+
+class _CachedDeveloperViewSet(DeveloperViewSet):
+
+    response_cache_timeout = 60
+
+
+class _ForbiddenRequestPermission(BasePermission):
+
+    def has_permission(self, request, view):
+        return 'HTTP_X_FORBIDDEN' not in request.META
+
+
+class _CachedProgrammingLanguageVersionViewSet(
+    ProgrammingLanguageVersionViewSet,
+):
+
+    permission_classes = (_ForbiddenRequestPermission,)
+
+    response_cache_timeout = 60
+
+
+_RESOURCES = [
+    Resource(
+        'developer',
+        'developers',
+        _CachedDeveloperViewSet,
+        [
+            NestedResource(
+                'language',
+                'languages',
+                ProgrammingLanguageViewSet,
+                [
+                    NestedResource(
+                        'version',
+                        'versions',
+                        _CachedProgrammingLanguageVersionViewSet,
+                        parent_field_lookup='language',
+                    ),
+                ],
+                parent_field_lookup='author',
+            ),
+        ],
+    ),
+]
+
+
+class _CachedWebsiteViewSet(WebsiteViewSet):
+
+    response_cache_timeout = 60
+
+
+class _CachedHostViewSet(WebsiteHostViewSet):
+
+    response_cache_timeout = 60
+
+
+def _build_host_resources(website_viewset, host_viewset):
+    resources = [
+        Resource(
+            'website',
+            'websites',
+            website_viewset,
+            [
+                NestedResource(
+                    'host',
+                    'hosts',
+                    host_viewset,
+                    parent_field_lookup=RequestParentLookupHelper(
+                        'websites',
+                        'website',
+                    ),
+                ),
+            ],
+        ),
+    ]
+    return resources
@@ -1,23 +1,41 @@
+from datetime import timedelta
+from json import loads as json_loads
+
 from django.conf.urls import include
+from django.core.exceptions import ImproperlyConfigured
 from django.conf.urls import url
+from django.db import connection
+from django.http.response import StreamingHttpResponse
+from django.test.utils import CaptureQueriesContext
 from django.urls import resolve
+from nose.tools import assert_not_in
 from nose.tools import assert_raises
 from nose.tools import eq_
 from nose.tools import ok_
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.reverse import reverse
 from rest_framework.routers import SimpleRouter
 from rest_framework.test import APIRequestFactory
 from rest_framework.versioning import NamespaceVersioning
 
+from django_project.languages.models import Developer
 from django_project.languages.models import Website
 from django_project.languages.models import WebsiteVisit
+from django_project.languages.views import ConditionalWebsiteVisitViewSet
 from django_project.languages.views import DeveloperViewSet
 from django_project.languages.views import DeveloperViewSet2
+from django_project.languages.views import \
+    DirectParentFilteredVersionViewSet
 from django_project.languages.views import ProgrammingLanguageVersionViewSet
 from django_project.languages.views import ProgrammingLanguageViewSet
+from django_project.languages.views import StreamingWebsiteVisitViewSet
 from django_project.languages.views import WebsiteHostViewSet
 from django_project.languages.views import WebsiteViewSet
 from django_project.languages.views import WebsiteVisitViewSet
+from drf_nested_resources._instrumentation import FORGED_REQUEST_EVENT
+from drf_nested_resources._instrumentation import PARENT_LOOKUP_EVENT
+from drf_nested_resources._instrumentation import URL_REVERSAL_EVENT
+from drf_nested_resources._instrumentation import record_events
 from drf_nested_resources.lookup_helpers import RequestParentLookupHelper
 from drf_nested_resources.routers import NestedResource
 from drf_nested_resources.routers import Resource
@@ -327,6 +345,36 @@ class TestDispatch(FixtureTestCase):
             self._make_response_for_request('version-detail', view_kwargs)
         eq_(404, response.status_code)
 
+    def test_parent_detail_url(self):
+        urlpatterns = make_urlpatterns_from_resources(self._RESOURCES)
+        url_path = reverse(
+            'version-list',
+            kwargs={
+                'developer': self.developer1.pk,
+                'language': self.programming_language1.pk,
+            },
+            urlconf=urlpatterns,
+        )
+        resolver_match = resolve(url_path, urlconf=urlpatterns)
+        view = resolver_match.func.cls(**resolver_match.func.initkwargs)
+        view.kwargs = resolver_match.kwargs
+        request_factory = APIRequestFactory(SERVER_NAME='example.org')
+        request = request_factory.get(url_path)
+        request.urlconf = urlpatterns
+
+        with CaptureQueriesContext(connection) as captured_queries:
+            parent_detail_view_url = \
+                view._get_parent_resource_detail_view_url(request)
+
+        eq_(0, len(captured_queries))
+        eq_(
+            'http://example.org/developers/{}/languages/{}/'.format(
+                self.developer1.pk,
+                self.programming_language1.pk,
+            ),
+            parent_detail_view_url,
+        )
+
     def test_indirect_relation_detail(self):
         resources = [
             Resource(
@@ -445,6 +493,696 @@ class TestDispatch(FixtureTestCase):
         return response
 
 
+class TestStreamingList(FixtureTestCase):
+    _RESOURCES = [
+        Resource(
+            'website',
+            'websites',
+            WebsiteViewSet,
+            [
+                NestedResource(
+                    'visit',
+                    'visits',
+                    StreamingWebsiteVisitViewSet,
+                    parent_field_lookup='website',
+                ),
+            ],
+        ),
+    ]
+
+    def test_child_list_streamed_in_chunks(self):
+        visits = [
+            WebsiteVisit.objects.create(website=self.website)
+            for _ in range(3)
+        ]
+        other_website = Website.objects.create(base_url='http://perl.org/')
+        WebsiteVisit.objects.create(website=other_website)
+
+        response = self._make_response_for_request()
+
+        eq_(200, response.status_code)
+        ok_(isinstance(response, StreamingHttpResponse))
+        response_data = json_loads(b''.join(response.streaming_content))
+        eq_(len(visits), len(response_data))
+
+    def test_empty_child_list(self):
+        response = self._make_response_for_request()
+
+        eq_(200, response.status_code)
+        eq_([], json_loads(b''.join(response.streaming_content)))
+
+    def _make_response_for_request(self):
+        response = make_response_for_request(
+            'visit-list',
+            {'website': self.website.pk},
+            self._RESOURCES,
+        )
+        return response
+
+
+class TestConditionalRequests(FixtureTestCase):
+
+    def setUp(self):
+        super(TestConditionalRequests, self).setUp()
+
+        self.visit = WebsiteVisit.objects.create(website=self.website)
+
+    def test_validators_in_collection_response(self):
+        response = self._make_response_for_collection()
+
+        eq_(200, response.status_code)
+        ok_(response['ETag'].startswith('W/"'))
+        ok_(response.has_header('Last-Modified'))
+
+    def test_unmodified_collection(self):
+        etag = self._make_response_for_collection()['ETag']
+
+        response = self._make_response_for_collection(HTTP_IF_NONE_MATCH=etag)
+
+        eq_(304, response.status_code)
+        eq_(b'', response.content)
+        eq_(etag, response['ETag'])
+
+    def test_collection_with_new_resource(self):
+        etag = self._make_response_for_collection()['ETag']
+        WebsiteVisit.objects.create(website=self.website)
+
+        response = self._make_response_for_collection(HTTP_IF_NONE_MATCH=etag)
+
+        eq_(200, response.status_code)
+        ok_(etag != response['ETag'])
+
+    def test_collection_with_new_resource_under_other_parent(self):
+        etag = self._make_response_for_collection()['ETag']
+        other_website = Website.objects.create(base_url='http://perl.org/')
+        WebsiteVisit.objects.create(website=other_website)
+
+        response = self._make_response_for_collection(HTTP_IF_NONE_MATCH=etag)
+
+        eq_(304, response.status_code)
+
+    def test_collection_with_different_query_string(self):
+        etag = self._make_response_for_collection()['ETag']
+
+        response = self._make_response_for_collection(
+            data={'fields': 'url'},
+            HTTP_IF_NONE_MATCH=etag,
+        )
+
+        eq_(200, response.status_code)
+
+    def test_collection_not_modified_since(self):
+        last_modified = self._make_response_for_collection()['Last-Modified']
+
+        response = self._make_response_for_collection(
+            HTTP_IF_MODIFIED_SINCE=last_modified,
+        )
+
+        eq_(304, response.status_code)
+
+    def test_unmodified_resource(self):
+        etag = self._make_response_for_resource()['ETag']
+
+        response = self._make_response_for_resource(HTTP_IF_NONE_MATCH=etag)
+
+        eq_(304, response.status_code)
+
+    def test_modified_resource(self):
+        etag = self._make_response_for_resource()['ETag']
+        WebsiteVisit.objects.filter(pk=self.visit.pk).update(
+            timestamp=self.visit.timestamp + timedelta(seconds=1),
+        )
+
+        response = self._make_response_for_resource(HTTP_IF_NONE_MATCH=etag)
+
+        eq_(200, response.status_code)
+
+    def test_collection_with_included_resources(self):
+        response = self._make_response_for_collection(
+            data={'include': 'website'},
+            HTTP_IF_NONE_MATCH='*',
+        )
+
+        eq_(200, response.status_code)
+        ok_(not response.has_header('ETag'))
+
+    def test_resource_with_expanded_resources(self):
+        response = self._make_response_for_resource(
+            data={'expand': 'website'},
+            HTTP_IF_NONE_MATCH='*',
+        )
+
+        eq_(200, response.status_code)
+        ok_(not response.has_header('ETag'))
+
+    def test_customized_retrieval(self):
+        response = self._make_response_for_resource(
+            _ForbiddenConditionalWebsiteVisitViewSet,
+            HTTP_IF_NONE_MATCH='*',
+        )
+
+        eq_(403, response.status_code)
+
+    def test_customized_listing(self):
+        response = self._make_response_for_collection(
+            _ForbiddenConditionalWebsiteVisitViewSet,
+            HTTP_IF_NONE_MATCH='*',
+        )
+
+        eq_(403, response.status_code)
+
+    def test_validators_with_conditional_parent(self):
+        parent_etag = make_response_for_request(
+            'website-detail',
+            {'website': self.website.pk},
+            _build_conditional_resources(
+                WebsiteVisitViewSet,
+                _ConditionalWebsiteViewSet,
+            ),
+        )['ETag']
+
+        for validator in ('*', parent_etag):
+            response = make_response_for_request(
+                'visit-list',
+                {'website': self.website.pk},
+                _build_conditional_resources(
+                    WebsiteVisitViewSet,
+                    _ConditionalWebsiteViewSet,
+                ),
+                HTTP_IF_NONE_MATCH=validator,
+            )
+
+            eq_(200, response.status_code)
+
+    def _make_response_for_collection(
+        self,
+        visit_viewset=ConditionalWebsiteVisitViewSet,
+        **kwargs
+    ):
+        response = make_response_for_request(
+            'visit-list',
+            {'website': self.website.pk},
+            _build_conditional_resources(visit_viewset),
+            **kwargs
+        )
+        return response
+
+    def _make_response_for_resource(
+        self,
+        visit_viewset=ConditionalWebsiteVisitViewSet,
+        **kwargs
+    ):
+        response = make_response_for_request(
+            'visit-detail',
+            {'website': self.website.pk, 'visit': self.visit.pk},
+            _build_conditional_resources(visit_viewset),
+            **kwargs
+        )
+        return response
+
+
+class TestDirectParentFiltering(FixtureTestCase):
+    _RESOURCES = [
+        Resource(
+            'developer',
+            'developers',
+            DeveloperViewSet,
+            [
+                NestedResource(
+                    'language',
+                    'languages',
+                    ProgrammingLanguageViewSet,
+                    [
+                        NestedResource(
+                            'version',
+                            'versions',
+                            DirectParentFilteredVersionViewSet,
+                            parent_field_lookup='language',
+                        ),
+                    ],
+                    parent_field_lookup='author',
+                ),
+            ],
+        ),
+    ]
+
+    def test_collection(self):
+        with CaptureQueriesContext(connection) as captured_queries:
+            response = self._make_response_for_collection(
+                self.developer1,
+                self.programming_language1,
+            )
+
+        eq_(200, response.status_code)
+        eq_(1, len(response.data))
+        eq_(self.programming_language_version.name, response.data[0]['name'])
+        version_queries = [
+            query['sql'] for query in captured_queries
+            if query['sql'].startswith(
+                'SELECT "languages_programminglanguageversion"',
+            )
+        ]
+        eq_(1, len(version_queries))
+        assert_not_in('JOIN', version_queries[0])
+
+    def test_resource(self):
+        response = make_response_for_request(
+            'version-detail',
+            {
+                'developer': self.developer1.pk,
+                'language': self.programming_language1.pk,
+                'version': self.programming_language_version.pk,
+            },
+            self._RESOURCES,
+        )
+
+        eq_(200, response.status_code)
+        eq_(self.programming_language_version.name, response.data['name'])
+
+    def test_inconsistent_ancestors(self):
+        response = self._make_response_for_collection(
+            self.developer2,
+            self.programming_language1,
+        )
+
+        eq_(404, response.status_code)
+
+    def _make_response_for_collection(self, developer, programming_language):
+        response = make_response_for_request(
+            'version-list',
+            {'developer': developer.pk, 'language': programming_language.pk},
+            self._RESOURCES,
+        )
+        return response
+
+
+class TestHeadRequests(FixtureTestCase):
+    _RESOURCES = [
+        Resource(
+            'developer',
+            'developers',
+            DeveloperViewSet,
+            [
+                NestedResource(
+                    'language',
+                    'languages',
+                    ProgrammingLanguageViewSet,
+                    [
+                        NestedResource(
+                            'version',
+                            'versions',
+                            ProgrammingLanguageVersionViewSet,
+                            parent_field_lookup='language',
+                        ),
+                    ],
+                    parent_field_lookup='author',
+                ),
+            ],
+        ),
+    ]
+
+    def test_resource(self):
+        with record_events() as events:
+            response = self._make_response_for_resource(
+                self.developer1,
+                self.programming_language_version.pk,
+            )
+
+        eq_(200, response.status_code)
+        eq_(b'', response.content)
+        # Only the URLs of the parents are generated, to check the ancestors
+        eq_(events[FORGED_REQUEST_EVENT], events[URL_REVERSAL_EVENT])
+
+    def test_non_existing_resource(self):
+        response = self._make_response_for_resource(
+            self.developer1,
+            self.programming_language_version.pk + 1,
+        )
+
+        eq_(404, response.status_code)
+
+    def test_resource_with_wrong_ancestor(self):
+        response = self._make_response_for_resource(
+            self.developer2,
+            self.programming_language_version.pk,
+        )
+
+        eq_(404, response.status_code)
+
+    def test_collection(self):
+        with CaptureQueriesContext(connection) as captured_queries:
+            response = self._make_response_for_collection(self.developer1)
+
+        eq_(200, response.status_code)
+        eq_(b'', response.content)
+        version_queries = [
+            query['sql'] for query in captured_queries
+            if query['sql'].startswith(
+                'SELECT "languages_programminglanguageversion"',
+            )
+        ]
+        eq_([], version_queries)
+
+    def test_collection_with_wrong_ancestor(self):
+        response = self._make_response_for_collection(self.developer2)
+
+        eq_(404, response.status_code)
+
+    def test_validators(self):
+        visit = WebsiteVisit.objects.create(website=self.website)
+
+        response = make_response_for_request(
+            'visit-detail',
+            {'website': self.website.pk, 'visit': visit.pk},
+            _build_conditional_resources(ConditionalWebsiteVisitViewSet),
+            'HEAD',
+        )
+
+        eq_(200, response.status_code)
+        eq_(b'', response.content)
+        ok_(response.has_header('ETag'))
+
+    def test_customized_resource(self):
+        visit = WebsiteVisit.objects.create(website=self.website)
+
+        response = make_response_for_request(
+            'visit-detail',
+            {'website': self.website.pk, 'visit': visit.pk},
+            _build_conditional_resources(
+                _ForbiddenConditionalWebsiteVisitViewSet,
+            ),
+            'HEAD',
+        )
+
+        eq_(403, response.status_code)
+
+    def test_customized_collection(self):
+        response = make_response_for_request(
+            'visit-list',
+            {'website': self.website.pk},
+            _build_conditional_resources(
+                _ForbiddenConditionalWebsiteVisitViewSet,
+            ),
+            'HEAD',
+        )
+
+        eq_(403, response.status_code)
+
+    def _make_response_for_resource(self, developer, version_pk):
+        response = make_response_for_request(
+            'version-detail',
+            {
+                'developer': developer.pk,
+                'language': self.programming_language1.pk,
+                'version': version_pk,
+            },
+            self._RESOURCES,
+            'HEAD',
+        )
+        return response
+
+    def _make_response_for_collection(self, developer):
+        response = make_response_for_request(
+            'version-list',
+            {
+                'developer': developer.pk,
+                'language': self.programming_language1.pk,
+            },
+            self._RESOURCES,
+            'HEAD',
+        )
+        return response
+
+
+class TestShallowDetailRoutes(FixtureTestCase):
+
+    def test_url_path(self):
+        urlpatterns = _make_shallow_detail_urlpatterns(DeveloperViewSet)
+
+        url_path = reverse(
+            'version-shallow-detail',
+            kwargs={'version': self.programming_language_version.pk},
+            urlconf=urlpatterns,
+        )
+
+        eq_(
+            '/versions/{}/'.format(self.programming_language_version.pk),
+            url_path,
+        )
+
+    def test_routes(self):
+        urlpatterns = _make_shallow_detail_urlpatterns(DeveloperViewSet)
+
+        url_names = {urlpattern.name for urlpattern in urlpatterns}
+        ok_('language-shallow-detail' in url_names)
+        ok_('version-shallow-detail' in url_names)
+        assert_not_in('developer-shallow-detail', url_names)
+        assert_not_in('version-shallow-list', url_names)
+
+    def test_routes_disabled_by_default(self):
+        urlpatterns = make_urlpatterns_from_resources(
+            _build_shallow_detail_resources(DeveloperViewSet),
+        )
+
+        url_names = {urlpattern.name for urlpattern in urlpatterns}
+        assert_not_in('version-shallow-detail', url_names)
+
+    def test_many_to_many_ancestor(self):
+        resources = [
+            Resource(
+                'website',
+                'websites',
+                WebsiteViewSet,
+                [
+                    NestedResource(
+                        'host',
+                        'hosts',
+                        WebsiteHostViewSet,
+                        parent_field_lookup='websites',
+                    ),
+                ],
+            ),
+        ]
+
+        urlpatterns = make_urlpatterns_from_resources(
+            resources,
+            shallow_detail_routes=True,
+        )
+
+        url_names = {urlpattern.name for urlpattern in urlpatterns}
+        assert_not_in('host-shallow-detail', url_names)
+
+    def test_resource(self):
+        with CaptureQueriesContext(connection) as captured_queries:
+            response = self._make_response_for_version(
+                self.programming_language_version.pk,
+            )
+
+        eq_(200, response.status_code)
+        eq_(self.programming_language_version.name, response.data['name'])
+        # The ancestors are retrieved along with the resource in one query
+        ancestors_query = captured_queries[0]['sql']
+        ok_(
+            ancestors_query.startswith(
+                'SELECT "languages_programminglanguageversion"',
+            ),
+        )
+        ok_('JOIN "languages_programminglanguage"' in ancestors_query)
+
+    def test_nested_url(self):
+        response = self._make_response_for_version(
+            self.programming_language_version.pk,
+        )
+
+        eq_(
+            'http://example.org/developers/{}/languages/{}/versions/{}/'
+            .format(
+                self.developer1.pk,
+                self.programming_language1.pk,
+                self.programming_language_version.pk,
+            ),
+            response.data['url'],
+        )
+
+    def test_shallow_url(self):
+        with record_events() as events:
+            response = self._make_response_for_version(
+                self.programming_language_version.pk,
+                shallow_detail_urls=True,
+            )
+
+        eq_(
+            'http://example.org/versions/{}/'.format(
+                self.programming_language_version.pk,
+            ),
+            response.data['url'],
+        )
+        eq_(0, events[PARENT_LOOKUP_EVENT])
+
+    def test_prefix_clashing_with_top_level_resource(self):
+        resources = _build_shallow_detail_resources(DeveloperViewSet) + [
+            Resource('website', 'languages', WebsiteViewSet),
+        ]
+
+        with assert_raises(ImproperlyConfigured):
+            make_urlpatterns_from_resources(
+                resources,
+                shallow_detail_routes=True,
+            )
+
+    def test_prefix_clashing_with_nested_resource(self):
+        resources = _build_shallow_detail_resources(DeveloperViewSet) + [
+            Resource(
+                'website',
+                'websites',
+                WebsiteViewSet,
+                [
+                    NestedResource(
+                        'visit',
+                        'versions',
+                        WebsiteVisitViewSet,
+                        parent_field_lookup='website',
+                    ),
+                ],
+            ),
+        ]
+
+        with assert_raises(ImproperlyConfigured):
+            make_urlpatterns_from_resources(
+                resources,
+                shallow_detail_routes=True,
+            )
+
+    def test_prefix_clash_without_routes(self):
+        resources = _build_shallow_detail_resources(DeveloperViewSet) + [
+            Resource('website', 'languages', WebsiteViewSet),
+        ]
+
+        urlpatterns = make_urlpatterns_from_resources(resources)
+
+        url_names = {urlpattern.name for urlpattern in urlpatterns}
+        ok_('website-list' in url_names)
+
+    def test_shallow_urls_without_routes(self):
+        with assert_raises(ImproperlyConfigured):
+            make_urlpatterns_from_resources(
+                _build_shallow_detail_resources(DeveloperViewSet),
+                shallow_detail_urls=True,
+            )
+
+    def test_non_existing_resource(self):
+        response = self._make_response_for_version(
+            self.programming_language_version.pk + 1,
+        )
+
+        eq_(404, response.status_code)
+
+    def test_malformed_primary_key(self):
+        response = self._make_response_for_version('python')
+
+        eq_(404, response.status_code)
+
+    def test_non_viewable_ancestor(self):
+        response = self._make_response_for_version(
+            self.programming_language_version.pk,
+            developer_viewset=_NonViewableDeveloperViewSet,
+        )
+
+        eq_(404, response.status_code)
+
+    @staticmethod
+    def _make_response_for_version(
+        version_pk,
+        developer_viewset=DeveloperViewSet,
+        shallow_detail_urls=False,
+    ):
+        urlpatterns = _make_shallow_detail_urlpatterns(
+            developer_viewset,
+            shallow_detail_urls,
+        )
+        client = TestClient(urlpatterns)
+        response = client.get('/versions/{}/'.format(version_pk))
+        return response
+
+
+class _NonViewableDeveloperViewSet(DeveloperViewSet):
+    queryset = Developer.objects.none()
+
+
+def _make_shallow_detail_urlpatterns(
+    developer_viewset,
+    shallow_detail_urls=False,
+):
+    urlpatterns = make_urlpatterns_from_resources(
+        _build_shallow_detail_resources(developer_viewset),
+        shallow_detail_routes=True,
+        shallow_detail_urls=shallow_detail_urls,
+    )
+    return urlpatterns
+
+
+def _build_shallow_detail_resources(developer_viewset):
+    resources = [
+        Resource(
+            'developer',
+            'developers',
+            developer_viewset,
+            [
+                NestedResource(
+                    'language',
+                    'languages',
+                    ProgrammingLanguageViewSet,
+                    [
+                        NestedResource(
+                            'version',
+                            'versions',
+                            ProgrammingLanguageVersionViewSet,
+                            parent_field_lookup='language',
+                        ),
+                    ],
+                    parent_field_lookup='author',
+                ),
+            ],
+        ),
+    ]
+    return resources
+
+
+class _ForbiddenConditionalWebsiteVisitViewSet(ConditionalWebsiteVisitViewSet):
+
+    def list(self, request, *args, **kwargs):
+        raise PermissionDenied()
+
+    def retrieve(self, request, *args, **kwargs):
+        raise PermissionDenied()
+
+
+class _ConditionalWebsiteViewSet(WebsiteViewSet):
+    use_conditional_requests = True
+
+
+def _build_conditional_resources(
+    visit_viewset,
+    website_viewset=WebsiteViewSet,
+):
+    resources = [
+        Resource(
+            'website',
+            'websites',
+            website_viewset,
+            [
+                NestedResource(
+                    'visit',
+                    'visits',
+                    visit_viewset,
+                    parent_field_lookup='website',
+                ),
+            ],
+        ),
+    ]
+    return resources
+
+
 class _WebsiteViewSetWithCustomGetQueryset(WebsiteViewSet):
     def get_queryset(self):
         return Website.objects.none()
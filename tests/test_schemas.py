@@ -0,0 +1,139 @@
+from unittest.mock import patch
+
+from nose.tools import eq_
+from nose.tools import ok_
+from rest_framework.schemas.openapi import AutoSchema
+
+from django_project.languages.views import DeveloperViewSet
+from django_project.languages.views import ProgrammingLanguageVersionViewSet
+from django_project.languages.views import ProgrammingLanguageViewSet
+from drf_nested_resources.routers import NestedResource
+from drf_nested_resources.routers import Resource
+from drf_nested_resources.routers import make_urlpatterns_from_resources
+from drf_nested_resources.schemas import NestedSchemaGenerator
+from tests._testcases import TestCase
+
+
+class TestSchemaGeneration(TestCase):
+
+    def setUp(self):
+        super(TestSchemaGeneration, self).setUp()
+
+        self.urlpatterns = make_urlpatterns_from_resources(_RESOURCES)
+
+    def test_nested_resource_path_parameters(self):
+        schema = self._get_schema()
+
+        operation = \
+            schema['paths']['/developers/{developer}/languages/{language}/']
+        parameters_by_name = {
+            parameter['name']: parameter
+            for parameter in operation['get']['parameters']
+        }
+        eq_({'developer', 'language'}, set(parameters_by_name))
+        for parameter in parameters_by_name.values():
+            eq_('path', parameter['in'])
+            ok_(parameter['required'])
+            eq_({'type': 'integer'}, parameter['schema'])
+            ok_(parameter['description'])
+
+    def test_nested_collection_path_parameters(self):
+        schema = self._get_schema()
+
+        operation = schema['paths'][
+            '/developers/{developer}/languages/{language}/versions/'
+        ]
+        parameter_names = \
+            [parameter['name'] for parameter in operation['get']['parameters']]
+        eq_(['developer', 'language'], parameter_names)
+
+    def test_public_path_parameters_method(self):
+        # Rest Framework 3.12 and later call the public method
+        path = '/developers/{developer}/languages/{language}/'
+        view = self._get_view(path, 'GET')
+
+        parameters = view.schema.get_path_parameters(path, 'GET')
+
+        eq_(
+            view.schema._get_path_parameters(path, 'GET'),
+            parameters,
+        )
+        for parameter in parameters:
+            eq_({'type': 'integer'}, parameter['schema'])
+
+    def test_top_level_collection(self):
+        schema = self._get_schema()
+
+        operation = schema['paths']['/developers/']
+        eq_([], operation['get']['parameters'])
+
+    def test_operation_cache(self):
+        self._get_schema()
+
+        patched_method = patch.object(
+            AutoSchema,
+            'get_operation',
+            autospec=True,
+            side_effect=AutoSchema.get_operation,
+        )
+        with patched_method as get_operation_mock:
+            schema = self._get_schema()
+
+        eq_(0, get_operation_mock.call_count)
+        ok_('/developers/{developer}/' in schema['paths'])
+
+    def test_operation_cache_invalidation(self):
+        self._get_schema()
+        self.urlpatterns = make_urlpatterns_from_resources(_RESOURCES)
+
+        patched_method = patch.object(
+            AutoSchema,
+            'get_operation',
+            autospec=True,
+            side_effect=AutoSchema.get_operation,
+        )
+        with patched_method as get_operation_mock:
+            self._get_schema()
+
+        ok_(get_operation_mock.call_count)
+
+    def _get_view(self, path, method):
+        schema_generator = NestedSchemaGenerator(patterns=self.urlpatterns)
+        schema_generator._initialise_endpoints()
+        _, view_endpoints = schema_generator._get_paths_and_endpoints(None)
+        view, = [
+            endpoint_view
+            for endpoint_path, endpoint_method, endpoint_view in view_endpoints
+            if endpoint_path == path and endpoint_method == method
+        ]
+        return view
+
+    def _get_schema(self):
+        schema_generator = NestedSchemaGenerator(patterns=self.urlpatterns)
+        schema = schema_generator.get_schema(public=True)
+        return schema
+
+
+_RESOURCES = [
+    Resource(
+        'developer',
+        'developers',
+        DeveloperViewSet,
+        [
+            NestedResource(
+                'language',
+                'languages',
+                ProgrammingLanguageViewSet,
+                [
+                    NestedResource(
+                        'version',
+                        'versions',
+                        ProgrammingLanguageVersionViewSet,
+                        parent_field_lookup='language',
+                    ),
+                ],
+                parent_field_lookup='author',
+            ),
+        ],
+    ),
+]